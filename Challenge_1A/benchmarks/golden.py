@@ -0,0 +1,283 @@
+"""
+Golden-output regression and throughput harness for the 1A pipeline.
+
+Runs the sample PDFs (data/samples) and generated stress PDFs
+(benchmarks/synthetic.py, fixed seed) through every predictor backend,
+execution mode and feature variant, and checks that each run writes
+*_outline.json files byte-identical to the golden copies. Each mode's
+throughput is printed side by side; any mismatch fails the run (exit 1).
+
+  serial        process_pdfs, one PDF per predict call
+  batched       process_pdfs, every PDF in one predict call
+  parallel      run_batch_parallel with --workers processes (pool start-up included)
+  pipelined     run_batch_pipelined: prefetching reader, writer thread
+  chunked       process_pdfs with chunk_pages=--chunk-pages
+  page-workers  process_pdfs with page_workers=--page-workers extraction processes
+  cold          OutlineCache, empty: features and outlines are computed and stored
+  warm          the same cache again: every outline is a cache hit
+  pages         the same cache without its feature/outline layers, incremental:
+                every page's features come from the page layer (not with
+                norepeats, which incremental runs do not support)
+
+The variants are inference.py's feature options, each with its own goldens:
+
+  default    benchmarks/golden/
+  layout     --layout, benchmarks/golden/layout/
+  norepeats  --drop-repeats, benchmarks/golden/norepeats/
+
+    cd Challenge_1A
+    python benchmarks/golden.py                    # check every backend and mode
+    python benchmarks/golden.py --predictor compiled --mode serial --mode chunked
+    python benchmarks/golden.py --variant layout   # one variant only
+    python benchmarks/golden.py --no-stress        # sample PDFs only
+    python benchmarks/golden.py --update           # rewrite the goldens (serial, sklearn)
+
+Only --update changes benchmarks/golden/; do it when an outline change is
+intended, and review the diff of the golden files.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLDEN_DIR = os.path.join(ROOT, "benchmarks", "golden")
+SAMPLES_DIR = os.path.join(ROOT, "data", "samples")
+sys.path[:0] = [os.path.join(ROOT, "src"), os.path.join(ROOT, "benchmarks")]
+
+PREDICTORS = ("sklearn", "booster", "compiled")
+MODES = ("serial", "batched", "parallel", "pipelined", "chunked", "page-workers",
+         "cold", "warm", "pages")
+# name -> inference options; each variant's goldens live in golden/<name>/
+VARIANTS = {
+    "default": {},
+    "layout": {"layout": True},
+    "norepeats": {"drop_repeats": True},
+}
+# name -> make_pdf arguments (pages, blocks per page, spans per block, ...)
+STRESS = {
+    "stress_dense": dict(pages=8, blocks_per_page=120, spans_per_block=4),
+    "stress_long": dict(pages=120, blocks_per_page=30, spans_per_block=3),
+    "stress_headers": dict(pages=40, blocks_per_page=30, spans_per_block=3,
+                           running_headers=True),
+}
+
+
+@contextmanager
+def quiet():
+    """Silence stdout at the file-descriptor level (worker processes included)."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, "w") as devnull:
+        os.dup2(devnull.fileno(), 1)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+
+
+def corpus(tmp, stress=True):
+    """Sorted PDF paths: the samples, plus the generated stress PDFs."""
+    pdfs = [os.path.join(SAMPLES_DIR, f) for f in sorted(os.listdir(SAMPLES_DIR))
+            if f.lower().endswith(".pdf")]
+    if stress:
+        from synthetic import make_pdf
+        for name, kwargs in STRESS.items():
+            pdfs.append(make_pdf(os.path.join(tmp, f"{name}.pdf"), **kwargs))
+    return pdfs
+
+
+def golden_dir(variant, root=GOLDEN_DIR):
+    return root if variant == "default" else os.path.join(root, variant)
+
+
+def supported(mode, variant):
+    """Whether inference supports this mode with this variant's options."""
+    return not (mode == "pages" and VARIANTS[variant].get("drop_repeats"))
+
+
+def outline_name(pdf_path):
+    return f"{os.path.splitext(os.path.basename(pdf_path))[0]}_outline.json"
+
+
+def run_mode(mode, predictor, model, pdfs, out_dir, cache_dir, workers=2, chunk_pages=8,
+             page_workers=2, layout=False, drop_repeats=False):
+    """Write the outlines of `pdfs` to out_dir in this mode; returns seconds."""
+    from inference import process_pdfs, run_batch_parallel, run_batch_pipelined, open_cache
+    from batch_io import OutputWriter, encode_result
+
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(pdf, os.path.join(out_dir, outline_name(pdf))) for pdf in pdfs]
+
+    def write(results):
+        for (_, out_json), result in zip(jobs, results):
+            with open(out_json, "w", encoding="utf-8") as f:
+                f.write(encode_result(result))
+
+    cache = None
+    if mode == "pages":
+        # Keep only the page layer of the cold run
+        for layer in ("features", "outlines"):
+            shutil.rmtree(os.path.join(cache_dir, layer))
+    if mode in ("cold", "warm", "pages"):
+        cache = open_cache(cache_dir, 1024, predictor=predictor,
+                           layout=layout, drop_repeats=drop_repeats)
+    options = {"layout": layout, "drop_repeats": drop_repeats}
+
+    t0 = time.perf_counter()
+    if mode == "serial":
+        write([process_pdfs([pdf], model, **options)[0] for pdf in pdfs])
+    elif mode == "batched":
+        write(process_pdfs(pdfs, model, **options))
+    elif mode == "parallel":
+        failures = run_batch_parallel(jobs, workers, predictor=predictor, predict_threads=1,
+                                      **options)
+        if failures:
+            raise RuntimeError(f"parallel run failed: {failures}")
+    elif mode == "pipelined":
+        writer = OutputWriter("pretty")
+        try:
+            failures = run_batch_pipelined(jobs, writer, booster=model, **options)
+        finally:
+            writer.close()
+        if failures:
+            raise RuntimeError(f"pipelined run failed: {failures}")
+    elif mode == "chunked":
+        write([process_pdfs([pdf], model, chunk_pages=chunk_pages, **options)[0]
+               for pdf in pdfs])
+    elif mode == "page-workers":
+        write([process_pdfs([pdf], model, page_workers=page_workers, **options)[0]
+               for pdf in pdfs])
+    elif mode in ("cold", "warm"):
+        write([process_pdfs([pdf], model, cache=cache, **options)[0] for pdf in pdfs])
+    elif mode == "pages":
+        write([process_pdfs([pdf], model, cache=cache, incremental=True, **options)[0]
+               for pdf in pdfs])
+    else:
+        raise ValueError(f"Unknown mode {mode!r}")
+    return time.perf_counter() - t0
+
+
+def mismatches(pdfs, out_dir, golden_dir=GOLDEN_DIR):
+    """Names of the outlines in out_dir that differ from (or lack) a golden copy."""
+    bad = []
+    for pdf in pdfs:
+        name = outline_name(pdf)
+        golden = os.path.join(golden_dir, name)
+        if not os.path.exists(golden):
+            bad.append(f"{name} (no golden)")
+            continue
+        with open(golden, "rb") as f, open(os.path.join(out_dir, name), "rb") as g:
+            if f.read() != g.read():
+                bad.append(name)
+    return bad
+
+
+def page_count(pdfs):
+    import fitz
+    total = 0
+    for pdf in pdfs:
+        with fitz.open(pdf) as doc:
+            total += doc.page_count
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--predictor", action="append", choices=PREDICTORS,
+                        help="backend(s) to check (default: all)")
+    parser.add_argument("--mode", action="append", choices=MODES,
+                        help="execution mode(s) to check (default: all)")
+    parser.add_argument("--variant", action="append", choices=list(VARIANTS),
+                        help="feature variant(s) to check (default: all)")
+    parser.add_argument("--no-stress", action="store_true",
+                        help="skip the generated stress PDFs")
+    parser.add_argument("--workers", type=int, default=2, help="processes for 'parallel'")
+    parser.add_argument("--chunk-pages", type=int, default=8, help="pages per chunk for 'chunked'")
+    parser.add_argument("--page-workers", type=int, default=2,
+                        help="extraction processes per PDF for 'page-workers'")
+    parser.add_argument("--golden", default=GOLDEN_DIR)
+    parser.add_argument("--update", action="store_true",
+                        help="rewrite the goldens from a serial sklearn run, then check")
+    parser.add_argument("--keep", metavar="DIR",
+                        help="keep every mode's outlines under DIR (for diffing failures)")
+    parser.add_argument("--json", metavar="PATH", help="write measurements as JSON")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)  # model paths are relative to Challenge_1A
+    from predictors import load_predictor
+
+    predictors = args.predictor or list(PREDICTORS)
+    variants = args.variant or list(VARIANTS)
+    modes = args.mode or list(MODES)
+    # The cache modes build on each other
+    if "warm" in modes or "pages" in modes:
+        modes = ["cold"] + [m for m in modes if m != "cold"]
+    modes.sort(key=MODES.index)
+
+    results, problems = {}, []
+    tmp = tempfile.mkdtemp()
+    try:
+        pdfs = corpus(tmp, stress=not args.no_stress)
+        pages = page_count(pdfs)
+        print(f"📚 {len(pdfs)} PDFs, {pages} pages")
+        work_dir = args.keep or tmp
+
+        if args.update:
+            sklearn = load_predictor("sklearn")
+            for variant in variants:
+                out_dir = os.path.join(tmp, "update", variant)
+                target = golden_dir(variant, args.golden)
+                with quiet():
+                    run_mode("serial", "sklearn", sklearn, pdfs, out_dir, None,
+                             **VARIANTS[variant])
+                os.makedirs(target, exist_ok=True)
+                for pdf in pdfs:
+                    shutil.copyfile(os.path.join(out_dir, outline_name(pdf)),
+                                    os.path.join(target, outline_name(pdf)))
+                print(f"✅ Wrote {len(pdfs)} golden outlines to {target}")
+
+        print(f"   {'variant':<9} {'mode':<12} {'predictor':<9} {'seconds':>8} "
+              f"{'PDFs/s':>8} {'pages/s':>8}")
+        for predictor in predictors:
+            model = load_predictor(predictor)
+            for variant in variants:
+                cache_dir = os.path.join(tmp, "cache", predictor, variant)
+                for mode in modes:
+                    if not supported(mode, variant):
+                        continue
+                    out_dir = os.path.join(work_dir, predictor, variant, mode)
+                    with quiet():
+                        seconds = run_mode(mode, predictor, model, pdfs, out_dir, cache_dir,
+                                           args.workers, args.chunk_pages, args.page_workers,
+                                           **VARIANTS[variant])
+                    bad = mismatches(pdfs, out_dir, golden_dir(variant, args.golden))
+                    results[f"{variant}/{mode}/{predictor}"] = {
+                        "seconds": seconds,
+                        "pdfs_per_s": len(pdfs) / seconds,
+                        "pages_per_s": pages / seconds,
+                        "mismatches": bad,
+                    }
+                    status = "✅" if not bad else f"❌ {len(bad)} differ"
+                    print(f"   {variant:<9} {mode:<12} {predictor:<9} {seconds:8.2f} "
+                          f"{len(pdfs) / seconds:8.1f} {pages / seconds:8.0f}  {status}")
+                    problems += [f"{variant}/{mode}/{predictor}: {name}" for name in bad]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if problems:
+        print("❌ Outlines differ from the goldens:")
+        for p in problems:
+            print(f"   {p}")
+        sys.exit(1)
+    print("✅ All outlines match the goldens")
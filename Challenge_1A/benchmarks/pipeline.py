@@ -0,0 +1,220 @@
+"""
+Per-stage benchmark for the 1A pipeline on synthetic PDFs.
+
+Generates documents with benchmarks/synthetic.py, runs every case in a fresh
+process and times each stage separately:
+
+  extract   ingestion.extract_text_blocks
+  repeats   repeats.drop_repeated (only with --drop-repeats)
+  layout    layout.layout_page for every page (only with --layout)
+  graph     graph.build_page_graph for every page
+  features  features.build_feature_dataframe
+  predict   inference.align_features + model predict
+  outline   inference.build_outline (heading_levels) + JSON write
+
+Each case first makes one untimed warm-up pass, so the lazy imports
+(PyMuPDF, scipy, ...) and first-call setup are not counted in any stage.
+Reports seconds per stage, pages/s, blocks/s and peak RSS, and compares the
+run against benchmarks/pipeline_baseline.json; a stage slower than the
+baseline by more than --tolerance fails the run (exit 1).
+
+    cd Challenge_1A
+    python benchmarks/pipeline.py                     # compare with the baseline
+    python benchmarks/pipeline.py --save-baseline     # record a new baseline
+    python benchmarks/pipeline.py --pages 800 --blocks 40 --spans 4
+    python benchmarks/pipeline.py --case dense --layout
+    python benchmarks/pipeline.py --case long --drop-repeats
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing as mp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "pipeline_baseline.json")
+sys.path[:0] = [os.path.join(ROOT, "src"), os.path.join(ROOT, "benchmarks")]
+
+STAGES = ("extract", "repeats", "layout", "graph", "features", "predict", "outline")
+# name -> (pages, blocks per page, spans per block)
+CASES = {
+    "small": (10, 20, 3),
+    "dense": (20, 120, 4),
+    "long": (200, 30, 3),
+}
+# Stages faster than this are too noisy to compare against the baseline
+NOISE_FLOOR_S = 0.05
+
+
+def _timed(best, stage, fn, *args):
+    """Call fn(*args), keeping the fastest time seen for `stage` in best."""
+    t0 = time.perf_counter()
+    out = fn(*args)
+    best[stage] = min(best[stage], time.perf_counter() - t0)
+    return out
+
+
+def _write_outline(df, labels, out_path):
+    from inference import build_outline
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(build_outline(df, labels), f, ensure_ascii=False, indent=2)
+
+
+def _run_case(pdf_path, predictor, repeat, conn, layout=False, drop_repeats=False):
+    """
+    Child process: one untimed warm-up pass, then time every stage `repeat`
+    times and keep the minimum.
+    """
+    os.chdir(ROOT)
+    from ingestion import extract_text_blocks
+    from layout import layout_page
+    from repeats import drop_repeated
+    from graph import build_page_graph
+    from features import build_feature_dataframe
+    from inference import align_features, predict_labels
+    from predictors import load_predictor
+
+    model = load_predictor(predictor)
+    optional = {"layout": layout, "repeats": drop_repeats}
+    best = {stage: float("inf") for stage in STAGES if optional.get(stage, True)}
+    with tempfile.TemporaryDirectory() as tmp:
+        for run in range(repeat + 1):
+            # Run 0 warms up: its times go to a copy that is thrown away
+            times = dict(best) if run == 0 else best
+            pages = _timed(times, "extract", extract_text_blocks, pdf_path)
+            if drop_repeats:
+                pages = _timed(times, "repeats", drop_repeated, pages)[0]
+            layouts = None
+            if layout:
+                pages, layouts = _timed(times, "layout", lambda: map(
+                    list, zip(*(layout_page(blks) for blks in pages))))
+            graphs = _timed(times, "graph", lambda: [build_page_graph(blks) for blks in pages])
+            df = _timed(times, "features", build_feature_dataframe, graphs, layouts)
+            labels = _timed(times, "predict", lambda: predict_labels(model, align_features(df)))
+            _timed(times, "outline", _write_outline, df, labels,
+                   os.path.join(tmp, "outline.json"))
+
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+    conn.send({
+        "stages": best,
+        "pages": len(pages),
+        "blocks": sum(len(p) for p in pages),
+        "peak_rss_mb": rss_mb,
+    })
+    conn.close()
+
+
+def run_case(pdf_path, predictor="sklearn", repeat=3, layout=False, drop_repeats=False):
+    """Benchmark one PDF in a fresh spawned process so peak RSS is its own."""
+    ctx = mp.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_run_case, args=(pdf_path, predictor, repeat, child, layout,
+                                                   drop_repeats))
+    proc.start()
+    child.close()
+    result = parent.recv()
+    proc.join()
+    total = sum(result["stages"].values())
+    result["total"] = total
+    result["pages_per_s"] = result["pages"] / total
+    result["blocks_per_s"] = result["blocks"] / total
+    return result
+
+
+def compare(name, result, baseline, tolerance):
+    """List of regressions of one case against its baseline entry."""
+    problems = []
+    if not baseline:
+        return problems
+    for stage, now in result["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before is None or max(now, before) < NOISE_FLOOR_S:
+            continue
+        if now > before * (1 + tolerance):
+            problems.append(f"{name}/{stage}: {now:.3f}s vs baseline {before:.3f}s "
+                            f"(+{(now / before - 1) * 100:.0f}%)")
+    before_rss = baseline.get("peak_rss_mb")
+    if before_rss and result["peak_rss_mb"] > before_rss * (1 + tolerance):
+        problems.append(f"{name}/rss: {result['peak_rss_mb']:.0f} MB vs baseline {before_rss:.0f} MB")
+    return problems
+
+
+def print_result(name, result, baseline):
+    print(f"📊 {name}: {result['pages']} pages, {result['blocks']} blocks — "
+          f"{result['pages_per_s']:.1f} pages/s, {result['blocks_per_s']:.0f} blocks/s, "
+          f"peak RSS {result['peak_rss_mb']:.0f} MB")
+    for stage, now in result["stages"].items():
+        line = f"     {stage:<9}{now:9.3f} s"
+        before = (baseline or {}).get("stages", {}).get(stage)
+        if before:
+            line += f"   (baseline {before:.3f} s, {(now / before - 1) * 100:+.0f}%)"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--case", action="append", choices=sorted(CASES),
+                        help="preset case(s) to run (default: all)")
+    parser.add_argument("--pages", type=int, help="custom case: number of pages")
+    parser.add_argument("--blocks", type=int, default=20, help="custom case: blocks per page")
+    parser.add_argument("--spans", type=int, default=3, help="custom case: spans per block")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case (minimum kept)")
+    parser.add_argument("--predictor", choices=("sklearn", "booster", "compiled"), default="sklearn")
+    parser.add_argument("--layout", action="store_true",
+                        help="run the layout stage (inference.py --layout)")
+    parser.add_argument("--drop-repeats", action="store_true",
+                        help="run the repeats stage (inference.py --drop-repeats)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write this run as the new baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown per stage before failing (default: 0.5)")
+    parser.add_argument("--json", metavar="PATH", help="write measurements as JSON")
+    args = parser.parse_args()
+
+    from synthetic import make_pdf
+
+    if args.pages:
+        cases = {f"custom_{args.pages}x{args.blocks}x{args.spans}": (args.pages, args.blocks, args.spans)}
+    else:
+        cases = {name: CASES[name] for name in (args.case or CASES)}
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+    key = lambda name: (f"{name}/{args.predictor}" + ("/layout" if args.layout else "")
+                        + ("/norepeats" if args.drop_repeats else ""))
+
+    results, problems = {}, []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (pages, blocks, spans) in cases.items():
+            pdf_path = make_pdf(os.path.join(tmp, f"{name}.pdf"), pages, blocks, spans)
+            result = run_case(pdf_path, args.predictor, args.repeat, args.layout,
+                              args.drop_repeats)
+            results[key(name)] = result
+            baseline = None if args.save_baseline else baselines.get(key(name))
+            print_result(name, result, baseline)
+            problems += compare(name, result, baseline, args.tolerance)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"✅ Saved baseline to {args.baseline}")
+    elif problems:
+        print("❌ Regressions against baseline:")
+        for p in problems:
+            print(f"   {p}")
+        sys.exit(1)
+    else:
+        print("✅ No regressions against baseline")
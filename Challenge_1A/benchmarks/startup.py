@@ -0,0 +1,115 @@
+"""
+Startup-time budget for the 1A inference CLI.
+
+Runs the CLI entry points in fresh interpreters under `python -X importtime`,
+records the wall time and the cumulative import time of every top-level
+module, and fails (exit 1) when a scenario exceeds its budget in
+benchmarks/startup_budget.json or imports a module it must not load.
+
+    cd Challenge_1A
+    python benchmarks/startup.py                 # check against the budget
+    python benchmarks/startup.py --json out.json # also save the measurements
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(ROOT, "benchmarks", "startup_budget.json")
+
+
+def scenarios(tmp):
+    """name -> argv, all run from the Challenge_1A directory."""
+    empty_in, empty_out = os.path.join(tmp, "in"), os.path.join(tmp, "out")
+    os.makedirs(empty_in, exist_ok=True)
+    return {
+        "import_inference": [sys.executable, "-c", "import inference"],
+        "help": [sys.executable, "src/inference.py", "--help"],
+        "empty_batch": [sys.executable, "src/inference.py", empty_in, empty_out, "--batch"],
+    }
+
+
+def parse_importtime(stderr):
+    """
+    From -X importtime output: ({top-level module: cumulative ms},
+    set of every module imported at any depth).
+    """
+    modules, imported = {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        imported.add(name.strip())
+        if name.startswith("   "):  # nested import, already counted by its parent
+            continue
+        modules[name.strip()] = int(cumulative) / 1000.0
+    return modules, imported
+
+
+def measure(argv, runs):
+    env = dict(os.environ, PYTHONPATH=os.path.join(ROOT, "src"))
+    walls = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(argv, cwd=ROOT, env=env, capture_output=True, check=True)
+        walls.append((time.perf_counter() - t0) * 1000.0)
+    traced = subprocess.run([argv[0], "-X", "importtime"] + argv[1:], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    modules, imported = parse_importtime(traced.stderr)
+    return {
+        "wall_ms": statistics.median(walls),
+        "import_ms": sum(modules.values()),
+        "modules": dict(sorted(modules.items(), key=lambda kv: -kv[1])),
+        "imported": sorted(imported),
+    }
+
+
+def check(name, result, budget):
+    """List of budget violations for one scenario."""
+    problems = []
+    if result["wall_ms"] > budget.get("max_wall_ms", float("inf")):
+        problems.append(f"{name}: wall {result['wall_ms']:.0f} ms > {budget['max_wall_ms']} ms")
+    if result["import_ms"] > budget.get("max_import_ms", float("inf")):
+        problems.append(f"{name}: imports {result['import_ms']:.0f} ms > {budget['max_import_ms']} ms")
+    for mod in budget.get("forbidden_modules", []):
+        if mod in result["imported"]:
+            problems.append(f"{name}: imports {mod}")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per scenario (median)")
+    parser.add_argument("--budget", default=BUDGET_PATH)
+    parser.add_argument("--json", metavar="PATH", help="write measurements as JSON")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports shown per scenario")
+    args = parser.parse_args()
+
+    with open(args.budget, "r", encoding="utf-8") as f:
+        budgets = json.load(f)
+
+    results, problems = {}, []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, argv in scenarios(tmp).items():
+            result = measure(argv, args.runs)
+            results[name] = result
+            print(f"⏱️  {name}: wall {result['wall_ms']:.0f} ms, imports {result['import_ms']:.0f} ms")
+            for mod, ms in list(result["modules"].items())[:args.top]:
+                print(f"     {ms:8.1f} ms  {mod}")
+            problems += check(name, result, budgets.get(name, {}))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if problems:
+        print("❌ Startup budget exceeded:")
+        for p in problems:
+            print(f"   {p}")
+        sys.exit(1)
+    print("✅ Startup within budget")
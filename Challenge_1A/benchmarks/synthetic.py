@@ -0,0 +1,82 @@
+"""
+Synthetic PDF generator for benchmarks and stress tests.
+
+make_pdf() writes a deterministic document with a chosen number of pages,
+text blocks per page and spans per block. Blocks alternate between body
+paragraphs and numbered headings in larger/bold fonts so every pipeline
+stage (and every heading tier) gets exercised.
+"""
+import random
+
+import fitz
+
+PAGE_W, PAGE_H = 612, 792
+MARGIN = 36
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+         "tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam "
+         "quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo").split()
+# (fontname, size) for body spans and the three heading tiers
+BODY_FONTS = [("helv", 9.5), ("tiro", 9.5), ("helv", 10.0), ("cour", 9.0)]
+HEADING_FONTS = [("hebo", 16.0), ("hebo", 13.0), ("tibo", 11.5)]
+
+
+def _text(rng, n_words):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def make_pdf(path, pages=10, blocks_per_page=20, spans_per_block=3, seed=0,
+             running_headers=False):
+    """
+    Write a synthetic PDF to `path`.
+
+    Blocks are laid out top to bottom in as many columns as needed to fit
+    blocks_per_page on a page; each block is one or two lines whose spans
+    switch font so PyMuPDF reports spans_per_block spans. Every fifth block
+    is a numbered heading ("3.2 ...") of one of three sizes. With
+    running_headers, every page also gets a header and a "Page n of N"
+    footer in the margins (what repeats.py drops).
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    rows = max(1, min(blocks_per_page, 20))
+    cols = -(-blocks_per_page // rows)
+    col_w = (PAGE_W - 2 * MARGIN) / cols
+    row_h = (PAGE_H - 2 * MARGIN) / rows
+    section = [0, 0, 0]
+    fonts = {name: fitz.Font(name) for name, _ in BODY_FONTS + HEADING_FONTS}
+
+    for page_num in range(1, pages + 1):
+        page = doc.new_page(width=PAGE_W, height=PAGE_H)
+        writer = fitz.TextWriter(page.rect)
+        if running_headers:
+            writer.append((MARGIN, 16), "Synthetic Benchmark Report", font=fonts["hebo"], fontsize=7)
+            writer.append((PAGE_W / 2 - 20, PAGE_H - 10), f"Page {page_num} of {pages}",
+                          font=fonts["helv"], fontsize=7)
+        for b in range(blocks_per_page):
+            x = MARGIN + (b // rows) * col_w
+            y = MARGIN + (b % rows) * row_h + 10
+            if b % 5 == 0:
+                tier = rng.randrange(3)
+                section[tier] += 1
+                for t in range(tier + 1, 3):
+                    section[t] = 0
+                number = ".".join(str(max(1, n)) for n in section[:tier + 1])
+                fontname, size = HEADING_FONTS[tier]
+                writer.append((x, y), f"{number} {_text(rng, 3).title()}",
+                              font=fonts[fontname], fontsize=size)
+            else:
+                pos = (x, y)
+                per_line = max(1, -(-spans_per_block // 2))
+                for s in range(spans_per_block):
+                    if s and s % per_line == 0:  # wrap to a second line
+                        pos = (x, pos[1] + 11)
+                    fontname, size = BODY_FONTS[s % len(BODY_FONTS)]
+                    font = fonts[fontname]
+                    # keep spans inside the column (0.6em is a safe average glyph width)
+                    room = int((x + col_w - 6 - pos[0]) / (0.6 * size))
+                    chunk = _text(rng, rng.randint(2, 4))[:max(1, room - 1)] + " "
+                    _, pos = writer.append(pos, chunk, font=font, fontsize=size)
+        writer.write_text(page)
+    doc.save(path)
+    doc.close()
+    return path
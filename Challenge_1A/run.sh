@@ -3,9 +3,10 @@ set -e
 
 INPUT_DIR=/app/input
 OUTPUT_DIR=/app/output
+WORKERS=${WORKERS:-$(nproc)}
 
 # Create output dir if missing
 mkdir -p "$OUTPUT_DIR"
 
 echo "🚀 Running batch inference on \$INPUT_DIR, writing to \$OUTPUT_DIR"
-python src/inference.py "$INPUT_DIR" "$OUTPUT_DIR" --batch
+python src/inference.py "$INPUT_DIR" "$OUTPUT_DIR" --batch --workers "$WORKERS"
@@ -0,0 +1,149 @@
+"""
+Overlapped file I/O for batch inference.
+
+PrefetchReader reads the next PDFs into memory on a background thread
+while the current ones are processed, and OutputWriter serializes and
+writes finished outlines on another. Both talk to the caller through
+bounded queues, so at most `depth` PDFs (or results) wait in memory and
+a slow disk or network mount only stalls the pipeline when a queue is
+empty (reader) or full (writer). Stdlib only: imported at CLI startup.
+"""
+import os
+import json
+import queue
+import threading
+
+from instrumentation import count, scope
+
+# pretty: indented JSON per PDF (same bytes as inference.save_json)
+# compact: minified JSON per PDF
+# jsonl: one combined file, one {"file": <pdf name>, **outline} per line
+OUTPUT_FORMATS = ("pretty", "compact", "jsonl")
+JSONL_NAME = "outlines.jsonl"
+
+_DONE = object()
+
+
+def encode_result(result, fmt="pretty"):
+    if fmt == "pretty":
+        return json.dumps(result, ensure_ascii=False, indent=2)
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+
+
+class PrefetchReader:
+    """
+    Iterate (pdf path, output path, PDF bytes or None, error or None) for
+    jobs in order, reading up to `depth` files ahead on a thread.
+    """
+
+    def __init__(self, jobs, depth=4):
+        self.jobs = list(jobs)
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._read_all, name="pdf-reader", daemon=True)
+        self._thread.start()
+
+    def _read_all(self):
+        for in_pdf, out_json in self.jobs:
+            if self._stop.is_set():
+                break
+            try:
+                with open(in_pdf, "rb") as f:
+                    item = (in_pdf, out_json, f.read(), None)
+                count("bytes_read", len(item[2]), doc=os.path.basename(in_pdf))
+            except OSError as e:
+                item = (in_pdf, out_json, None, f"{type(e).__name__}: {e}")
+            self._queue.put(item)
+        self._queue.put(_DONE)
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            yield item
+
+    def close(self):
+        """Stop reading ahead (unblocks the thread if the queue is full)."""
+        self._stop.set()
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._thread.join()
+
+
+class OutputWriter:
+    """
+    Write outlines on a background thread, in `fmt` (see OUTPUT_FORMATS).
+
+    submit() blocks while `depth` results are already waiting. With
+    fmt="jsonl" every result goes to one file, jsonl_path, in submission
+    order, and the per-PDF output paths are ignored. close() waits for
+    the queue to drain and re-raises the first write error.
+    """
+
+    def __init__(self, fmt="pretty", jsonl_path=None, depth=16):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {fmt!r}; expected one of {OUTPUT_FORMATS}")
+        if fmt == "jsonl" and not jsonl_path:
+            raise ValueError("fmt='jsonl' needs a jsonl_path")
+        self.fmt = fmt
+        self.jsonl_path = jsonl_path
+        self.written = 0
+        self._error = None
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._thread = threading.Thread(target=self._write_all, name="json-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, out_json, result, name):
+        if self._error is not None:
+            raise self._error
+        self._queue.put((out_json, result, name))
+
+    def _write_all(self):
+        jsonl = None
+        try:
+            if self.fmt == "jsonl":
+                os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+                jsonl = open(self.jsonl_path, "w", encoding="utf-8")
+            while True:
+                item = self._queue.get()
+                if item is _DONE:
+                    break
+                out_json, result, name = item
+                if self._error is not None:
+                    continue  # drain so submit() never blocks forever
+                try:
+                    with scope(doc=name):
+                        self._write(jsonl, out_json, result, name)
+                    self.written += 1
+                except OSError as e:
+                    self._error = e
+        except OSError as e:
+            self._error = e
+            while self._queue.get() is not _DONE:
+                pass
+        finally:
+            if jsonl is not None:
+                jsonl.close()
+
+    def _write(self, jsonl, out_json, result, name):
+        if jsonl is not None:
+            line = json.dumps({"file": name, **result}, ensure_ascii=False,
+                              separators=(",", ":")) + "\n"
+            jsonl.write(line)
+            count("bytes_written", len(line.encode("utf-8")))
+            return
+        os.makedirs(os.path.dirname(out_json), exist_ok=True)
+        with open(out_json, "w", encoding="utf-8") as f:
+            f.write(encode_result(result, self.fmt))
+            count("bytes_written", f.tell())
+        print(f"✅ Saved outline JSON to {out_json}")
+
+    def close(self):
+        self._queue.put(_DONE)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,69 @@
+def mean_size(sizes):
+    """np.mean over a list of span sizes, without the array round-trip for short lists."""
+    if not sizes:
+        return 0.0
+    if len(sizes) < 8:
+        # np.mean adds sequentially below 8 items, so this is bit-identical
+        total = 0.0
+        for s in sizes:
+            total += s
+        return total / len(sizes)
+    import numpy as np
+    return float(np.mean(sizes))
+
+
+class TextBlock:
+    """
+    Compact record for one text block, built during ingestion.
+
+    Holds only what the graph, feature and outline stages read, so the
+    full PyMuPDF dict (lines, spans, fonts, colors, origins) can be
+    dropped as soon as a page has been extracted.
+    """
+    __slots__ = (
+        "bbox",           # (x0, y0, x1, y1)
+        "font_size",      # mean span size
+        "max_font_size",  # largest span size
+        "is_bold",        # any span with flag bit 2 set
+        "text",           # concatenated span text, stripped
+        "n_spans",
+        "page_num",       # 1-based
+        "page_width",
+        "page_height",
+    )
+
+    def __init__(self, bbox, font_size, max_font_size, is_bold, text, n_spans,
+                 page_num, page_width, page_height):
+        self.bbox = bbox
+        self.font_size = font_size
+        self.max_font_size = max_font_size
+        self.is_bold = is_bold
+        self.text = text
+        self.n_spans = n_spans
+        self.page_num = page_num
+        self.page_width = page_width
+        self.page_height = page_height
+
+    @classmethod
+    def from_dict(cls, block, page_num=None, page_width=None, page_height=None):
+        """
+        Build from a PyMuPDF block dict. Page info defaults to the
+        '_page_num' / '_page_width' / '_page_height' keys ingestion adds.
+        """
+        spans = [s for line in block["lines"] for s in line["spans"]]
+        sizes = [s["size"] for s in spans]
+        return cls(
+            bbox=tuple(block["bbox"]),
+            font_size=mean_size(sizes),
+            max_font_size=max(sizes) if sizes else 0.0,
+            is_bold=any((s["flags"] & 2) != 0 for s in spans),
+            text="".join(s.get("text", "") for s in spans).strip(),
+            n_spans=len(spans),
+            page_num=block.get("_page_num") if page_num is None else page_num,
+            page_width=block["_page_width"] if page_width is None else page_width,
+            page_height=block["_page_height"] if page_height is None else page_height,
+        )
+
+    def __repr__(self):
+        return (f"TextBlock(page={self.page_num}, bbox={self.bbox}, "
+                f"font_size={self.font_size:.2f}, text={self.text[:30]!r})")
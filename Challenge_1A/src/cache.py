@@ -0,0 +1,171 @@
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+
+# Layout of the cached feature frames and page columns; bump it when they
+# change so older entries are never read back
+CACHE_FORMAT = "2"  # 2: frames carry the block text, no TextBlocks stored
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file's content."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def pdf_digest(pdf):
+    """SHA-256 hex digest of a PDF given as a path or as bytes."""
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(pdf).hexdigest()
+    return file_digest(pdf)
+
+def format_stats(stats):
+    """One-line hit/miss summary of an OutlineCache.stats dict."""
+    get = lambda k: stats.get(k, 0)
+    line = (f"outlines {get('outlines_hits')} hit / {get('outlines_misses')} miss, "
+            f"features {get('features_hits')} hit / {get('features_misses')} miss")
+    if get("pages_hits") or get("pages_misses"):
+        line += f", pages {get('pages_hits')} hit / {get('pages_misses')} miss"
+    return line
+
+def _combine(*parts):
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class OutlineCache:
+    """
+    Content-addressed on-disk cache for the 1A pipeline, in two layers:
+
+      features/  feature DataFrame keyed by PDF hash + feature_names.json hash
+      outlines/  final outline JSON keyed by PDF hash + feature hash + model hash
+      pages/     feature columns of one page keyed by page fingerprint
+                 + feature hash, for incremental runs over revised PDFs
+
+    variant names a non-default feature pipeline (e.g. "layout"); it is
+    mixed into the feature hash so its entries never mix with the default's.
+
+    A retrain changes only the model hash, so cached features are reused
+    and just the prediction/outline step re-runs. Entries are evicted
+    least-recently-used first once the total size exceeds max_bytes.
+    Writes are atomic (temp file + rename), so several batch workers can
+    share one cache directory.
+    """
+
+    LAYERS = ("features", "outlines", "pages")
+
+    def __init__(self, root, max_bytes=1 << 30,
+                 feat_names_path="models/feature_names.json",
+                 model_path="models/heading_model.pkl", variant=""):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.feat_hash = _combine(file_digest(feat_names_path), CACHE_FORMAT)
+        if variant:
+            self.feat_hash = _combine(self.feat_hash, variant)
+        self.model_hash = file_digest(model_path)
+        self.stats = {f"{layer}_{event}": 0 for layer in self.LAYERS
+                      for event in ("hits", "misses")}
+        for layer in self.LAYERS:
+            os.makedirs(os.path.join(root, layer), exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    # --- keys ---
+
+    def feature_key(self, pdf_hash):
+        return _combine(pdf_hash, self.feat_hash)
+
+    def outline_key(self, pdf_hash):
+        return _combine(pdf_hash, self.feat_hash, self.model_hash)
+
+    # --- layers ---
+
+    def get_features(self, pdf_hash):
+        """Feature DataFrame (with its 'text' column) for this PDF, or None."""
+        data = self._read("features", self.feature_key(pdf_hash), ".pkl")
+        return None if data is None else pickle.loads(data)
+
+    def put_features(self, pdf_hash, df):
+        data = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+        self._write("features", self.feature_key(pdf_hash), ".pkl", data)
+
+    def page_key(self, fingerprint, min_text_length=1):
+        return _combine(fingerprint, str(min_text_length), self.feat_hash)
+
+    def get_page(self, fingerprint, min_text_length=1):
+        """Feature columns (page_feature_columns) of a page with this fingerprint, or None."""
+        data = self._read("pages", self.page_key(fingerprint, min_text_length), ".pkl")
+        return None if data is None else pickle.loads(data)
+
+    def put_page(self, fingerprint, columns, min_text_length=1):
+        data = pickle.dumps(columns, protocol=pickle.HIGHEST_PROTOCOL)
+        self._write("pages", self.page_key(fingerprint, min_text_length), ".pkl", data)
+
+    def get_outline(self, pdf_hash):
+        """Outline result dict for this PDF, or None."""
+        data = self._read("outlines", self.outline_key(pdf_hash), ".json")
+        return None if data is None else json.loads(data.decode("utf-8"))
+
+    def put_outline(self, pdf_hash, result):
+        data = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        self._write("outlines", self.outline_key(pdf_hash), ".json", data)
+
+    def summary(self):
+        return format_stats(self.stats)
+
+    # --- storage ---
+
+    def _path(self, layer, key, ext):
+        return os.path.join(self.root, layer, key[:2], key + ext)
+
+    def _read(self, layer, key, ext):
+        path = self._path(layer, key, ext)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            self.stats[f"{layer}_misses"] += 1
+            return None
+        self.stats[f"{layer}_hits"] += 1
+        return data
+
+    def _write(self, layer, key, ext, data):
+        path = self._path(layer, key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._size += len(data)
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+        """(mtime, path, size) for every cached file."""
+        for layer in self.LAYERS:
+            for dirpath, _, files in os.walk(os.path.join(self.root, layer)):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:  # evicted by another worker
+                        continue
+                    yield st.st_mtime, path, st.st_size
+
+    def _evict(self):
+        """Drop least-recently-used entries until the cache is back under 90% of max_bytes."""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+        target = 0.9 * self.max_bytes  # headroom so every put does not rescan
+        for _, path, size in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
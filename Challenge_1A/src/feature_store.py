@@ -0,0 +1,113 @@
+"""
+Columnar feature store for training data.
+
+One Parquet file per document, partitioned by document id:
+
+  data/features/doc_id=sample1/part-0.parquet
+  data/features/doc_id=sample2/part-0.parquet
+
+Every file has the same typed schema (_schema(): the 15 features,
+page_idx, node_idx, text_snippet), so no stray CSV columns can reach
+training.
+Files are written atomically, one per document, which lets feature
+generation run in parallel; readers project only the columns they need.
+A source digest (the PDF's SHA-256, plus the feature variant such as
+"+layout") is kept in the file metadata so unchanged documents can be
+skipped on the next run.
+
+Requires pyarrow.
+"""
+import os
+import glob
+
+from features import FEATURE_COLUMNS
+
+STORE_DIR = "data/features"
+KEY_COLUMNS = ["doc_id", "page_idx", "node_idx"]
+INT_COLUMNS = {
+    "font_is_bold", "word_count", "char_count", "ends_with_punctuation",
+    "numbering_pattern", "node_degree", "bold_vs_neighbors", "page_idx", "node_idx",
+}
+
+
+def _schema():
+    import pyarrow as pa
+    fields = [pa.field(name, pa.int64() if name in INT_COLUMNS else pa.float64())
+              for name in FEATURE_COLUMNS + ["page_idx", "node_idx"]]
+    fields.append(pa.field("text_snippet", pa.string()))
+    return pa.schema(fields)
+
+
+def partition_path(store_dir, doc_id):
+    return os.path.join(store_dir, f"doc_id={doc_id}", "part-0.parquet")
+
+
+def stored_digest(store_dir, doc_id):
+    """The source_digest a document was stored with, or None."""
+    import pyarrow.parquet as pq
+    path = partition_path(store_dir, doc_id)
+    if not os.path.exists(path):
+        return None
+    meta = pq.read_schema(path).metadata or {}
+    digest = meta.get(b"source_digest")
+    return digest.decode("ascii") if digest else None
+
+
+def write_document(store_dir, doc_id, df, source_digest=None):
+    """
+    Replace the partition of `doc_id` with the rows of `df` (a
+    build_feature_dataframe frame, optionally with text_snippet).
+    source_digest identifies what the rows were computed from (see
+    stored_digest).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = _schema()
+    if source_digest:
+        schema = schema.with_metadata({"source_digest": source_digest})
+    df = df.copy()
+    if "text_snippet" not in df:
+        df["text_snippet"] = ""
+    table = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+    path = partition_path(store_dir, doc_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Dot prefix: dataset discovery skips it while it is being written
+    tmp = os.path.join(os.path.dirname(path), ".part-0.parquet.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def import_csv(store_dir, csv_path, doc_id):
+    """
+    Store a legacy *_blocks_unlabeled.csv as document `doc_id`, keeping
+    only the schema columns (stray 'Unnamed: N' columns are dropped).
+    Use this for features that existing labels were made against.
+    """
+    import pandas as pd
+    names = _schema().names
+    df = pd.read_csv(csv_path, usecols=lambda c: c in names)
+    df["text_snippet"] = df.get("text_snippet", pd.Series("", index=df.index)).fillna("").astype(str)
+    return write_document(store_dir, doc_id, df)
+
+
+def list_documents(store_dir=STORE_DIR):
+    return sorted(os.path.basename(os.path.dirname(p))[len("doc_id="):]
+                  for p in glob.glob(os.path.join(store_dir, "doc_id=*", "part-0.parquet")))
+
+
+def read_features(store_dir=STORE_DIR, columns=None, doc_ids=None):
+    """
+    DataFrame of the stored rows with a 'doc_id' column; `columns`
+    projects the read (keys are always included), `doc_ids` filters
+    partitions.
+    """
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(store_dir, format="parquet", partitioning="hive",
+                         exclude_invalid_files=True)
+    if columns is not None:
+        columns = KEY_COLUMNS + [c for c in columns if c not in KEY_COLUMNS]
+    flt = ds.field("doc_id").isin(list(doc_ids)) if doc_ids is not None else None
+    df = dataset.to_table(columns=columns, filter=flt).to_pandas()
+    df["doc_id"] = df["doc_id"].astype(str)
+    return df
@@ -1,6 +1,7 @@
 import re
 import numpy as np
 import pandas as pd
+from blocks import TextBlock
 
 def centroid(block):
     x0, y0, x1, y1 = block["bbox"]
@@ -47,7 +48,8 @@ def node_level_features(block):
 
 def relational_features(node_idx, G, k=None):
     """
-    G: networkx Graph where G.nodes[i]['meta'] is the block dict.
+    G: networkx Graph where G.nodes[i]['meta'] is the block dict
+       (e.g. PageGraph.to_networkx() over dict blocks).
     k: number of neighbors (inferred from G) or len(G[node_idx])
     """
     block = G.nodes[node_idx]["meta"]
@@ -108,21 +110,229 @@ def relational_features(node_idx, G, k=None):
         "indentation_vs_below": indentation_vs_below,
     }
 
+# --- Columnar Engine ---
+#
+# node_level_features / relational_features above are the per-node reference
+# implementation. The functions below compute the same columns for a whole
+# page at once: blocks are flattened into NumPy arrays a single time and the
+# relational features are segment reductions over the CSR neighbour arrays.
+
+NODE_FEATURES = [
+    "font_size", "font_is_bold", "norm_x0", "norm_y0", "word_count",
+    "char_count", "uppercase_ratio", "ends_with_punctuation", "numbering_pattern",
+]
+RELATIONAL_FEATURES = [
+    "node_degree", "avg_neighbor_distance", "font_size_ratio",
+    "bold_vs_neighbors", "space_above", "indentation_vs_below",
+]
+FEATURE_COLUMNS = NODE_FEATURES + RELATIONAL_FEATURES
+
+NUMBERING_RE = re.compile(r'^(\d+(\.\d+)*|[A-Za-z]\)|\([ivx]+\))\s')
+
+
+def segment_mean(values, counts):
+    """
+    Mean of consecutive segments of `values` (segment i has counts[i] items),
+    rounded exactly like np.mean over each segment; empty segments give 0.0.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    seg_ids = np.repeat(np.arange(len(counts)), counts)
+    sums = np.bincount(seg_ids, weights=values, minlength=len(counts))
+    # np.mean switches to pairwise summation from 8 items on; recompute
+    # those (rare) segments with it so the columns stay bit-identical
+    long_segs = np.flatnonzero(counts >= 8)
+    if len(long_segs):
+        starts = np.cumsum(counts) - counts
+        for i in long_segs:
+            sums[i] = np.add.reduce(values[starts[i]:starts[i] + counts[i]])
+    return np.where(counts > 0, sums / np.maximum(counts, 1), 0.0)
+
+
+def block_arrays(blocks):
+    """
+    Flatten one page of blocks (TextBlock records or PyMuPDF dicts) into
+    per-block NumPy arrays.
+
+    Returns a dict with 'bbox' (n, 4), 'font_size', 'has_spans', 'is_bold',
+    'page_dims' (n, 2), 'centroid' (n, 2) and the stripped 'text' list.
+    """
+    n = len(blocks)
+    if n and isinstance(blocks[0], dict):
+        blocks = [TextBlock.from_dict(b) for b in blocks]
+
+    font_size = np.fromiter((b.font_size for b in blocks), dtype=float, count=n)
+    counts = np.fromiter((b.n_spans for b in blocks), dtype=np.int64, count=n)
+    bolds = [b.is_bold for b in blocks]
+    texts = [b.text for b in blocks]
+    bbox = np.asarray([b.bbox for b in blocks], dtype=float).reshape(n, 4)
+    page_dims = np.asarray(
+        [(b.page_width, b.page_height) for b in blocks], dtype=float
+    ).reshape(n, 2)
+    centroid_xy = np.column_stack(
+        ((bbox[:, 0] + bbox[:, 2]) / 2.0, (bbox[:, 1] + bbox[:, 3]) / 2.0)
+    )
+    return {
+        "bbox": bbox,
+        "font_size": font_size,
+        "has_spans": counts > 0,
+        "is_bold": np.asarray(bolds, dtype=bool),
+        "page_dims": page_dims,
+        "centroid": centroid_xy,
+        "text": texts,
+    }
+
+
+def graph_adjacency(G):
+    """
+    CSR neighbour arrays (indptr, indices) for a page graph, keeping the
+    neighbour order of G[node] so order-dependent features stay identical.
+    """
+    nodes = list(G.nodes)
+    adj = [list(G[i]) for i in nodes]
+    indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum([len(a) for a in adj], out=indptr[1:])
+    indices = np.fromiter((j for a in adj for j in a), dtype=np.int64, count=indptr[-1])
+    return indptr, indices
+
+
+def page_feature_arrays(arrays, indptr, indices, layout=None):
+    """
+    Compute every node-level and relational feature for one page.
+
+    arrays: output of block_arrays(); indptr/indices: CSR neighbour lists.
+    layout: optional layout.PageLayout of the page; space_above and
+    indentation_vs_below then use its same-column block above/below
+    instead of the kNN neighbours.
+    Returns a dict of column name -> array, one entry per block.
+    """
+    bbox, font_size = arrays["bbox"], arrays["font_size"]
+    texts = arrays["text"]
+    n = len(font_size)
+    x0, y0 = bbox[:, 0], bbox[:, 1]
+
+    # Node-level: content features are string work, done once per block
+    char_count = np.fromiter((len(t) for t in texts), dtype=np.int64, count=n)
+    upper = np.fromiter((sum(c.isupper() for c in t) for t in texts), dtype=np.int64, count=n)
+    cols = {
+        "font_size": font_size,
+        "font_is_bold": arrays["is_bold"].astype(np.int64),
+        "norm_x0": x0 / arrays["page_dims"][:, 0],
+        "norm_y0": y0 / arrays["page_dims"][:, 1],
+        "word_count": np.fromiter((len(t.split()) for t in texts), dtype=np.int64, count=n),
+        "char_count": char_count,
+        "uppercase_ratio": upper / np.maximum(1, char_count),
+        "ends_with_punctuation": np.fromiter(
+            (t.endswith(('.', '?', '!')) for t in texts), dtype=np.int64, count=n),
+        "numbering_pattern": np.fromiter(
+            (NUMBERING_RE.match(t) is not None for t in texts), dtype=np.int64, count=n),
+    }
+
+    # Relational: one row per directed edge (src -> dst)
+    degree = np.diff(indptr)
+    src = np.repeat(np.arange(n), degree)
+    dst = indices
+
+    # Distance / size statistics only count neighbours that have spans
+    valid = arrays["has_spans"][dst]
+    n_valid = np.bincount(src[valid], minlength=n)
+    delta = arrays["centroid"][src[valid]] - arrays["centroid"][dst[valid]]
+    # vecdot follows np.linalg.norm's dot-product rounding exactly
+    dist = np.sqrt(np.vecdot(delta, delta))
+    avg_dist = segment_mean(dist, n_valid)
+    mean_neigh_size = np.where(
+        n_valid > 0, segment_mean(font_size[dst[valid]], n_valid), font_size
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        font_size_ratio = np.where(mean_neigh_size != 0, font_size / mean_neigh_size, 1.0)
+
+    neigh_bold = np.bincount(src, weights=arrays["is_bold"][dst], minlength=n) > 0
+    bold_vs_neighbors = (arrays["is_bold"] & ~neigh_bold).astype(np.int64)
+
+    if layout is not None:
+        # Exact vertical neighbours in the same column
+        above, below = layout.above, layout.below
+        space_above = np.where(above >= 0, y0 - y0[np.maximum(above, 0)], 0.0)
+        indentation_vs_below = np.where(below >= 0, x0[np.maximum(below, 0)] - x0, 0.0)
+    else:
+        # Closest block above (by top edge) among neighbours
+        above = y0[dst] < y0[src]
+        space_above = np.full(n, np.inf)
+        np.minimum.at(space_above, src[above], (y0[src] - y0[dst])[above])
+        space_above[np.isinf(space_above)] = 0.0
+
+        # Indentation is taken against the last neighbour whenever any
+        # neighbour lies below, matching relational_features
+        has_below = np.bincount(src[y0[dst] > y0[src]], minlength=n) > 0
+        if len(indices):
+            last = indices[np.maximum(indptr[1:] - 1, 0)]
+        else:
+            last = np.zeros(n, dtype=np.int64)
+        indentation_vs_below = np.where(has_below, x0[last] - x0, 0.0)
+
+    cols.update({
+        "node_degree": degree.astype(np.int64),
+        "avg_neighbor_distance": avg_dist,
+        "font_size_ratio": font_size_ratio,
+        "bold_vs_neighbors": bold_vs_neighbors,
+        "space_above": space_above,
+        "indentation_vs_below": indentation_vs_below,
+    })
+    return cols
+
+
 # --- DataFrame Builder ---
 
-def build_feature_dataframe(page_graphs):
-    """
-    page_graphs: list of networkx.Graphs, one per page.
-    Returns a pandas.DataFrame with one row per node.
-    """
-    rows = []
-    for pg_idx, G in enumerate(page_graphs, start=1):
-        for i in G.nodes:
-            feats = {}
-            feats.update(node_level_features(G.nodes[i]["meta"]))
-            feats.update(relational_features(i, G))
-            # preserve page and block id
-            feats["page_idx"] = pg_idx
-            feats["node_idx"] = i
-            rows.append(feats)
-    return pd.DataFrame(rows)
+def page_feature_columns(G, layout=None):
+    """
+    Feature columns of one page graph (graph.PageGraph or networkx.Graph):
+    {name: array} for FEATURE_COLUMNS plus 'node_idx', and 'text' (list of
+    the blocks' text, for the outline stage). layout: optional
+    layout.PageLayout of the same blocks (see page_feature_arrays).
+    """
+    if hasattr(G, "indptr"):
+        blocks, indptr, indices = G.blocks, G.indptr, G.indices
+        node_ids = np.arange(len(blocks), dtype=np.int64)
+    else:
+        blocks = [G.nodes[i]["meta"] for i in G.nodes]
+        indptr, indices = graph_adjacency(G)
+        node_ids = np.fromiter(G.nodes, dtype=np.int64, count=len(blocks))
+    arrays = block_arrays(blocks)
+    cols = page_feature_arrays(arrays, indptr, indices, layout)
+    cols["node_idx"] = node_ids
+    cols["text"] = arrays["text"]
+    return cols
+
+
+def assemble_feature_dataframe(page_columns):
+    """
+    One DataFrame from per-page page_feature_columns() dicts, in page
+    order; page_idx is the 1-based position in the list. The 'text'
+    column (object dtype) is skipped by align_features.
+    """
+    columns = {name: [] for name in FEATURE_COLUMNS + ["page_idx", "node_idx"]}
+    texts = []
+    for pg_idx, cols in enumerate(page_columns, start=1):
+        for name in FEATURE_COLUMNS:
+            columns[name].append(cols[name])
+        # preserve page and block id
+        columns["page_idx"].append(np.full(len(cols["node_idx"]), pg_idx, dtype=np.int64))
+        columns["node_idx"].append(cols["node_idx"])
+        texts.extend(cols["text"])
+    df = pd.DataFrame({
+        name: np.concatenate(parts) if parts else np.zeros(0)
+        for name, parts in columns.items()
+    })
+    df["text"] = pd.Series(texts, index=df.index, dtype=object)
+    return df
+
+
+def build_feature_dataframe(page_graphs, layouts=None):
+    """
+    page_graphs: list of graph.PageGraph (or networkx.Graph), one per page.
+    layouts: optional list of layout.PageLayout, one per page.
+    Returns a pandas.DataFrame with one row per node: FEATURE_COLUMNS,
+    page_idx, node_idx and the block text.
+    """
+    layouts = layouts or [None] * len(page_graphs)
+    return assemble_feature_dataframe([page_feature_columns(G, layout)
+                                       for G, layout in zip(page_graphs, layouts)])
@@ -1,35 +1,121 @@
-import networkx as nx
-from scipy.spatial import cKDTree
+import numpy as np
+from instrumentation import span
+
 def centroid(block):
-    x0, y0, x1, y1 = block["bbox"]
+    # Accepts TextBlock records as well as raw PyMuPDF block dicts
+    x0, y0, x1, y1 = block["bbox"] if isinstance(block, dict) else block.bbox
     return ((x0 + x1) / 2.0, (y0 + y1) / 2.0)
 
+
+class PageGraph:
+    """
+    Symmetrised kNN graph of one page in CSR form.
+
+    Node i is blocks[i]; its neighbours are indices[indptr[i]:indptr[i+1]],
+    listed in the order a networkx.Graph built edge-by-edge from the same
+    kNN result would report them.
+    """
+    __slots__ = ("blocks", "indptr", "indices")
+
+    def __init__(self, blocks, indptr, indices):
+        self.blocks = blocks
+        self.indptr = indptr
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def neighbors(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def number_of_nodes(self):
+        return len(self.blocks)
+
+    def number_of_edges(self):
+        # every undirected edge is stored twice, self-loops once
+        loops = int(np.count_nonzero(
+            self.indices == np.repeat(np.arange(len(self.blocks)), np.diff(self.indptr))
+        ))
+        return (len(self.indices) - loops) // 2 + loops
+
+    def to_networkx(self):
+        """
+        Export as a networkx.Graph with G.nodes[i]['meta'] = block, with
+        G[i] listing the neighbours in the same order as neighbors(i).
+        """
+        import networkx as nx
+        from collections import deque
+        G = nx.Graph()
+        for idx, block in enumerate(self.blocks):
+            G.add_node(idx, meta=block)
+        # networkx lists a node's neighbours in edge insertion order, so
+        # add the edges in a topological order of "comes before" within
+        # every node's neighbour list
+        after, indegree = {}, {}
+        for i in range(len(self.blocks)):
+            edges = [(min(i, int(j)), max(i, int(j))) for j in self.neighbors(i)]
+            for e in edges:
+                after.setdefault(e, [])
+                indegree.setdefault(e, 0)
+            for a, b in zip(edges, edges[1:]):
+                after[a].append(b)
+                indegree[b] += 1
+        ready = deque(e for e, d in indegree.items() if d == 0)
+        while ready:
+            e = ready.popleft()
+            G.add_edge(*e)
+            for f in after[e]:
+                indegree[f] -= 1
+                if not indegree[f]:
+                    ready.append(f)
+        return G
+
+
 def build_page_graph(blocks, k=4):
     """
-    Given a list of text-block dicts (one page), return a networkx.Graph
-    where each node is an index into `blocks` and edges connect each node
-    to its k nearest neighbors by centroid distance.
+    Given a list of text blocks (one page; TextBlock records or PyMuPDF
+    dicts), return a PageGraph where each node is an index into `blocks`
+    and edges connect each node to its k nearest neighbors by centroid
+    distance. Pages with k or fewer blocks simply get fewer neighbours.
     """
-    # 1. Compute centroids list
-    pts = [centroid(b) for b in blocks]
+    n = len(blocks)
+    if n == 0:
+        return PageGraph(blocks, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    # 1. Compute centroids array
+    pts = np.asarray([centroid(b) for b in blocks], dtype=float)
     
     # 2. Build a KD‑tree for fast neighbor lookup
-    tree = cKDTree(pts)
-    
-    # 3. Query k+1 nearest (first is itself at distance 0)
-    dists, nbrs = tree.query(pts, k=k+1)
+    from scipy.spatial import cKDTree
+    with span("knn"):
+        tree = cKDTree(pts)
+
+        # 3. Query k+1 nearest (first is itself at distance 0)
+        dists, nbrs = tree.query(pts, k=k+1)
     # dists: array shape (n_blocks, k+1), nbrs: same shape with indices
-    
-    # 4. Construct graph
-    G = nx.Graph()
-    for idx, block in enumerate(blocks):
-        # Store the block metadata on the node
-        G.add_node(idx, meta=block)
-    
-    # 5. Add edges (skip the zero‑distance self‑link)
-    n = len(blocks)
-    for i in range(n):
-        for j in nbrs[i][1:]:      # skip nbrs[i][0] == i itself
-            G.add_edge(i, int(j))
-    
-    return G
+    nbrs = np.asarray(nbrs).reshape(n, k + 1)
+
+    # 4. Directed edges i -> j (skip the zero‑distance self‑link column),
+    #    numbered in the order the edges are visited. query() pads rows
+    #    with index n when the page has fewer than k+1 blocks: drop those.
+    src = np.repeat(np.arange(n), k)
+    dst = nbrs[:, 1:].ravel().astype(np.int64)
+    visit = np.arange(n * k)
+    keep = dst < n
+    src, dst, visit = src[keep], dst[keep], visit[keep]
+
+    # 5. Symmetrise, keep the first visit of every (node, neighbour) pair,
+    #    then order each node's neighbours by that first visit
+    a = np.concatenate((src, dst))
+    b = np.concatenate((dst, src))
+    t = np.concatenate((visit, visit))
+    by_pair = np.lexsort((t, a * n + b))
+    pair = (a * n + b)[by_pair]
+    first = np.ones(len(pair), dtype=bool)
+    first[1:] = pair[1:] != pair[:-1]
+    sel = by_pair[first]
+    sel = sel[np.lexsort((t[sel], a[sel]))]
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(a[sel], minlength=n), out=indptr[1:])
+    return PageGraph(blocks, indptr, b[sel])
@@ -1,28 +1,50 @@
 import os
 import json
-import joblib
 import re
-import numpy as np
-import lightgbm as lgb
-from ingestion import extract_text_blocks
-from graph import build_page_graph
-from features import build_feature_dataframe
+from functools import lru_cache
+# Only stdlib and light local modules at import time: numpy, pandas, scipy,
+# fitz, joblib and lightgbm are imported by the functions that use them, so
+# `--help`, argument errors and empty batches never pay for them.
+# benchmarks/startup.py enforces this.
+from blocks import TextBlock
+from ingestion import (extract_text_blocks, iter_text_blocks, iter_page_fingerprints,
+                       PDFParseError)
+from cache import OutlineCache, pdf_digest, format_stats
+from predictors import PREDICTORS, load_predictor, model_file
+from batch_io import PrefetchReader, OutputWriter, OUTPUT_FORMATS, JSONL_NAME
+from instrumentation import (Recorder, SlowestProfiles, set_recorder, get_recorder,
+                             enabled, span, count, scope, doc_name, open_sink, profiling,
+                             rss_mb)
 
 MODEL_PATH = "models/heading_model.txt"
+# Chunked mode halves its chunks once RSS passes this fraction of the cap
+MEMORY_SOFT_FRACTION = 0.8
 
-# Regex patterns for numbering schemes
-PATTERN_H1 = re.compile(r"^\d+\.?\s")               # e.g., "1. Intro"
-PATTERN_H2 = re.compile(r"^\d+\.\d+\.?\s")         # e.g., "1.1 Background"
-PATTERN_H3 = re.compile(r"^(?:\d+\.\d+\.\d+\.?\s|[a-z]\)\s|\([ivx]+\)\s)")
+# Numbering schemes, one regex for all levels: alternatives are tried in
+# order, so a deeper scheme wins ("1.1.1 " is H3, not H1); the named
+# group that matched is the level
+PATTERN_LEVEL = re.compile(
+    r"^(?:(?P<H3>\d+\.\d+\.\d+\.?\s|[a-z]\)\s|\([ivx]+\)\s)"  # e.g., "1.1.1 Scope", "a) ", "(ii) "
+    r"|(?P<H2>\d+\.\d+\.?\s)"                               # e.g., "1.1 Background"
+    r"|(?P<H1>\d+\.?\s))"                                     # e.g., "1. Intro"
+)
+LEVELS = ("H1", "H2", "H3")
 
 def load_model(model_path="models/heading_model.txt"):
     # Load the sklearn classifier we saved
+    import joblib
     pickle_path = model_path.replace(".txt", ".pkl")
     return joblib.load(pickle_path)
 
-def load_feature_names(path="models/feature_names.json"):
+@lru_cache(maxsize=None)
+def _read_feature_names(path):
     with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+        return tuple(json.load(f))
+
+
+def load_feature_names(path="models/feature_names.json"):
+    # Read once per process; callers get a fresh list they may mutate
+    return list(_read_feature_names(path))
 
 def predict_labels(model, X):
     # Model.predict returns exactly the labels you trained on
@@ -31,100 +53,372 @@ def predict_labels(model, X):
 
 def extract_block_text(block):
     """Concatenate all spans of a block into full text."""
+    if isinstance(block, TextBlock):
+        return block.text
     spans = [s for line in block["lines"] for s in line["spans"]]
     return "".join(s.get("text", "") for s in spans).strip()
 
 
+def heading_levels(texts, font_sizes):
+    """
+    H1/H2/H3 of each heading: its numbering scheme if it has one, else
+    the tier of its font size (largest distinct size H1, next H2, the
+    rest H3).
+    """
+    import numpy as np
+    # Rank of every size among the distinct sizes, largest first
+    rank = np.unique(-np.asarray(font_sizes, dtype=float), return_inverse=True)[1].ravel()
+    tiers = np.asarray(LEVELS, dtype=object)[np.minimum(rank, len(LEVELS) - 1)]
+    # Numbering overrides the tier
+    return [m.lastgroup if m else tier
+            for m, tier in zip(map(PATTERN_LEVEL.match, texts), tiers)]
+
+
 def assign_hierarchy(heading_infos):
     """
     Assign H1/H2/H3 levels to detected headings.
     heading_infos: list of dicts with keys: 'text', 'page', 'font_size', 'numbering_pattern', 'norm_x0'
     """
-    # Extract font sizes
-    sizes = sorted({info['font_size'] for info in heading_infos}, reverse=True)
-    # Create tier mapping: size -> level by index
-    tiers = {size: f"H{min(i+1,3)}" for i, size in enumerate(sizes)}
-
-    outline = []
-    for info in heading_infos:
-        level = None
-        txt = info['text']
-        # Check numbering override first
-        if PATTERN_H3.match(txt):
-            level = "H3"
-        elif PATTERN_H2.match(txt):
-            level = "H2"
-        elif PATTERN_H1.match(txt):
-            level = "H1"
-        else:
-            # Fallback to font-size tier
-            level = tiers.get(info['font_size'], "H3")
-        outline.append({
-            "level": level,
-            "text": txt,
-            # zero-based page number
-            "page": info['page']
-        })
-    return outline
-
-
-def process_pdf(pdf_path, booster):
-    """Run full pipeline on a single PDF and return JSON dict."""
-    pages = extract_text_blocks(pdf_path)
-    graphs = [build_page_graph(blks) for blks in pages]
-    df = build_feature_dataframe(graphs)
-
-
-        # Prepare numeric feature matrix for inference
+    levels = heading_levels([info['text'] for info in heading_infos],
+                            [info['font_size'] for info in heading_infos])
+    # zero-based page number
+    return [{"level": level, "text": info['text'], "page": info['page']}
+            for level, info in zip(levels, heading_infos)]
+
+
+def compute_features(pdf_path, page_workers=1, layout=False, drop_repeats=False):
+    """
+    Ingestion → page graphs → feature frame. Returns (pages, df).
+
+    layout: run layout.layout_page on every page first, so blocks (and
+    node_idx) follow reading order across columns and the above/below
+    features use same-column neighbours.
+    drop_repeats: drop running headers, footers and page numbers (blocks
+    repeating across pages, see repeats.py) before anything else.
+    """
+    from graph import build_page_graph
+    from features import build_feature_dataframe
+    with span("extract"):
+        pages = extract_text_blocks(pdf_path, workers=page_workers)
+    if drop_repeats:
+        from repeats import drop_repeated
+        with span("repeats"):
+            pages, dropped = drop_repeated(pages)
+        count("repeated_blocks_dropped", dropped)
+    layouts = None
+    if layout:
+        from layout import layout_page
+        with span("layout"):
+            layouts = []
+            for page_num, blks in enumerate(pages, start=1):
+                with scope(page=page_num):
+                    pages[page_num - 1], page_layout = layout_page(blks)
+                layouts.append(page_layout)
+    with span("graph"):
+        graphs = []
+        for page_num, blks in enumerate(pages, start=1):
+            with scope(page=page_num):
+                graphs.append(build_page_graph(blks))
+    with span("features"):
+        df = build_feature_dataframe(graphs, layouts)
+    return pages, df
+
+
+def compute_features_incremental(pdf_path, cache, layout=False):
+    """
+    compute_features' feature frame for a revised PDF: every page is
+    fingerprinted, and pages already in cache (from any document) reuse
+    their feature rows; only new or changed pages are extracted and
+    featured. Features are page-local, so the frame equals
+    compute_features'.
+    """
+    from graph import build_page_graph
+    from features import page_feature_columns, assemble_feature_dataframe
+    from layout import layout_page
+    hits = {}
+
+    def needs_extraction(fingerprint):
+        hit = cache.get_page(fingerprint)
+        if hit is not None:
+            hits[fingerprint] = hit
+        return hit is None
+
+    page_columns = []
+    with span("extract"):
+        for page_num, (fingerprint, blocks) in enumerate(
+                iter_page_fingerprints(pdf_path, extract=needs_extraction), start=1):
+            if blocks is None:
+                columns = hits.pop(fingerprint)
+                count("pages_reused")
+            else:
+                with scope(page=page_num):
+                    page_layout = None
+                    if layout:
+                        blocks, page_layout = layout_page(blocks)
+                    columns = page_feature_columns(build_page_graph(blocks), page_layout)
+                cache.put_page(fingerprint, columns)
+            page_columns.append(columns)
+    if not any(len(columns["node_idx"]) for columns in page_columns):
+        raise PDFParseError("No text blocks found in entire document.")
+    with span("features"):
+        return assemble_feature_dataframe(page_columns)
+
+
+def process_pdf_chunked(pdf_path, booster, chunk_pages=64, max_memory_mb=0, page_workers=1,
+                        layout=False, drop_repeats=False):
+    """
+    Run the pipeline `chunk_pages` pages at a time (extract → graph →
+    features → predict) and keep only each chunk's outline_parts, so peak
+    memory follows the chunk size instead of the page count. Returns the
+    same JSON dict as process_pdf: features are page-local and every row
+    is predicted on its own.
+
+    max_memory_mb: a cap on the process RSS, checked after every chunk.
+    Past MEMORY_SOFT_FRACTION of it the chunks are halved; past the cap
+    they drop to one page, and a MemoryError is raised if one-page chunks
+    still exceed it.
+    drop_repeats: the repeated blocks are found by two streamed passes
+    that keep only bounded signature counts (repeats.StreamedSignatures),
+    so the PDF is extracted three times.
+    """
+    from graph import build_page_graph
+    from features import page_feature_columns, assemble_feature_dataframe
+    layout_page = None
+    if layout:
+        from layout import layout_page
+    repeated = None
+    if drop_repeats:
+        from repeats import StreamedSignatures, droppable, block_signature
+        with span("repeats"):
+            repeated = droppable(StreamedSignatures(
+                lambda: iter_text_blocks(pdf_path, workers=page_workers)))
+
+    parts = None
+
+    def run_chunk(pages, first_page):
+        nonlocal parts
+        count("chunks")
+        page_columns = []
+        with span("features"):
+            for page_num, blocks in enumerate(pages, start=first_page):
+                with scope(page=page_num):
+                    page_layout = None
+                    if layout_page is not None:
+                        blocks, page_layout = layout_page(blocks)
+                    page_columns.append(page_feature_columns(build_page_graph(blocks), page_layout))
+            df = assemble_feature_dataframe(page_columns)
+        if not len(df):
+            return
+        df["page_idx"] += first_page - 1
+        count("rows", len(df))
+        with span("predict"):
+            labels = predict_labels(booster, align_features(df))
+        with span("outline"):
+            chunk_parts = outline_parts(df, labels)
+            parts = chunk_parts if parts is None else merge_outline_parts(parts, chunk_parts)
+
+    size = max(1, chunk_pages)
+    chunk, first_page = [], 1
+    for page_num, blocks in enumerate(iter_text_blocks(pdf_path, workers=page_workers), start=1):
+        if repeated:
+            blocks = [b for b in blocks if block_signature(b) not in repeated]
+        chunk.append(blocks)
+        if len(chunk) < size:
+            continue
+        run_chunk(chunk, first_page)
+        chunk, first_page = [], page_num + 1
+        if max_memory_mb:
+            rss = rss_mb()
+            if rss > max_memory_mb:
+                if size == 1:
+                    raise MemoryError(f"RSS {rss:.0f} MB exceeds the {max_memory_mb} MB cap "
+                                      f"with one-page chunks (page {page_num})")
+                size = 1
+            elif rss > MEMORY_SOFT_FRACTION * max_memory_mb:
+                size = max(1, size // 2)
+    if chunk:
+        run_chunk(chunk, first_page)
+    with span("outline"):
+        return assemble_outline(parts)
+
+
+def align_features(df, feat_names_path="models/feature_names.json"):
+    """Numeric feature frame aligned to feature_names.json, ready for predict."""
+    # Prepare numeric feature matrix for inference
     df_in = df.drop(columns=[c for c in df.columns if df[c].dtype == object], errors='ignore')
     df_in = df_in.fillna(0)
 
     # Align to training features
-    feat_names = load_feature_names()
+    feat_names = load_feature_names(feat_names_path)
     # reindex will add any missing columns as 0, and drop extras
-    df_in = df_in.reindex(columns=feat_names, fill_value=0)
+    return df_in.reindex(columns=feat_names, fill_value=0)
+
+
+def predict_many(model, frames):
+    """
+    Predict several documents' aligned feature frames with a single
+    model.predict call; returns one label list per frame.
+    """
+    if len(frames) == 1:
+        return [predict_labels(model, frames[0])]
+    import numpy as np
+    import pandas as pd
+    labels = predict_labels(model, pd.concat(frames, ignore_index=True))
+    bounds = np.cumsum([len(f) for f in frames])[:-1]
+    return [list(part) for part in np.split(np.asarray(labels, dtype=object), bounds)]
+
+
+def process_pdfs(pdf_paths, booster, page_workers=1, cache=None, incremental=False,
+                 names=None, layout=False, drop_repeats=False, chunk_pages=0,
+                 max_memory_mb=0):
+    """
+    Run the full pipeline on several PDFs (paths or bytes), stacking all
+    of their rows into one predict call, and return their JSON dicts in
+    input order.
+
+    cache: optional cache.OutlineCache; a cached outline is returned as-is,
+    cached features skip ingestion, graphs and feature building.
+    incremental: with a cache, PDFs not cached as a whole reuse the cached
+    pages they share with earlier versions (see compute_features_incremental).
+    names: instrumentation labels of the PDFs (default: doc_name of each).
+    layout: column-aware reading order and neighbours (see compute_features);
+    use a cache opened with layout=True.
+    drop_repeats: drop repeated headers/footers (see compute_features); use
+    a cache opened with drop_repeats=True. Not with incremental: which
+    blocks repeat depends on the whole document, not one page.
+    chunk_pages: run each PDF chunk_pages pages at a time under the
+    max_memory_mb RSS cap (see process_pdf_chunked); only outlines are
+    cached, and every PDF gets its own predict calls.
+    """
+    if incremental and drop_repeats:
+        raise ValueError("drop_repeats does not work with incremental")
+    if incremental and chunk_pages:
+        raise ValueError("chunk_pages does not work with incremental")
+    results = [None] * len(pdf_paths)
+    pending = []  # (position, pdf hash, df) still needing predict
+    names = names or [doc_name(pdf_path) for pdf_path in pdf_paths]
+    for pos, pdf_path in enumerate(pdf_paths):
+        pdf_hash = None
+        cached = None
+        with scope(doc=names[pos]):
+            if cache is not None:
+                pdf_hash = pdf_digest(pdf_path)
+                results[pos] = cache.get_outline(pdf_hash)
+                if results[pos] is not None:
+                    count("outline_cache_hits")
+                    continue
+            if chunk_pages:
+                results[pos] = process_pdf_chunked(pdf_path, booster, chunk_pages, max_memory_mb,
+                                                   page_workers, layout, drop_repeats)
+                if cache is not None:
+                    cache.put_outline(pdf_hash, results[pos])
+                continue
+            if cache is not None:
+                cached = cache.get_features(pdf_hash)
+            if cached is not None:
+                df = cached
+            elif incremental and cache is not None:
+                df = compute_features_incremental(pdf_path, cache, layout)
+                cache.put_features(pdf_hash, df)
+            else:
+                df = compute_features(pdf_path, page_workers, layout, drop_repeats)[1]
+                if cache is not None:
+                    cache.put_features(pdf_hash, df)
+            count("rows", len(df))
+        pending.append((pos, pdf_hash, df))
+
+    if pending:
+        # One predict call may cover several documents
+        batch = ({"doc": names[pending[0][0]]} if len(pending) == 1
+                 else {"docs": len(pending)})
+        with span("predict", **batch):
+            all_labels = predict_many(booster, [align_features(df) for *_, df in pending])
+        for (pos, pdf_hash, df), doc_labels in zip(pending, all_labels):
+            with scope(doc=names[pos]), span("outline"):
+                results[pos] = build_outline(df, doc_labels)
+            if cache is not None:
+                cache.put_outline(pdf_hash, results[pos])
+    return results
 
-    # Predict labels
-    labels = predict_labels(booster, df_in)
-    df['pred'] = labels
+
+def process_pdf(pdf_path, booster, page_workers=1, cache=None, incremental=False,
+                layout=False, drop_repeats=False, chunk_pages=0, max_memory_mb=0):
+    """
+    Run full pipeline on a single PDF (path or bytes) and return JSON dict.
+
+    booster: the sklearn model from load_model() or any predictor from
+    predictors.load_predictor().
+    page_workers > 1 splits the page ranges of the PDF across that many
+    extraction processes (useful for single very long documents).
+    cache, incremental, layout, drop_repeats, chunk_pages, max_memory_mb:
+    see process_pdfs.
+    """
+    return process_pdfs([pdf_path], booster, page_workers, cache, incremental,
+                        layout=layout, drop_repeats=drop_repeats, chunk_pages=chunk_pages,
+                        max_memory_mb=max_memory_mb)[0]
+
+
+def outline_parts(df, labels):
+    """
+    What the outline needs from one feature frame (a whole document or a
+    chunk of its pages) and its predicted labels, as a small dict:
+    'title' (first predicted title or None), 'fallback' (largest-font text
+    of its first page with text, only when it has no title) and the
+    'texts', 'sizes' and zero-based 'pages' of its predicted headings.
+    """
+    import numpy as np
+    pred = np.asarray(labels, dtype=object)
+    texts = df['text'].to_numpy(dtype=object)
+    font_size = df['font_size'].to_numpy(dtype=float)
+    page_idx = df['page_idx'].to_numpy()
 
     # Identify title block (first predicted title)
-    title_df = df[df['pred'] == 'title']
-    if not title_df.empty:
+    title_rows = np.flatnonzero(pred == 'title')
+    title = fallback = None
+    if len(title_rows):
         # Use the first model‑predicted title
-        title_row = title_df.iloc[0]
-        title_block = pages[int(title_row['page_idx'])-1][int(title_row['node_idx'])]
-    else:
-        # FALLBACK: pick the block on page 1 (index 0) with max font size
-        first_page_blocks = pages[0]
-        # compute font size per block
-        max_idx, max_size = 0, 0.0
-        for i, blk in enumerate(first_page_blocks):
-            sizes = [s['size'] for line in blk['lines'] for s in line['spans']]
-            avg = float(np.mean(sizes)) if sizes else 0.0
-            if avg > max_size:
-                max_size = avg
-                max_idx = i
-        title_block = first_page_blocks[max_idx]
-        print("⚠️  No title predicted—using largest‐font block on page 0 as title.")
-    title_text = extract_block_text(title_block)
-
-    # Collect heading infos
-    headings = []
-    for _, row in df[df['pred'] == 'heading'].iterrows():
-        blk = pages[int(row['page_idx'])-1][int(row['node_idx'])]
-        font_sizes = [s['size'] for line in blk['lines'] for s in line['spans']]
-        headings.append({
-            'text': extract_block_text(blk),
-            # zero-based page
-            'page': int(row['page_idx']) - 1,
-            'font_size': float(np.mean(font_sizes)) if font_sizes else 0.0,
-            'numbering_pattern': bool(row.get('numbering_pattern', False)),
-            'norm_x0': row.get('norm_x0', 0.0)
-        })
-
-    # Assign hierarchical levels
-    outline = assign_hierarchy(headings)
+        title = texts[title_rows[0]]
+    elif len(df):
+        # FALLBACK: pick the block on page 1 (index 0) with max font size
+        # (or the first page with text if page 1 has none, e.g. only a
+        # header that --drop-repeats removed); argmax keeps the first of
+        # equal sizes
+        first_page = np.flatnonzero(page_idx == page_idx[0])
+        fallback = texts[first_page[np.argmax(font_size[first_page])]]
+
+    heading = pred == 'heading'
+    return {
+        "title": title,
+        "fallback": fallback,
+        "texts": texts[heading].tolist(),
+        "sizes": font_size[heading].tolist(),
+        # zero-based page
+        "pages": (page_idx[heading] - 1).tolist(),
+    }
+
+
+def merge_outline_parts(parts, later):
+    """Fold the outline_parts of a later chunk into parts (in place)."""
+    if parts["title"] is None:
+        parts["title"] = later["title"]
+    if parts["title"] is None and parts["fallback"] is None:
+        parts["fallback"] = later["fallback"]
+    for key in ("texts", "sizes", "pages"):
+        parts[key].extend(later[key])
+    return parts
+
+
+def assemble_outline(parts):
+    """The title + outline JSON dict of a document's outline_parts."""
+    title_text = parts["title"]
+    if title_text is None:
+        title_text = parts["fallback"]
+        print("⚠️  No title predicted—using largest‐font block on page 0 as title.")
+
+    # Headings: level from numbering or font-size tier
+    levels = heading_levels(parts["texts"], parts["sizes"])
+    outline = [{"level": level, "text": text, "page": page}
+               for level, text, page in zip(levels, parts["texts"], parts["pages"])]
 
     # Build final JSON
     result = {
@@ -134,34 +428,462 @@ def process_pdf(pdf_path, booster):
     return result
 
 
+def build_outline(df, labels):
+    """
+    Assemble the title + outline JSON dict from predicted block labels,
+    working on the feature frame's columns (text, font_size, page_idx).
+    """
+    return assemble_outline(outline_parts(df, labels))
+
+
 def save_json(result, output_path):
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(result, f, ensure_ascii=False, indent=2)
+        count("bytes_written", f.tell())
     print(f"✅ Saved outline JSON to {output_path}")
 
 
+def list_batch_jobs(path_in, path_out):
+    """(input PDF, output JSON) pairs for every PDF in path_in, by name."""
+    jobs = []
+    for fname in sorted(os.listdir(path_in)):
+        if not fname.lower().endswith(".pdf"):
+            continue
+        base = os.path.splitext(fname)[0]
+        jobs.append((os.path.join(path_in, fname),
+                     os.path.join(path_out, f"{base}_outline.json")))
+    return jobs
+
+
+# --- Process-pool batch mode ---
+
+_worker_model = None
+_worker_cache = None
+_worker_profile = False
+_worker_incremental = False
+_worker_layout = False
+_worker_drop_repeats = False
+_worker_chunking = (0, 0)  # (chunk_pages, max_memory_mb)
+
+
+def open_cache(cache_dir, max_mb, model_path=MODEL_PATH,
+               feat_names_path="models/feature_names.json", predictor="sklearn",
+               layout=False, drop_repeats=False):
+    """
+    OutlineCache keyed on the feature names, the model file the predictor
+    reads and the feature variant (layout and/or drop_repeats).
+    """
+    variant = "+".join(name for name, on in (("layout", layout), ("norepeats", drop_repeats))
+                       if on)
+    return OutlineCache(cache_dir, max_bytes=max_mb << 20,
+                        feat_names_path=feat_names_path,
+                        model_path=model_file(predictor, model_path),
+                        variant=variant)
+
+
+def _init_worker(model_path, feat_names_path, cache_dir=None, cache_max_mb=1024,
+                 predictor="sklearn", predict_threads=0, metrics=False, profile=False,
+                 incremental=False, layout=False, drop_repeats=False, chunk_pages=0,
+                 max_memory_mb=0):
+    """Pool initializer: load the model and feature names once per worker."""
+    global _worker_model, _worker_cache, _worker_profile, _worker_incremental, _worker_layout
+    global _worker_drop_repeats, _worker_chunking
+    _worker_model = load_predictor(predictor, model_path, predict_threads)
+    set_recorder(Recorder() if metrics else None)
+    _worker_profile = profile
+    _worker_incremental = incremental
+    _worker_layout = layout
+    _worker_drop_repeats = drop_repeats
+    _worker_chunking = (chunk_pages, max_memory_mb)
+    load_feature_names(feat_names_path)
+    if cache_dir:
+        _worker_cache = open_cache(cache_dir, cache_max_mb, model_path,
+                                   feat_names_path, predictor, layout, drop_repeats)
+
+
+def _run_job(in_pdf, out_json, data=None):
+    """
+    Process one PDF inside a worker; failures are returned, not raised.
+    Returns (pdf path, error or None, cache stats for this job,
+    instrumentation events, (seconds, cProfile stats or None), result).
+    Given data (the PDF's bytes, read by the parent), the outline is
+    returned as result instead of being written to out_json.
+    """
+    before = dict(_worker_cache.stats) if _worker_cache else {}
+    name = doc_name(in_pdf)
+    result = None
+    with profiling(_worker_profile) as prof, scope(doc=name):
+        try:
+            print(f"▶ Processing {name}")
+            result = process_pdfs([in_pdf if data is None else data], _worker_model,
+                                  cache=_worker_cache, incremental=_worker_incremental,
+                                  names=[name], layout=_worker_layout,
+                                  drop_repeats=_worker_drop_repeats,
+                                  chunk_pages=_worker_chunking[0],
+                                  max_memory_mb=_worker_chunking[1])[0]
+            if data is None:
+                save_json(result, out_json)
+                result = None
+            error = None
+        except PDFParseError as e:
+            error = f"PDFParseError: {e}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    after = dict(_worker_cache.stats) if _worker_cache else {}
+    events = get_recorder().drain() if enabled() else []
+    return (in_pdf, error, {k: after[k] - before[k] for k in after},
+            events, (prof["seconds"], prof["stats"]), result)
+
+
+def _collect_job(outcome, failures, cache_stats=None, sink=None, profiles=None):
+    """Fold one _run_job outcome into the batch totals; returns its result."""
+    in_pdf, error, stats, events, (seconds, prof_stats), result = outcome
+    if sink is not None:
+        sink.write(events)
+    if profiles is not None:
+        profiles.add(os.path.basename(in_pdf), seconds, prof_stats)
+    if cache_stats is not None:
+        for k, v in stats.items():
+            cache_stats[k] = cache_stats.get(k, 0) + v
+    if error is not None:
+        failures[in_pdf] = error
+        print(f"❌ Failed {os.path.basename(in_pdf)}: {error}")
+    return result
+
+
+def run_batch_parallel(jobs, workers, model_path=MODEL_PATH,
+                       feat_names_path="models/feature_names.json",
+                       cache_dir=None, cache_max_mb=1024, cache_stats=None,
+                       predictor="sklearn", predict_threads=1, sink=None, profiles=None,
+                       incremental=False, layout=False, drop_repeats=False, chunk_pages=0,
+                       max_memory_mb=0):
+    """
+    Run (input PDF, output JSON) jobs across `workers` processes.
+
+    PDFs are submitted largest-first so long documents do not end up
+    alone at the tail of the batch. Returns {pdf_path: error} for the
+    files that failed; per-job cache hits/misses are summed into the
+    cache_stats dict when one is given. Each worker's predictor gets
+    predict_threads threads so the pool does not oversubscribe the CPUs.
+    Workers' instrumentation events go to `sink` and their cProfile stats
+    to `profiles` (an instrumentation.SlowestProfiles) when given.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    jobs = sorted(jobs, key=lambda job: os.path.getsize(job[0]), reverse=True)
+    failures = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, feat_names_path, cache_dir,
+                                       cache_max_mb, predictor, predict_threads,
+                                       sink is not None, profiles is not None,
+                                       incremental, layout, drop_repeats, chunk_pages,
+                                       max_memory_mb)) as pool:
+        futures = [pool.submit(_run_job, in_pdf, out_json) for in_pdf, out_json in jobs]
+        for fut in as_completed(futures):
+            _collect_job(fut.result(), failures, cache_stats, sink, profiles)
+    return failures
+
+
+# --- Pipelined batch mode ---
+
+def _process_group(group, booster, failures, page_workers=1, cache=None,
+                   incremental=False, layout=False, drop_repeats=False, chunk_pages=0,
+                   max_memory_mb=0):
+    """
+    Outlines of a group of prefetched (pdf path, output path, bytes) jobs
+    from one predict call, as [(output path, result, name)]. If the group
+    fails, its PDFs are retried one by one so only the bad one is lost.
+    """
+    names = [os.path.basename(in_pdf) for in_pdf, _, _ in group]
+    try:
+        results = process_pdfs([data for _, _, data in group], booster, page_workers,
+                               cache, incremental, names=names, layout=layout,
+                               drop_repeats=drop_repeats, chunk_pages=chunk_pages,
+                               max_memory_mb=max_memory_mb)
+    except Exception as e:
+        if len(group) > 1:
+            return [out for job in group
+                    for out in _process_group([job], booster, failures, page_workers,
+                                              cache, incremental, layout, drop_repeats,
+                                              chunk_pages, max_memory_mb)]
+        failures[group[0][0]] = f"{type(e).__name__}: {e}"
+        print(f"❌ Failed {names[0]}: {failures[group[0][0]]}")
+        return []
+    return [(out_json, result, name)
+            for (_, out_json, _), name, result in zip(group, names, results)]
+
+
+def run_batch_pipelined(jobs, writer, workers=1, prefetch=4, booster=None,
+                        model_path=MODEL_PATH, feat_names_path="models/feature_names.json",
+                        cache=None, cache_dir=None, cache_max_mb=1024, cache_stats=None,
+                        predictor="sklearn", predict_threads=1, page_workers=1,
+                        predict_batch=1, sink=None, profiles=None, incremental=False,
+                        layout=False, drop_repeats=False, chunk_pages=0, max_memory_mb=0):
+    """
+    Run (input PDF, output JSON) jobs with file I/O overlapped with the
+    CPU work: a batch_io.PrefetchReader thread reads up to `prefetch`
+    PDFs ahead into memory, the pipeline runs on those bytes, and
+    finished outlines go to `writer` (a batch_io.OutputWriter), which
+    writes them on its own thread. On slow storage a batch then takes
+    about as long as the slower of reading/writing and processing,
+    not their sum.
+
+    workers == 1 processes in this process with `booster` and `cache`,
+    predict_batch PDFs per predict call. workers > 1 sends the bytes to
+    a process pool set up as in run_batch_parallel (largest PDFs first),
+    with at most 2 * workers PDFs in flight. Returns {pdf_path: error}.
+    """
+    failures = {}
+    if workers > 1:
+        jobs = sorted(jobs, key=lambda job: os.path.getsize(job[0]), reverse=True)
+    reader = PrefetchReader(jobs, prefetch)
+    try:
+        if workers <= 1:
+            def flush(group):
+                with profiling(profiles is not None) as prof:
+                    outputs = _process_group(group, booster, failures, page_workers,
+                                             cache, incremental, layout, drop_repeats,
+                                             chunk_pages, max_memory_mb)
+                for out in outputs:
+                    writer.submit(*out)
+                if profiles is not None:
+                    profiles.add("+".join(os.path.basename(job[0]) for job in group),
+                                 prof["seconds"], prof["stats"])
+                if sink is not None:
+                    sink.write(get_recorder().drain())
+
+            group = []
+            for in_pdf, out_json, data, error in reader:
+                if error is not None:
+                    failures[in_pdf] = error
+                    print(f"❌ Failed {os.path.basename(in_pdf)}: {error}")
+                    continue
+                print(f"▶ Processing {os.path.basename(in_pdf)}")
+                group.append((in_pdf, out_json, data))
+                if len(group) == predict_batch:
+                    flush(group)
+                    group = []
+            if group:
+                flush(group)
+            return failures
+
+        from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path, feat_names_path, cache_dir,
+                                           cache_max_mb, predictor, predict_threads,
+                                           sink is not None, profiles is not None,
+                                           incremental, layout, drop_repeats, chunk_pages,
+                                           max_memory_mb)) as pool:
+            in_flight = {}
+
+            def collect(done):
+                for fut in done:
+                    out_json = in_flight.pop(fut)
+                    outcome = fut.result()
+                    result = _collect_job(outcome, failures, cache_stats, sink, profiles)
+                    if outcome[1] is None:
+                        writer.submit(out_json, result, os.path.basename(outcome[0]))
+
+            for in_pdf, out_json, data, error in reader:
+                if error is not None:
+                    failures[in_pdf] = error
+                    print(f"❌ Failed {os.path.basename(in_pdf)}: {error}")
+                    continue
+                if len(in_flight) >= 2 * workers:
+                    collect(wait(in_flight, return_when=FIRST_COMPLETED).done)
+                in_flight[pool.submit(_run_job, in_pdf, out_json, data)] = out_json
+            collect(wait(in_flight).done)
+        return failures
+    finally:
+        reader.close()
+
+
 if __name__ == '__main__':
-    import sys, os
+    import sys, argparse
+
+    parser = argparse.ArgumentParser(description="Extract PDF outlines (title + H1/H2/H3).")
+    parser.add_argument("path_in", help="input PDF, or input directory with --batch")
+    parser.add_argument("path_out", help="output JSON, or output directory with --batch")
+    parser.add_argument("--batch", action="store_true", help="process every PDF in path_in")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes for --batch (default: 1)")
+    parser.add_argument("--page-workers", type=int, default=1,
+                        help="processes extracting the pages of each PDF (default: 1)")
+    parser.add_argument("--cache", metavar="DIR",
+                        help="reuse features/outlines of unchanged PDFs from this cache directory")
+    parser.add_argument("--cache-max-mb", type=int, default=1024,
+                        help="cache size cap in MB, LRU-evicted (default: 1024)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="with --cache, re-extract only the pages of a revised PDF "
+                             "that changed since a cached version")
+    parser.add_argument("--layout", action="store_true",
+                        help="detect columns and read blocks in column order, with same-column "
+                             "above/below features (use with a model trained on --layout features)")
+    parser.add_argument("--drop-repeats", action="store_true",
+                        help="drop running headers, footers and page numbers (blocks repeating "
+                             "at the same place on many pages) before building features")
+    parser.add_argument("--chunk-pages", type=int, default=0,
+                        help="process each PDF this many pages at a time (extract → features → "
+                             "predict), keeping memory bounded on very long documents "
+                             "(default: 0, whole documents)")
+    parser.add_argument("--max-memory-mb", type=int, default=0,
+                        help="with --chunk-pages, shrink chunks as RSS nears this cap and fail "
+                             "a PDF that still exceeds it (default: no cap)")
+    parser.add_argument("--predictor", choices=PREDICTORS, default="sklearn",
+                        help="model backend: pickled sklearn classifier, native LightGBM Booster, "
+                             "or 'compiled' (NumPy-only evaluation of the same trees)")
+    parser.add_argument("--predict-threads", type=int, default=0,
+                        help="LightGBM threads for --predictor booster (default: all cores, "
+                             "1 per worker with --workers)")
+    parser.add_argument("--predict-batch", type=int, default=1,
+                        help="PDFs whose rows share one predict call in serial --batch (default: 1)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="with --batch, overlap PDF reads and JSON writes with processing "
+                             "(background reader/writer threads)")
+    parser.add_argument("--prefetch", type=int, default=4,
+                        help="PDFs read ahead into memory by --pipeline (default: 4)")
+    parser.add_argument("--output-format", choices=OUTPUT_FORMATS, default="pretty",
+                        help="--pipeline output: indented JSON per PDF, compact JSON per PDF, "
+                             f"or one combined {JSONL_NAME} in path_out (default: pretty)")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write per-document/per-page stage timings and counters: "
+                             "JSON lines, or Prometheus text format if PATH ends in .prom")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="write cProfile stats (.pstats) of the slowest documents to DIR")
+    parser.add_argument("--profile-top", type=int, default=5,
+                        help="documents kept by --profile (default: 5)")
+    args = parser.parse_args()
+    path_in, path_out = args.path_in, args.path_out
+    if args.incremental and not args.cache:
+        parser.error("--incremental needs --cache")
+    if args.incremental and args.drop_repeats:
+        parser.error("--drop-repeats does not work with --incremental")
+    if args.incremental and args.chunk_pages:
+        parser.error("--chunk-pages does not work with --incremental")
+    if args.max_memory_mb and not args.chunk_pages:
+        parser.error("--max-memory-mb needs --chunk-pages")
+    if args.pipeline and not args.batch:
+        parser.error("--pipeline needs --batch")
+    if args.output_format != "pretty" and not args.pipeline:
+        parser.error("--output-format needs --pipeline")
 
-    # Expect either single or batch mode
-    path_in, path_out = sys.argv[1], sys.argv[2]
-    batch = ("--batch" in sys.argv)
+    if args.batch:
+        os.makedirs(path_out, exist_ok=True)
+        jobs = list_batch_jobs(path_in, path_out)
+        if not jobs:
+            # Nothing to do: exit before the model (and its imports) load
+            print(f"ℹ️  No PDFs found in {path_in}")
+            sys.exit(0)
 
-    booster = load_model("models/heading_model.txt")
+    sink = open_sink(args.metrics) if args.metrics else None
+    profiles = SlowestProfiles(args.profile_top) if args.profile else None
+
+    def finish_instrumentation():
+        if sink is not None:
+            sink.close()
+            print(f"📈 Metrics written to {args.metrics}")
+        if profiles is not None:
+            for path, seconds in profiles.write(args.profile):
+                print(f"🔬 {seconds:.2f}s  {path}")
+
+    if args.pipeline:
+        booster = cache = None
+        if args.workers <= 1:
+            booster = load_predictor(args.predictor, MODEL_PATH, args.predict_threads)
+            if args.cache:
+                cache = open_cache(args.cache, args.cache_max_mb, predictor=args.predictor,
+                                   layout=args.layout, drop_repeats=args.drop_repeats)
+        if sink is not None:
+            # Reader/writer thread events (bytes_read/bytes_written) are recorded here
+            set_recorder(Recorder())
+        writer = OutputWriter(args.output_format, os.path.join(path_out, JSONL_NAME))
+        cache_stats = {}
+        try:
+            failures = run_batch_pipelined(jobs, writer, args.workers, args.prefetch,
+                                           booster=booster, cache=cache, cache_dir=args.cache,
+                                           cache_max_mb=args.cache_max_mb,
+                                           cache_stats=cache_stats, predictor=args.predictor,
+                                           predict_threads=args.predict_threads or 1,
+                                           page_workers=args.page_workers,
+                                           predict_batch=args.predict_batch,
+                                           sink=sink, profiles=profiles,
+                                           incremental=args.incremental, layout=args.layout,
+                                           drop_repeats=args.drop_repeats,
+                                           chunk_pages=args.chunk_pages,
+                                           max_memory_mb=args.max_memory_mb)
+        finally:
+            writer.close()
+            if sink is not None:
+                sink.write(get_recorder().drain())
+            finish_instrumentation()
+        if args.output_format == "jsonl":
+            print(f"✅ Saved {writer.written} outline(s) to {os.path.join(path_out, JSONL_NAME)}")
+        if cache is not None:
+            print(f"🗄️  Cache: {cache.summary()}")
+        elif args.cache:
+            print(f"🗄️  Cache: {format_stats(cache_stats)}")
+        if failures:
+            print(f"❌ {len(failures)} PDF(s) failed")
+            sys.exit(1)
+        sys.exit(0)
+
+    if args.batch and args.workers > 1:
+        cache_stats = {}
+        failures = run_batch_parallel(jobs, args.workers,
+                                      cache_dir=args.cache, cache_max_mb=args.cache_max_mb,
+                                      cache_stats=cache_stats, predictor=args.predictor,
+                                      predict_threads=args.predict_threads or 1,
+                                      sink=sink, profiles=profiles,
+                                      incremental=args.incremental, layout=args.layout,
+                                      drop_repeats=args.drop_repeats,
+                                      chunk_pages=args.chunk_pages,
+                                      max_memory_mb=args.max_memory_mb)
+        finish_instrumentation()
+        if args.cache:
+            print(f"🗄️  Cache: {format_stats(cache_stats)}")
+        if failures:
+            print(f"❌ {len(failures)} PDF(s) failed")
+            sys.exit(1)
+        sys.exit(0)
+
+    booster = load_predictor(args.predictor, MODEL_PATH, args.predict_threads)
     # feature names loader already uses models/feature_names.json
+    cache = (open_cache(args.cache, args.cache_max_mb, predictor=args.predictor,
+                        layout=args.layout, drop_repeats=args.drop_repeats)
+             if args.cache else None)
+    if sink is not None:
+        set_recorder(Recorder())
 
-    if batch:
-        os.makedirs(path_out, exist_ok=True)
-        for fname in sorted(os.listdir(path_in)):
-            if not fname.lower().endswith(".pdf"):
-                continue
-            in_pdf  = os.path.join(path_in, fname)
-            base    = os.path.splitext(fname)[0]
-            out_json= os.path.join(path_out, f"{base}_outline.json")
-            print(f"▶ Processing {fname}")
-            result = process_pdf(in_pdf, booster)
-            save_json(result, out_json)
+    if args.batch:
+        groups = [jobs[start:start + args.predict_batch]
+                  for start in range(0, len(jobs), args.predict_batch)]
     else:
-        result = process_pdf(path_in, booster)
-        save_json(result, path_out)
+        groups = [[(path_in, path_out)]]
+    failures = {}
+    try:
+        for group in groups:
+            with profiling(profiles is not None) as prof:
+                if args.batch:
+                    for in_pdf, _ in group:
+                        print(f"▶ Processing {os.path.basename(in_pdf)}")
+                # A failing group is retried one PDF at a time, as in the
+                # pipelined and process-pool modes
+                outputs = _process_group([(in_pdf, out_json, in_pdf) for in_pdf, out_json in group],
+                                         booster, failures, args.page_workers, cache,
+                                         args.incremental, args.layout, args.drop_repeats,
+                                         args.chunk_pages, args.max_memory_mb)
+                for out_json, result, name in outputs:
+                    with scope(doc=name):
+                        save_json(result, out_json)
+            if profiles is not None:
+                profiles.add("+".join(os.path.basename(in_pdf) for in_pdf, _ in group),
+                             prof["seconds"], prof["stats"])
+            if sink is not None:
+                sink.write(get_recorder().drain())
+    finally:
+        finish_instrumentation()
+    if cache is not None:
+        print(f"🗄️  Cache: {cache.summary()}")
+    if failures:
+        print(f"❌ {len(failures)} PDF(s) failed")
+        sys.exit(1)
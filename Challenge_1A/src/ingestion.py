@@ -1,64 +1,250 @@
-import fitz
+import re
+import hashlib
+
+from blocks import TextBlock
+from instrumentation import Recorder, set_recorder, get_recorder, enabled, span, count
 
 class PDFParseError(Exception):
     """Custom exception for PDF parsing failures."""
     pass
 
-def extract_text_blocks(pdf_path, min_text_length=1):
+def _open_document(pdf_path):
+    """Open a PDF given as a file path or as in-memory bytes."""
+    import fitz  # deferred: PyMuPDF is slow to import
+    try:
+        if isinstance(pdf_path, (bytes, bytearray, memoryview)):
+            return fitz.open(stream=pdf_path, filetype="pdf")
+        return fitz.open(pdf_path)
+    except Exception as e:
+        raise PDFParseError(f"Cannot open PDF: {e}")
+
+def _page_text_blocks(page, page_num, min_text_length, compact=True):
     """
-    Extracts structured text blocks from a PDF.
+    Filtered text blocks of one fitz page: TextBlock records, or the raw
+    PyMuPDF dicts annotated with page info when compact is False.
+    """
+    try:
+        with span("get_text", page=page_num):
+            data = page.get_text("dict")
+        blocks = data.get("blocks", [])
+    except Exception as e:
+        raise PDFParseError(f"Failed to extract page {page_num}: {e}")
+
+    # Filter out non‑text blocks or extremely small ones
+    text_blocks = []
+    rect = page.rect
+    for b in blocks:
+        # Some blocks represent images or drawings: skip if no 'lines'
+        if "lines" not in b or not b["lines"]:
+            continue
+
+        # Compute total text length in this block
+        text = "".join(span["text"] for line in b["lines"] for span in line["spans"])
+        if len(text.strip()) < min_text_length:
+            continue
+
+        if compact:
+            text_blocks.append(TextBlock.from_dict(b, page_num, rect.width, rect.height))
+            continue
+
+        # Attach page number for downstream reference
+        b["_page_num"] = page_num
+        b["_page_width"]  = rect.width
+        b["_page_height"] = rect.height
+        text_blocks.append(b)
+
+    if not text_blocks:
+        # Optional: warn or treat empty pages as non‑fatal
+        # e.g., print(f"Warning: no text on page {page_num}")
+        pass
+
+    if enabled():
+        count("pages", page=page_num)
+        count("blocks", len(text_blocks), page=page_num)
+        count("spans", sum(b.n_spans if compact else
+                           sum(len(line["spans"]) for line in b["lines"])
+                           for b in text_blocks), page=page_num)
+    return text_blocks
+
+_REFERENCE = re.compile(rb"(\d+) 0 R")
+
+def _object_digest(doc, xref, memo):
+    """
+    SHA-256 digest of PDF object `xref`, its stream and, recursively, every
+    object it references (a font's descriptor, FontFile and ToUnicode
+    streams, descendant fonts, ...). memo maps xref -> digest, so objects
+    shared by many pages are hashed once per document.
+    """
+    if xref in memo:
+        return memo[xref]
+    memo[xref] = b"cycle:%d" % xref  # placeholder while this object is being hashed
+    h = hashlib.sha256()
+    source = doc.xref_object(xref, compressed=True).encode("utf-8")
+    h.update(source)
+    if doc.xref_is_stream(xref):
+        h.update(doc.xref_stream_raw(xref) or b"")
+    for ref in map(int, _REFERENCE.findall(source)):
+        if 0 < ref < doc.xref_length():
+            h.update(_object_digest(doc, ref, memo))
+    memo[xref] = h.digest()
+    return memo[xref]
+
+def page_fingerprint(page, memo=None):
+    """
+    SHA-256 hex digest of what a page's text extraction depends on: its
+    geometry, its content streams, its resource dictionary, the streams
+    of the form XObjects it draws and the font objects it uses (with the
+    embedded font programs and ToUnicode maps they reference). Unchanged
+    pages of a revised PDF keep their fingerprint even when other pages
+    are added, removed or edited.
+
+    memo: a dict shared by the pages of one document, caching the digests
+    of the font objects they have in common.
+    """
+    doc = page.parent
+    memo = {} if memo is None else memo
+    h = hashlib.sha256()
+    h.update(repr((tuple(page.rect), page.rotation)).encode("utf-8"))
+    h.update(page.read_contents())
+    kind, value = doc.xref_get_key(page.xref, "Resources")
+    if kind == "xref":
+        value = doc.xref_object(int(value.split()[0]))
+    h.update(value.encode("utf-8"))
+    for xref, *_ in page.get_xobjects():
+        h.update(doc.xref_stream_raw(xref) or b"")
+    for xref, *_ in page.get_fonts(full=True):
+        if xref > 0:
+            h.update(_object_digest(doc, xref, memo))
+    return h.hexdigest()
+
+def iter_page_fingerprints(pdf_path, min_text_length=1, extract=lambda fingerprint: True):
+    """
+    Yields (fingerprint, blocks) for every page in order, where blocks are
+    the page's TextBlock records, or None when extract(fingerprint) is
+    false (the caller already has them). Unlike iter_text_blocks, a
+    document without text is not an error here.
+    """
+    with _open_document(pdf_path) as doc:
+        memo = {}
+        for page_num, page in enumerate(doc, start=1):
+            fingerprint = page_fingerprint(page, memo)
+            if extract(fingerprint):
+                yield fingerprint, _page_text_blocks(page, page_num, min_text_length)
+            else:
+                yield fingerprint, None
+
+# The PDF (path or bytes) of the pool's document, set once per worker
+_worker_pdf = None
+
+def _init_range_worker(pdf_path):
+    """Pool initializer: receive the document once, not with every task."""
+    global _worker_pdf
+    _worker_pdf = pdf_path
+
+def _extract_page_range(start, stop, min_text_length, compact, record=False):
+    """
+    Worker task: open the worker's PDF separately and extract pages [start, stop).
+    Returns (pages, instrumentation events recorded for them when record is set).
+    """
+    # A fresh recorder: a forked worker would otherwise inherit the parent's events
+    previous = set_recorder(Recorder() if record else None)
+    try:
+        with _open_document(_worker_pdf) as doc:
+            chunk = [
+                _page_text_blocks(doc[i], i + 1, min_text_length, compact)
+                for i in range(start, stop)
+            ]
+        return chunk, get_recorder().drain() if record else []
+    finally:
+        set_recorder(previous)
+
+def iter_text_blocks(pdf_path, min_text_length=1, workers=1, pages_per_task=None,
+                     compact=True):
+    """
+    Streaming version of extract_text_blocks: yields one page's filtered
+    blocks at a time, in page order, as soon as that page is ready.
 
     Args:
-      pdf_path (str): Path to the PDF file.
+      pdf_path (str | bytes): Path to the PDF file, or its content.
       min_text_length (int): Ignore blocks shorter than this.
+      workers (int): With more than one worker, page ranges of
+                     `pages_per_task` pages are extracted in separate
+                     processes (each receiving the PDF once and opening
+                     its own fitz document) and merged back in page order.
+      pages_per_task (int | None): Pages per worker task (default: the
+                     page count split evenly across the workers).
+      compact (bool): Yield TextBlock records (default) instead of the
+                      raw PyMuPDF block dicts.
 
-    Returns:
-      List[List[dict]]: Outer list per page; inner list of blocks.
-                        Each block is PyMuPDF dict with keys:
-                        'bbox', 'lines' (each line has 'spans').
+    Yields:
+      List[TextBlock] (or List[dict]): the blocks of one page, possibly empty.
     Raises:
-      PDFParseError: if the PDF cannot be opened or has no extractable text.
+      PDFParseError: if the PDF cannot be opened, a page fails, or the
+                     document has no extractable text (raised once the
+                     last page has been yielded).
     """
-    try:
-        doc = fitz.open(pdf_path)
-    except Exception as e:
-        raise PDFParseError(f"Cannot open PDF: {e}")
+    found_text = False
+    if workers <= 1:
+        with _open_document(pdf_path) as doc:
+            for page_num, page in enumerate(doc, start=1):
+                text_blocks = _page_text_blocks(page, page_num, min_text_length, compact)
+                found_text = found_text or bool(text_blocks)
+                yield text_blocks
+    else:
+        with _open_document(pdf_path) as doc:
+            page_count = doc.page_count
+        pages_per_task = pages_per_task or max(1, -(-page_count // workers))
+        ranges = [
+            (start, min(start + pages_per_task, page_count))
+            for start in range(0, page_count, pages_per_task)
+        ]
+        # Keep only a small window of ranges in flight so finished pages
+        # do not pile up in memory ahead of the consumer
+        window = 2 * workers
+        record = enabled()
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_range_worker,
+                                 initargs=(pdf_path,)) as pool:
+            pending = [
+                pool.submit(_extract_page_range, start, stop,
+                            min_text_length, compact, record)
+                for start, stop in ranges[:window]
+            ]
+            next_range = len(pending)
+            while pending:
+                chunk, events = pending.pop(0).result()
+                if events:
+                    get_recorder().extend(events)
+                if next_range < len(ranges):
+                    start, stop = ranges[next_range]
+                    pending.append(pool.submit(
+                        _extract_page_range, start, stop,
+                        min_text_length, compact, record))
+                    next_range += 1
+                for text_blocks in chunk:
+                    found_text = found_text or bool(text_blocks)
+                    yield text_blocks
 
-    all_pages = []
-    for page_num, page in enumerate(doc, start=1):
-        try:
-            data = page.get_text("dict")
-            blocks = data.get("blocks", [])
-        except Exception as e:
-            raise PDFParseError(f"Failed to extract page {page_num}: {e}")
-
-        # Filter out non‑text blocks or extremely small ones
-        text_blocks = []
-        for b in blocks:
-            # Some blocks represent images or drawings: skip if no 'lines'
-            if "lines" not in b or not b["lines"]:
-                continue
-
-            # Compute total text length in this block
-            text = "".join(span["text"] for line in b["lines"] for span in line["spans"])
-            if len(text.strip()) < min_text_length:
-                continue
-
-            # Attach page number for downstream reference
-            b["_page_num"] = page_num
-            rect = page.rect
-            b["_page_width"]  = rect.width
-            b["_page_height"] = rect.height
-            text_blocks.append(b)
-
-        if not text_blocks:
-            # Optional: warn or treat empty pages as non‑fatal
-            # e.g., print(f"Warning: no text on page {page_num}")
-            pass
-
-        all_pages.append(text_blocks)
-
-    if not any(all_pages):
+    if not found_text:
         raise PDFParseError("No text blocks found in entire document.")
 
-    return all_pages
+def extract_text_blocks(pdf_path, min_text_length=1, workers=1, compact=True):
+    """
+    Extracts structured text blocks from a PDF.
+
+    Args:
+      pdf_path (str | bytes): Path to the PDF file, or its content.
+      min_text_length (int): Ignore blocks shorter than this.
+      workers (int): Processes to split the page ranges across
+                     (see iter_text_blocks).
+      compact (bool): Return TextBlock records (default). With False,
+                      each block is the PyMuPDF dict with keys
+                      'bbox', 'lines' (each line has 'spans').
+
+    Returns:
+      List[List[TextBlock]]: Outer list per page; inner list of blocks.
+    Raises:
+      PDFParseError: if the PDF cannot be opened or has no extractable text.
+    """
+    return list(iter_text_blocks(pdf_path, min_text_length, workers=workers,
+                                 compact=compact))
@@ -0,0 +1,274 @@
+"""
+Stage-level instrumentation for the 1A pipeline.
+
+Pipeline code calls span(), count() and scope() unconditionally; they are
+no-ops until a Recorder is installed with set_recorder(), so a normal run
+pays one global lookup per call. Events are plain dicts
+
+  {"type": "span", "name": "knn", "value": 0.0012, "doc": "file01.pdf", "page": 3}
+  {"type": "counter", "name": "blocks", "value": 41, "doc": "file01.pdf", "page": 3}
+
+and are handed to a sink (JSON lines or a Prometheus text file) by the CLI.
+Batch workers drain their recorder after each job and return the events to
+the parent, the same way cache stats travel.
+
+Profiling is separate: profiling() runs a block under cProfile, and
+SlowestProfiles keeps the stats of the N slowest documents and writes them
+as .pstats files (readable with `python -m pstats` or snakeviz).
+"""
+import os
+import re
+import json
+import time
+import heapq
+import marshal
+import threading
+from contextlib import contextmanager, nullcontext
+
+_recorder = None
+_context = threading.local()
+_NULL = nullcontext()
+
+
+class Recorder:
+    """Collects span and counter events in memory until drained."""
+
+    def __init__(self):
+        self.events = []
+
+    def record(self, kind, name, value, labels):
+        self.events.append({"type": kind, "name": name, "value": value, **labels})
+
+    def extend(self, events):
+        """Add events recorded elsewhere (e.g. a page worker) under the current labels."""
+        outer = current_labels()
+        self.events.extend({**outer, **e} for e in events)
+
+    def drain(self):
+        events, self.events = self.events, []
+        return events
+
+
+def set_recorder(recorder):
+    """Install `recorder` (or None to disable); returns the previous one."""
+    global _recorder
+    previous, _recorder = _recorder, recorder
+    return previous
+
+
+def get_recorder():
+    return _recorder
+
+
+def enabled():
+    return _recorder is not None
+
+
+def current_labels():
+    return getattr(_context, "labels", {})
+
+
+@contextmanager
+def _labelled(extra):
+    outer = current_labels()
+    _context.labels = {**outer, **extra}
+    try:
+        yield
+    finally:
+        _context.labels = outer
+
+
+def scope(**extra):
+    """Attach labels (doc=..., page=...) to every event recorded inside the block."""
+    if _recorder is None:
+        return _NULL
+    return _labelled(extra)
+
+
+@contextmanager
+def _timed(recorder, name, extra):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.record("span", name, time.perf_counter() - t0,
+                        {**current_labels(), **extra})
+
+
+def span(name, **extra):
+    """Time the enclosed block as a `name` span."""
+    if _recorder is None:
+        return _NULL
+    return _timed(_recorder, name, extra)
+
+
+def count(name, value=1, **extra):
+    """Record a counter increment."""
+    if _recorder is not None:
+        _recorder.record("counter", name, value, {**current_labels(), **extra})
+
+
+def doc_name(pdf):
+    """Label for a PDF given as a path or as in-memory bytes."""
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return f"<{len(pdf)} bytes>"
+    return os.path.basename(pdf)
+
+
+def rss_mb():
+    """
+    Resident set size of this process in MB, from /proc; peak RSS where
+    /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, IndexError):
+        import sys
+        import resource
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+
+
+# --- Sinks ---
+
+class JsonLinesSink:
+    """Appends one JSON object per event."""
+
+    def __init__(self, path):
+        self.f = open(path, "a", encoding="utf-8")
+
+    def write(self, events):
+        for event in events:
+            self.f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+class PrometheusSink:
+    """
+    Aggregates events per (name, labels) and writes a Prometheus text
+    exposition file on close, e.g. for node_exporter's textfile collector:
+
+      pdf_outline_knn_seconds_sum{doc="file01.pdf"} 0.0123
+      pdf_outline_knn_seconds_count{doc="file01.pdf"} 7
+      pdf_outline_blocks_total{doc="file01.pdf"} 123
+
+    The page label is dropped so the series count stays per document.
+    """
+
+    PREFIX = "pdf_outline_"
+
+    def __init__(self, path):
+        self.path = path
+        self.spans = {}     # (name, labels) -> [sum, count]
+        self.counters = {}  # (name, labels) -> total
+
+    def write(self, events):
+        for e in events:
+            key = (e["name"], tuple(sorted((k, str(v)) for k, v in e.items()
+                                           if k not in ("type", "name", "value", "page"))))
+            if e["type"] == "span":
+                agg = self.spans.setdefault(key, [0.0, 0])
+                agg[0] += e["value"]
+                agg[1] += 1
+            else:
+                self.counters[key] = self.counters.get(key, 0) + e["value"]
+
+    @staticmethod
+    def _labels(pairs):
+        if not pairs:
+            return ""
+        esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+    def close(self):
+        lines = []
+        metric = lambda name: self.PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+        for name in sorted({n for n, _ in self.spans}):
+            m = metric(name) + "_seconds"
+            lines.append(f"# TYPE {m} summary")
+            for (n, pairs), (total, cnt) in sorted(self.spans.items()):
+                if n == name:
+                    lines.append(f"{m}_sum{self._labels(pairs)} {total:.6f}")
+                    lines.append(f"{m}_count{self._labels(pairs)} {cnt}")
+        for name in sorted({n for n, _ in self.counters}):
+            m = metric(name) + "_total"
+            lines.append(f"# TYPE {m} counter")
+            for (n, pairs), total in sorted(self.counters.items()):
+                if n == name:
+                    lines.append(f"{m}{self._labels(pairs)} {total}")
+        # Atomic replace: a scraper never sees a half-written file
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.path)
+
+
+def open_sink(path):
+    """Prometheus text format for *.prom paths, JSON lines otherwise."""
+    if path.endswith(".prom"):
+        return PrometheusSink(path)
+    return JsonLinesSink(path)
+
+
+# --- Profiling ---
+
+@contextmanager
+def profiling(active=True):
+    """
+    Run the enclosed block under cProfile. Yields a dict that holds
+    'seconds' and 'stats' (a pstats-compatible, picklable dict) once the
+    block exits, even if it raised.
+    """
+    out = {"seconds": 0.0, "stats": None}
+    if not active:
+        yield out
+        return
+    import cProfile
+    prof = cProfile.Profile()
+    t0 = time.perf_counter()
+    prof.enable()
+    try:
+        yield out
+    finally:
+        prof.disable()
+        out["seconds"] = time.perf_counter() - t0
+        prof.create_stats()
+        out["stats"] = prof.stats
+
+
+class SlowestProfiles:
+    """Keeps the cProfile stats of the top_n slowest documents seen."""
+
+    def __init__(self, top_n=5):
+        self.top_n = top_n
+        self._heap = []  # min-heap of (seconds, seq, name, stats)
+        self._seq = 0
+
+    def add(self, name, seconds, stats):
+        if stats is None or self.top_n <= 0:
+            return
+        self._seq += 1
+        item = (seconds, self._seq, name, stats)
+        if len(self._heap) < self.top_n:
+            heapq.heappush(self._heap, item)
+        elif seconds > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+
+    def write(self, out_dir):
+        """Write <rank>_<name>.pstats files, slowest first; returns [(path, seconds)]."""
+        os.makedirs(out_dir, exist_ok=True)
+        written = []
+        ranked = sorted(self._heap, key=lambda item: -item[0])
+        for rank, (seconds, _, name, stats) in enumerate(ranked, start=1):
+            safe = re.sub(r"[^\w.+-]", "_", name)
+            path = os.path.join(out_dir, f"{rank:02d}_{safe}.pstats")
+            with open(path, "wb") as f:
+                # Same format as cProfile.Profile.dump_stats
+                marshal.dump(stats, f)
+            written.append((path, seconds))
+        return written
@@ -0,0 +1,180 @@
+"""
+Page layout analysis: columns, reading order and vertical neighbours.
+
+Runs on one page's blocks before graph construction, with sorts and
+binary searches only (O(n log n) per page):
+
+1. Columns. A sweep line over the x-intervals of the narrow blocks (at
+   most NARROW_FRACTION of the page's text width) tracks how many blocks
+   cover each x. Gutters are the stretches covered by at most
+   GUTTER_COVERAGE of them, so a few lines overflowing into the next
+   column do not merge two columns. Columns are the stretches between
+   gutters. A column needs MIN_COLUMN_BLOCKS blocks starting in it, which
+   keeps a centred page number or a lone margin note from becoming one.
+2. Membership. A block belongs to the column it overlaps most, unless
+   it covers at least half of two or more columns (a title across the
+   page); then it is a spanning block. A block that overlaps no column
+   (a rule in the gutter) is spanning too.
+3. Reading order. The spanning blocks, top to bottom, cut the page into
+   bands. Each band is read column by column, left to right and top to
+   bottom within a column. A spanning block comes after the band above it.
+4. Neighbours. The block above (below) a block is the nearest block,
+   by top edge, in the same column. A spanning block takes part in
+   every column it overlaps.
+
+layout_page() returns the blocks in reading order together with a
+PageLayout whose arrays index that order, so node_idx, features and
+the outline all follow reading order.
+"""
+import numpy as np
+
+NARROW_FRACTION = 0.6
+GUTTER_COVERAGE = 0.05
+MIN_COLUMN_BLOCKS = 2
+
+
+class PageLayout:
+    """
+    Layout of one page, indexed like the reordered blocks.
+
+    column: column of each block, -1 for spanning blocks
+    above, below: index of the nearest block above/below in the same
+                  column, -1 if there is none
+    n_columns: number of columns found
+    """
+    __slots__ = ("column", "above", "below", "n_columns")
+
+    def __init__(self, column, above, below, n_columns):
+        self.column = column
+        self.above = above
+        self.below = below
+        self.n_columns = n_columns
+
+
+def _bbox_array(blocks):
+    return np.asarray([b["bbox"] if isinstance(b, dict) else b.bbox for b in blocks],
+                      dtype=float).reshape(len(blocks), 4)
+
+
+def find_columns(x0, x1, narrow):
+    """
+    (left, right) edges of the columns of a page: stretches of x covered
+    by more than GUTTER_COVERAGE of the narrow blocks, found by sweeping
+    their interval start/end events in x order.
+    """
+    lo, hi = x0[narrow], x1[narrow]
+    if len(lo) == 0:
+        return np.zeros(0), np.zeros(0)
+    xs = np.concatenate((lo, hi))
+    delta = np.concatenate((np.ones(len(lo)), -np.ones(len(hi))))
+    # Starts before ends at the same x: touching blocks leave no gutter
+    order = np.lexsort((-delta, xs))
+    xs, delta = xs[order], delta[order]
+    # Coverage of [xs[i], xs[i+1])
+    dense = np.cumsum(delta)[:-1] > int(GUTTER_COVERAGE * len(lo))
+    edges = np.diff(np.concatenate(([0], dense.astype(np.int8), [0])))
+    left, right = xs[np.flatnonzero(edges == 1)], xs[np.flatnonzero(edges == -1)]
+    # Blocks starting in each column
+    starts = (np.searchsorted(np.sort(lo), right, side="left")
+              - np.searchsorted(np.sort(lo), left, side="left"))
+    keep = starts >= MIN_COLUMN_BLOCKS
+    return left[keep], right[keep]
+
+
+def analyze_layout(bbox):
+    """
+    Column, reading order and neighbours of the blocks with these (n, 4)
+    bboxes. Returns (order, column, above, below, n_columns): order is a
+    permutation of the blocks; column/above/below index the original
+    blocks.
+    """
+    n = len(bbox)
+    x0, y0, x1 = bbox[:, 0], bbox[:, 1], bbox[:, 2]
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty, 0
+    text_width = x1.max() - x0.min()
+    narrow = (x1 - x0) <= NARROW_FRACTION * text_width
+    left, right = find_columns(x0, x1, narrow)
+    if len(left) == 0:
+        # No narrow columns (e.g. full-width paragraphs): one column
+        left, right = x0.min(keepdims=True), x1.max(keepdims=True)
+
+    # Touched columns [first, last] of every block; only the outer two can
+    # be partly covered
+    first = np.searchsorted(right, x0, side="right")
+    last = np.searchsorted(left, x1, side="left") - 1
+    touches = first <= last
+    f, l = np.minimum(first, len(left) - 1), np.maximum(last, 0)
+    width = right - left
+    over_first = np.minimum(x1, right[f]) - np.maximum(x0, left[f])
+    over_last = np.minimum(x1, right[l]) - np.maximum(x0, left[l])
+    # Columns covered at least half
+    first_half = f + (over_first < 0.5 * width[f])
+    last_half = l - (over_last < 0.5 * width[l])
+    spanning = ~touches | (last_half > first_half)
+    column = np.where(last_half == first_half, first_half,
+                      np.where(over_first >= over_last, f, l))
+    column = np.where(spanning, -1, column).astype(np.int64)
+    first, last = np.where(touches, first_half, 0), np.where(touches, last_half, -1)
+
+    # Bands: number of spanning blocks starting above each block. For a
+    # spanning block that is its own rank, so it sorts after its band.
+    band = np.searchsorted(np.sort(y0[spanning]), y0, side="left")
+    order = np.lexsort((x0, y0, column, spanning, band))
+
+    # Column lists: a spanning block joins every column it overlaps
+    cover = np.where(spanning, np.maximum(last - first + 1, 0), 1)
+    entry_block = np.repeat(np.arange(n), cover)
+    offsets = np.arange(len(entry_block)) - np.repeat(np.cumsum(cover) - cover, cover)
+    entry_col = np.where(spanning[entry_block], first[entry_block] + offsets,
+                         column[entry_block])
+    y_rank = np.unique(y0, return_inverse=True)[1].ravel()
+    key = entry_col * (n + 1) + y_rank[entry_block]
+    by_key = np.argsort(key, kind="stable")
+    sorted_key = key[by_key]
+    sorted_block = entry_block[by_key]
+
+    # Nearest entry with a strictly smaller / larger top edge in the same column
+    pos_above = np.searchsorted(sorted_key, key, side="left") - 1
+    pos_below = np.searchsorted(sorted_key, key, side="right")
+    ok_above = (pos_above >= 0) & (sorted_key[np.maximum(pos_above, 0)] // (n + 1) == entry_col)
+    pos_below_c = np.minimum(pos_below, len(sorted_key) - 1)
+    ok_below = (pos_below < len(sorted_key)) & (sorted_key[pos_below_c] // (n + 1) == entry_col)
+    cand_above = np.where(ok_above, sorted_block[np.maximum(pos_above, 0)], -1)
+    cand_below = np.where(ok_below, sorted_block[pos_below_c], -1)
+
+    # Per block: the closest candidate over its entries (largest y0 above,
+    # smallest y0 below; lower index on ties)
+    above = np.full(n, -1, dtype=np.int64)
+    below = np.full(n, -1, dtype=np.int64)
+    has = cand_above >= 0
+    if has.any():
+        sel = np.lexsort((cand_above[has], -y0[cand_above[has]], entry_block[has]))
+        blk, cand = entry_block[has][sel], cand_above[has][sel]
+        firsts = np.concatenate(([True], blk[1:] != blk[:-1]))
+        above[blk[firsts]] = cand[firsts]
+    has = cand_below >= 0
+    if has.any():
+        sel = np.lexsort((cand_below[has], y0[cand_below[has]], entry_block[has]))
+        blk, cand = entry_block[has][sel], cand_below[has][sel]
+        firsts = np.concatenate(([True], blk[1:] != blk[:-1]))
+        below[blk[firsts]] = cand[firsts]
+    return order, column, above, below, len(left)
+
+
+def layout_page(blocks):
+    """
+    (blocks in reading order, PageLayout indexed by that order) for one
+    page of TextBlock records or PyMuPDF dicts.
+    """
+    order, column, above, below, n_columns = analyze_layout(_bbox_array(blocks))
+    # Position of every original block in the new order
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+
+    def remap(idx):
+        return np.where(idx >= 0, rank[np.maximum(idx, 0)], -1)[order]
+
+    return ([blocks[i] for i in order],
+            PageLayout(column[order], remap(above), remap(below), n_columns))
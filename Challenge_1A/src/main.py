@@ -1,88 +1,93 @@
-# from ingestion import extract_text_blocks, PDFParseError
-# from graph import build_page_graph
-# from features  import build_feature_dataframe
-
-# -- ingestion.py
-# if __name__ == "__main__":
-#     import sys
-#     pdf_path = sys.argv[1]  # e.g., python main.py sample.pdf
-
-#     try:
-#         pages = extract_text_blocks(pdf_path)
-#         for pg_num, blocks in enumerate(pages, start=1):
-#             print(f"Page {pg_num}: {len(blocks)} text blocks")
-#     except PDFParseError as e:
-#         print("Error:", e)
-#         sys.exit(1)
-
-# -- Graph.py
-# pdf_path = "data/samples/sample2.pdf"
-# pages = extract_text_blocks(pdf_path)
-
-# # Build graphs for all pages
-# page_graphs = [build_page_graph(blocks) for blocks in pages]
-
-# # Quick sanity check: print node & edge counts
-# for page_num, G in enumerate(page_graphs, start=1):
-#     print(f"Page {page_num}: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
-
-# -- Features.py
-# pdf_path = "data/samples/sample2.pdf"
-# pages = extract_text_blocks(pdf_path)
-# graphs = [build_page_graph(blks) for blks in pages]
-# df = build_feature_dataframe(graphs)
-
-# # Quick check
-# # print(df.head())
-# # print("Total blocks:", len(df))
-
-# # in main.py, just after building df:
-# def get_snippet(row):
-#     # Cast page_idx and node_idx to int
-#     p = int(row["page_idx"]) - 1
-#     n = int(row["node_idx"])
-#     # Grab the first line’s spans for that block
-#     spans = pages[p][n]["lines"][0]["spans"]
-#     text = "".join(span["text"] for span in spans)
-#     return text[:50]  # first 50 chars
-
-# df["text_snippet"] = df.apply(get_snippet, axis=1)
-# df.to_csv("data/labels/unlabeled_blocks.csv", index=False)
-# print("Exported feature table for labeling: data/labels/unlabeled_blocks.csv")
-
 import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from ingestion import extract_text_blocks
 from graph     import build_page_graph
 from features  import build_feature_dataframe
+from layout    import layout_page
+from repeats   import drop_repeated
+from cache     import file_digest
+import glob
+from feature_store import STORE_DIR, write_document, stored_digest, import_csv
 
 PDF_DIR    = "data/samples"
 OUT_DIR    = "data/labels"
 
-for pdf_file in os.listdir(PDF_DIR):
-    if not pdf_file.lower().endswith(".pdf"):
-        continue
 
-    pdf_path = os.path.join(PDF_DIR, pdf_file)
-    # 1) Ingest → graph → features
+def export_document(pdf_path, store_dir=STORE_DIR, csv_dir=None, force=False, layout=False,
+                    drop_repeats=False):
+    """
+    Ingest → graph → features for one PDF and store them under its doc id
+    (the file name without extension). Returns (doc_id, rows or None if
+    the stored copy was already up to date).
+
+    layout: blocks in column reading order with same-column above/below
+    features, as inference.py --layout computes them.
+    drop_repeats: without running headers/footers, as inference.py
+    --drop-repeats.
+    """
+    doc_id = os.path.splitext(os.path.basename(pdf_path))[0]   # e.g. "sample1"
+    # The feature variant is part of the stored digest, so switching
+    # --layout/--drop-repeats on or off rebuilds the document
+    digest = (file_digest(pdf_path) + ("+layout" if layout else "")
+              + ("+norepeats" if drop_repeats else ""))
+    if not force and stored_digest(store_dir, doc_id) == digest:
+        return doc_id, None
+
+    # 1) Ingest → (drop repeats) → (layout) → graph → features
     pages = extract_text_blocks(pdf_path)
+    if drop_repeats:
+        pages = drop_repeated(pages)[0]
+    layouts = None
+    if layout:
+        pages, layouts = map(list, zip(*(layout_page(blks) for blks in pages)))
     graphs = [build_page_graph(blks) for blks in pages]
-    df = build_feature_dataframe(graphs)
+    df = build_feature_dataframe(graphs, layouts)
 
     # 2) Add snippet so you know which block is which
-    def get_snip(row):
-        p = int(row.page_idx) - 1
-        n = int(row.node_idx)
-        spans = pages[p][n]["lines"][0]["spans"]
-        return "".join(s["text"] for s in spans)[:50]
-    df["text_snippet"] = df.apply(get_snip, axis=1)
-
-    # 3) Build output filename
-    base = os.path.splitext(pdf_file)[0]            # e.g. "sample1"
-    csv_name = f"{base}_blocks_unlabeled.csv"     # e.g. "sample1_blocks_unlabeled.csv"
-    out_path = os.path.join(OUT_DIR, csv_name)
-
-    # 4) Save it
-    os.makedirs(OUT_DIR, exist_ok=True)
-    df.to_csv(out_path, index=False)
-    print(f"Exported {out_path}")
-
+    df["text_snippet"] = df.pop("text").str[:50]
+
+    # 3) Save it
+    write_document(store_dir, doc_id, df, source_digest=digest)
+    if csv_dir:
+        # Spreadsheet copy for labelling: data/labels/sample1_blocks_unlabeled.csv
+        os.makedirs(csv_dir, exist_ok=True)
+        df.to_csv(os.path.join(csv_dir, f"{doc_id}_blocks_unlabeled.csv"), index=False)
+    return doc_id, len(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the training feature store from PDFs.")
+    parser.add_argument("--pdf-dir", default=PDF_DIR)
+    parser.add_argument("--store", default=STORE_DIR, help="Parquet feature store directory")
+    parser.add_argument("--csv-dir", nargs="?", const=OUT_DIR, default=None,
+                        help=f"also export *_blocks_unlabeled.csv for labelling (default dir: {OUT_DIR})")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="rebuild documents that are up to date")
+    parser.add_argument("--layout", action="store_true",
+                        help="column-aware reading order and neighbours (for inference.py --layout)")
+    parser.add_argument("--drop-repeats", action="store_true",
+                        help="drop running headers/footers (for inference.py --drop-repeats)")
+    parser.add_argument("--import-csv", metavar="GLOB",
+                        help="store existing *_blocks_unlabeled.csv files instead of extracting PDFs, "
+                             "e.g. 'data/labels/*_blocks_unlabeled.csv'")
+    args = parser.parse_args()
+
+    if args.import_csv:
+        for csv_path in sorted(glob.glob(args.import_csv)):
+            doc_id = os.path.basename(csv_path).replace("_blocks_unlabeled.csv", "")
+            print(f"Imported {import_csv(args.store, csv_path, doc_id)}")
+        raise SystemExit(0)
+
+    pdfs = [os.path.join(args.pdf_dir, f) for f in sorted(os.listdir(args.pdf_dir))
+            if f.lower().endswith(".pdf")]
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(export_document, pdf, args.store, args.csv_dir, args.force,
+                               args.layout, args.drop_repeats): pdf
+                   for pdf in pdfs}
+        for fut in as_completed(futures):
+            doc_id, rows = fut.result()
+            if rows is None:
+                print(f"⏭️  {doc_id} unchanged")
+            else:
+                print(f"Exported {doc_id}: {rows} rows")
@@ -1,80 +1,161 @@
 import os
+import re
 import glob
+import time
+import random
 import pandas as pd
+import numpy as np
 import json
 import joblib
+import lightgbm as lgb
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from lightgbm import LGBMClassifier
+from sklearn.metrics import classification_report
+from sklearn.model_selection import GroupKFold
+from sklearn.utils.class_weight import compute_sample_weight
+from features import FEATURE_COLUMNS
+from feature_store import STORE_DIR, KEY_COLUMNS, read_features
 
-def load_all_labeled_data(feat_pattern, lab_pattern):
+def load_labels(lab_pattern):
     """
-    Merges features and labels from all PDF samples.
+    Labels from the labelled CSVs as (doc_id, page_idx, node_idx,
+    text_snippet, label); the doc id is the file name before
+    "_blocks_labeled.csv". text_snippet is "" where a CSV has none.
+    """
+    frames = []
+    for lab_path in sorted(glob.glob(lab_pattern)):
+        doc_id = os.path.basename(lab_path).replace("_blocks_labeled.csv", "")
+        df_lab = pd.read_csv(lab_path, dtype={"text_snippet": str},
+                             usecols=lambda c: c in ("page_idx", "node_idx", "text_snippet", "label"))
+        if "text_snippet" not in df_lab:
+            df_lab["text_snippet"] = ""
+        df_lab.insert(0, "doc_id", doc_id)
+        frames.append(df_lab[KEY_COLUMNS + ["text_snippet", "label"]])
+    return pd.concat(frames, ignore_index=True)
+
 
-    Args:
-      feat_pattern: glob for unlabeled feature CSVs,
-                    e.g. "data/labels/*_blocks_unlabeled.csv"
-      lab_pattern:  glob for labeled CSVs,
-                    e.g. "data/labels/*_blocks_labeled.csv"
+# What a spreadsheet shows instead of a cell it mangled (e.g. text starting with "-")
+SPREADSHEET_ERRORS = {"#NAME?", "#VALUE!", "#REF!", "#N/A", "#DIV/0!", "#NUM!", "#NULL!"}
 
-    Returns:
-      A single pandas.DataFrame with all features + 'label' column.
+
+def _normalize_snippet(text):
+    """
+    Snippet as compared: stripped, numbers as numbers (spreadsheets turn
+    "1. " into "1"), spreadsheet error values as missing.
     """
-    feat_files = sorted(glob.glob(feat_pattern))
-    lab_files  = sorted(glob.glob(lab_pattern))
+    text = "" if pd.isna(text) else str(text).strip()
+    if text in SPREADSHEET_ERRORS:
+        return ""
+    try:
+        return float(text)
+    except ValueError:
+        return text
 
-    merged_dfs = []
-    for feat_path, lab_path in zip(feat_files, lab_files):
-        # Ensure matching bases: "sample1_blocks_unlabeled.csv" vs "sample1_blocks_labeled.csv"
-        base_feat = os.path.basename(feat_path).replace("_blocks_unlabeled.csv", "")
-        base_lab  = os.path.basename(lab_path).replace("_blocks_labeled.csv", "")
-        if base_feat != base_lab:
-            raise ValueError(f"Filename mismatch: {feat_path} vs {lab_path}")
 
-        df_feat = pd.read_csv(feat_path)
-        df_lab  = pd.read_csv(lab_path)[["page_idx", "node_idx", "label"]]
+def snippet_mismatches(df, ours="text_snippet", theirs="text_snippet_label"):
+    """
+    Boolean mask of the rows of a features-labels join whose two snippets
+    are both present and differ. Rows where either side has no snippet
+    cannot be checked and are not flagged.
+    """
+    a = df[ours].map(_normalize_snippet)
+    b = df[theirs].map(_normalize_snippet)
+    return (a != "") & (b != "") & (a != b)
 
-        # Inner merge ensures only labeled rows are kept
-        df = df_feat.merge(df_lab, on=["page_idx", "node_idx"], how="inner")
-        merged_dfs.append(df)
 
-    # Concatenate all samples into one DataFrame
-    return pd.concat(merged_dfs, ignore_index=True)
+def load_training_data(store_dir=STORE_DIR, lab_pattern="data/labels/*_blocks_labeled.csv"):
+    """
+    Feature columns from the Parquet store joined with the labels on
+    (doc_id, page_idx, node_idx); unlabelled rows are dropped.
 
-def train_and_serialize(df, model_path="models/heading_model.txt"):
-    # 1. Prepare X and y, drop non‑numeric columns
+    Node ids are only stable for one extraction of a document, so every
+    labelled row must have a stored row, and the stored text_snippet
+    must match the labelled one. Otherwise a ValueError is raised naming
+    the documents to re-export or re-label, instead of training on rows
+    paired with the wrong blocks.
+    """
+    labels = load_labels(lab_pattern)
+    df_feat = read_features(store_dir, columns=FEATURE_COLUMNS + ["text_snippet"],
+                            doc_ids=labels["doc_id"].unique())
+    joined = df_feat.merge(labels, on=KEY_COLUMNS, how="right",
+                           suffixes=("", "_label"), indicator=True)
+    dropped = joined["_merge"] == "right_only"
+    if dropped.any():
+        per_doc = joined.loc[dropped, "doc_id"].value_counts().sort_index().to_dict()
+        raise ValueError(f"{int(dropped.sum())} labelled rows have no stored features "
+                         f"(run src/main.py or --import-csv): {per_doc}")
+    mismatched = snippet_mismatches(joined)
+    if mismatched.any():
+        per_doc = joined.loc[mismatched, "doc_id"].value_counts().sort_index().to_dict()
+        first = joined[mismatched].iloc[0]
+        raise ValueError(
+            f"{int(mismatched.sum())} labelled rows do not match the stored blocks, the "
+            f"features were extracted differently from the labelled CSVs: {per_doc}; e.g. "
+            f"{first['doc_id']} page {first['page_idx']} node {first['node_idx']}: "
+            f"stored {first['text_snippet']!r}, labelled {first['text_snippet_label']!r}")
+    unchecked = int((~mismatched & ((joined["text_snippet"].map(_normalize_snippet) == "")
+                                    | (joined["text_snippet_label"].map(_normalize_snippet) == ""))).sum())
+    if unchecked:
+        print(f"⚠️  {unchecked} labelled rows have no snippet to check their pairing against")
+    return (df_feat.drop(columns="text_snippet")
+            .merge(labels.drop(columns="text_snippet"), on=KEY_COLUMNS, how="inner"))
+
+
+def prepare_xy(df):
+    """
+    (X, y, groups) from a labelled frame: numeric feature columns with
+    NaNs filled and names made LightGBM-safe, labels as strings, and the
+    document id of every row (None without a doc_id column).
+    """
     df_clean = df.copy()
     df_clean["label"] = df_clean["label"].astype(str)
     y = df_clean["label"]
+    groups = df_clean["doc_id"] if "doc_id" in df_clean else None
 
     # Drop label, text_snippet, and any other non-numeric columns
     to_drop = [
          c for c in df_clean.columns
          if c == "label" or c == "text_snippet" or df_clean[c].dtype == object
-         or c in ("page_idx", "node_idx")
+         or c in KEY_COLUMNS
     ]
     X = df_clean.drop(columns=to_drop, errors="ignore")
 
-    # 2. Fill missing numeric values
+    # Fill missing numeric values
     X = X.fillna(0)
 
-    import re
     X.columns = [
         re.sub(r'[^0-9A-Za-z_]', '_', col)
         for col in X.columns
     ]
-    # 3. Train LightGBM
+    return X, y, groups
+
+
+def train_and_serialize(df, model_path="models/heading_model.txt", params=None):
+    """
+    Fit the heading classifier on every labelled row and save it.
+
+    params: extra LGBMClassifier parameters, e.g. the best trial of
+    search_hyperparameters() with n_estimators set to its mean
+    early-stopped iteration count; None keeps the library defaults.
+    """
+    # 1. Prepare X and y
+    X, y, _ = prepare_xy(df)
+
+    # 2. Train LightGBM
     clf = LGBMClassifier(
         objective="multiclass",
-        num_class=3,
         class_weight="balanced",
-        n_jobs=-1
+        n_jobs=-1,
+        verbose=-1,
+        **(params or {})
     )
     clf.fit(X, y)
 
-    # Save raw Booster as before
+    # 3. Save the raw Booster, the sklearn classifier and their metadata
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
     clf.booster_.save_model(model_path)
     print(f"✅ Booster saved to {model_path}")
 
-    # ALSO save the full sklearn classifier
     pickle_path = model_path.replace(".txt", ".pkl")
     joblib.dump(clf, pickle_path)
     print(f"✅ Sklearn model saved to {pickle_path}")
@@ -85,20 +166,247 @@ def train_and_serialize(df, model_path="models/heading_model.txt"):
         json.dump(list(X.columns), f)
     print(f"✅ Feature names saved to {feat_names_path}")
 
-    # 4. Save model
-    os.makedirs(os.path.dirname(model_path), exist_ok=True)
-    clf.booster_.save_model(model_path)
-    print(f"✅ Model trained and saved to {model_path}")
+    # Save class names in class-index order for the native Booster backend
+    classes_path = os.path.join(os.path.dirname(model_path), "classes.json")
+    with open(classes_path, "w", encoding="utf-8") as f:
+        json.dump([str(c) for c in clf.classes_], f)
+    print(f"✅ Class names saved to {classes_path}")
+    return clf
+
+
+# --- Cross-validated hyperparameter search ---
+
+# Bounded search space; every trial draws one value per parameter.
+# Names are valid for both lightgbm.train and LGBMClassifier.
+SEARCH_SPACE = {
+    "num_leaves": [7, 15, 31, 63],
+    "max_depth": [3, 4, 6, 8, -1],
+    "learning_rate": [0.03, 0.05, 0.1, 0.2],
+    "min_child_samples": [5, 10, 20, 40],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "reg_lambda": [0.0, 0.1, 1.0, 10.0],
+}
+MAX_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 50
+
+
+def sample_trials(n_trials, seed=0):
+    """n_trials distinct parameter dicts drawn from SEARCH_SPACE (first: defaults)."""
+    rng = random.Random(seed)
+    trials = [{"num_leaves": 31, "max_depth": -1, "learning_rate": 0.1,
+               "min_child_samples": 20, "colsample_bytree": 1.0, "reg_lambda": 0.0}]
+    seen = {tuple(sorted(trials[0].items()))}
+    space_size = 1
+    for values in SEARCH_SPACE.values():
+        space_size *= len(values)
+    while len(trials) < min(n_trials, space_size):
+        params = {name: rng.choice(values) for name, values in SEARCH_SPACE.items()}
+        key = tuple(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            trials.append(params)
+    return trials[:n_trials]
+
+
+def tree_depths(booster):
+    """Depth of every tree in a LightGBM Booster."""
+    def depth(node):
+        if "leaf_index" in node or "left_child" not in node:
+            return 0
+        return 1 + max(depth(node["left_child"]), depth(node["right_child"]))
+    return [depth(tree["tree_structure"]) for tree in booster.dump_model()["tree_info"]]
+
+
+def inference_cost(booster, X, repeat=5):
+    """
+    Cost of a model at inference time: tree count, tree depths and the
+    single-threaded Booster.predict time per row (best of `repeat` runs
+    over all rows of X).
+    """
+    depths = tree_depths(booster)
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        booster.predict(X, num_threads=1)
+        best = min(best, time.perf_counter() - t0)
+    return {
+        "trees": len(depths),
+        "max_depth": max(depths, default=0),
+        "trees_x_depth": int(sum(depths)),
+        "predict_us_per_row": best / max(len(X), 1) * 1e6,
+    }
+
+
+def early_stopping_split(train_idx, groups, n_splits=5):
+    """
+    Split a fold's training rows into (fit rows, early-stopping rows) by
+    document: the first split of a grouped k-fold over the fold's own
+    documents. With a single training document there is nothing to hold
+    out, and both are the whole fold.
+    """
+    train_groups = groups[train_idx]
+    n_inner = min(n_splits, len(np.unique(train_groups)))
+    if n_inner < 2:
+        return train_idx, train_idx
+    fit, stop = next(GroupKFold(n_splits=n_inner).split(train_idx, groups=train_groups))
+    return train_idx[fit], train_idx[stop]
+
+
+def cross_validate(X, y, groups, params, n_splits=5, num_threads=1, seed=0):
+    """
+    Grouped k-fold CV of one parameter set: no document is in both the
+    training and the validation fold. Each fold trains with early stopping
+    (multi_logloss, class-balanced weights) on an inner grouped split of
+    its training documents (early_stopping_split), so the validation fold
+    is only ever used for scoring.
+
+    Returns a dict with the macro F1 of the out-of-fold predictions, the
+    per-class precision/recall/F1, the early-stopped iteration of each
+    fold and the inference cost of the fold models.
+    """
+    classes = np.unique(y)
+    y_idx = np.searchsorted(classes, np.asarray(y))
+    n_splits = min(n_splits, len(np.unique(groups)))
+    oof = np.zeros(len(y_idx), dtype=np.int64)
+    iterations, costs = [], []
+    train_params = {
+        "objective": "multiclass", "num_class": len(classes),
+        "num_threads": num_threads, "verbose": -1, "seed": seed, **params,
+    }
+    groups = np.asarray(groups)
+    for train_idx, valid_idx in GroupKFold(n_splits=n_splits).split(X, y_idx, groups):
+        fit_idx, stop_idx = early_stopping_split(train_idx, groups, n_splits)
+        train_set = lgb.Dataset(X.iloc[fit_idx], y_idx[fit_idx],
+                                weight=compute_sample_weight("balanced", y_idx[fit_idx]))
+        stop_set = lgb.Dataset(X.iloc[stop_idx], y_idx[stop_idx], reference=train_set,
+                               weight=compute_sample_weight("balanced", y_idx[stop_idx]))
+        X_valid = X.iloc[valid_idx]
+        booster = lgb.train(
+            train_params, train_set, num_boost_round=MAX_ROUNDS, valid_sets=[stop_set],
+            callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)],
+        )
+        iterations.append(booster.best_iteration or booster.current_iteration())
+        proba = booster.predict(X_valid, num_iteration=iterations[-1], num_threads=num_threads)
+        oof[valid_idx] = np.argmax(proba, axis=1)
+        # Cost of the model as it would be shipped: trees up to the best iteration
+        shipped = lgb.Booster(model_str=booster.model_to_string(num_iteration=iterations[-1]))
+        costs.append(inference_cost(shipped, X_valid))
+
+    report = classification_report(y_idx, oof, labels=np.arange(len(classes)),
+                                   target_names=[str(c) for c in classes],
+                                   output_dict=True, zero_division=0)
+    return {
+        "params": params,
+        "macro_f1": report["macro avg"]["f1-score"],
+        "accuracy": report["accuracy"],
+        "per_class": {str(c): report[str(c)] for c in classes},
+        "iterations": iterations,
+        "n_estimators": int(round(np.mean(iterations))),
+        "cost": {
+            "trees": int(round(np.mean([c["trees"] for c in costs]))),
+            "max_depth": max(c["max_depth"] for c in costs),
+            "trees_x_depth": int(round(np.mean([c["trees_x_depth"] for c in costs]))),
+            "predict_us_per_row": float(np.mean([c["predict_us_per_row"] for c in costs])),
+        },
+    }
+
+
+def _run_trial(args):
+    X, y, groups, params, n_splits, num_threads, seed = args
+    return cross_validate(X, y, groups, params, n_splits, num_threads, seed)
+
+
+def search_hyperparameters(X, y, groups, n_trials=20, n_splits=5, workers=None, seed=0):
+    """
+    Cross-validate n_trials parameter sets from SEARCH_SPACE in a process
+    pool. Each trial gets cpu_count // workers LightGBM threads so the
+    pool fills the machine without oversubscribing it. Returns the trial
+    results in the order they were sampled.
+    """
+    trials = sample_trials(n_trials, seed)
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, len(trials)))
+    num_threads = max(1, cpus // workers)
+    print(f"🔎 {len(trials)} trials × {n_splits}-fold grouped CV on {workers} worker(s), "
+          f"{num_threads} thread(s) each")
+    jobs = [(X, y, groups, params, n_splits, num_threads, seed) for params in trials]
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_run_trial, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            r = results[i]
+            print(f"  trial {i:>3}: macro F1 {r['macro_f1']:.3f}, "
+                  f"{r['cost']['trees']} trees (depth ≤ {r['cost']['max_depth']}), "
+                  f"{r['cost']['predict_us_per_row']:.1f} µs/row")
+    return results
+
+
+def pick_best(results, max_us_per_row=None):
+    """
+    The trial with the best macro F1 among those within the latency SLO
+    (ties: cheaper model first), or None if no trial meets it.
+    """
+    within = [r for r in results
+              if max_us_per_row is None or r["cost"]["predict_us_per_row"] <= max_us_per_row]
+    if not within:
+        return None
+    return min(within, key=lambda r: (-r["macro_f1"], r["cost"]["trees_x_depth"]))
+
+
+def print_report(result):
+    print(f"📊 Macro F1 {result['macro_f1']:.3f}, accuracy {result['accuracy']:.3f}")
+    print(f"   {'class':<10}{'precision':>10}{'recall':>10}{'f1':>10}{'support':>10}")
+    for name, m in result["per_class"].items():
+        print(f"   {name:<10}{m['precision']:>10.3f}{m['recall']:>10.3f}"
+              f"{m['f1-score']:>10.3f}{int(m['support']):>10}")
+    cost = result["cost"]
+    print(f"⏱️  {result['n_estimators']} rounds → {cost['trees']} trees, depth ≤ {cost['max_depth']}, "
+          f"trees × depth {cost['trees_x_depth']}, {cost['predict_us_per_row']:.1f} µs/row")
 
 
 if __name__ == "__main__":
-    # 1. Load & merge all labeled data
-    df_all = load_all_labeled_data(
-        feat_pattern="data/labels/*_blocks_unlabeled.csv",
-        lab_pattern="data/labels/*_blocks_labeled.csv"
-    )
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the heading classifier.")
+    parser.add_argument("--store", default=STORE_DIR, help="Parquet feature store (see main.py)")
+    parser.add_argument("--labels", default="data/labels/*_blocks_labeled.csv")
+    parser.add_argument("--model", default="models/heading_model.txt")
+    parser.add_argument("--search", action="store_true",
+                        help="pick parameters by grouped k-fold CV with early stopping")
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parallel trials (default: one per CPU)")
+    parser.add_argument("--max-us-per-row", type=float, default=None,
+                        help="latency SLO: only models predicting within this many µs per row")
+    parser.add_argument("--report", default=None, help="write all trial results as JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # 1. Load features from the store and join the labels by document id
+    df_all = load_training_data(store_dir=args.store, lab_pattern=args.labels)
     print("🔍 Training data shape:", df_all.shape)
     print("🔢 Class distribution:\n", df_all["label"].value_counts(), "\n")
 
-    # 2. Train & serialize
-    train_and_serialize(df_all, model_path="models/heading_model.txt")
+    # 2. Optionally search the parameters
+    params = None
+    if args.search:
+        X, y, groups = prepare_xy(df_all)
+        results = search_hyperparameters(X, y, groups, args.trials, args.folds,
+                                         args.workers, args.seed)
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            print(f"📝 Trial results written to {args.report}")
+        best = pick_best(results, args.max_us_per_row)
+        if best is None:
+            raise SystemExit(f"❌ No trial predicts within {args.max_us_per_row} µs/row")
+        print(f"🏆 Best parameters: {best['params']}")
+        print_report(best)
+        params = {**best["params"], "n_estimators": best["n_estimators"]}
+
+    # 3. Train on all rows & serialize
+    train_and_serialize(df_all, model_path=args.model, params=params)
@@ -0,0 +1,96 @@
+import os
+import json
+
+# Backends for the heading classifier. Every predictor exposes
+# predict(X) -> array of label strings, where X is the feature frame (or
+# matrix) aligned to feature_names.json, so inference.predict_labels can
+# use any of them interchangeably with the raw sklearn model. NumPy and
+# LightGBM are imported on first use to keep CLI startup light.
+
+PREDICTORS = ("sklearn", "booster", "compiled")
+
+
+def load_classes(path="models/classes.json"):
+    """Label names in the model's class-index order."""
+    import numpy as np
+    with open(path, "r", encoding="utf-8") as f:
+        return np.asarray(json.load(f))
+
+
+class BoosterPredictor:
+    """
+    Native LightGBM Booster loaded straight from heading_model.txt.
+
+    Skips the joblib/sklearn wrapper: rows go to Booster.predict as one
+    contiguous NumPy matrix and the class with the highest probability
+    is mapped through classes.json, exactly as LGBMClassifier.predict
+    does. dtype="float32" halves the matrix size, but a value rounded
+    to float32 can land on the other side of a split threshold, so the
+    default keeps float64 for output identical to the sklearn path.
+    """
+
+    def __init__(self, model_path="models/heading_model.txt",
+                 classes_path="models/classes.json", num_threads=0,
+                 dtype="float64"):
+        import lightgbm as lgb
+        self.booster = lgb.Booster(model_file=model_path)
+        self.classes = load_classes(classes_path)
+        self.num_threads = num_threads
+        self.dtype = dtype
+
+    def predict_proba(self, X):
+        import numpy as np
+        X = np.ascontiguousarray(X, dtype=self.dtype)
+        # num_threads=0 lets LightGBM use its default (all cores)
+        return self.booster.predict(X, num_threads=self.num_threads)
+
+    def predict(self, X):
+        import numpy as np
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class CompiledPredictor:
+    """
+    heading_model.txt evaluated by tree_ensemble.TreeEnsemble: plain NumPy,
+    no LightGBM, sklearn or pandas import. X may be a DataFrame or a
+    matrix whose columns follow feature_names.json. Outputs (probabilities
+    and labels) are identical to BoosterPredictor's float64 path.
+    """
+
+    def __init__(self, model_path="models/heading_model.txt",
+                 classes_path="models/classes.json"):
+        from tree_ensemble import load_tree_ensemble
+        self.ensemble = load_tree_ensemble(model_path)
+        self.classes = load_classes(classes_path)
+
+    def predict_proba(self, X):
+        return self.ensemble.predict_proba(X)
+
+    def predict(self, X):
+        import numpy as np
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def load_predictor(kind="sklearn", model_path="models/heading_model.txt",
+                   num_threads=0, dtype="float64"):
+    """
+    kind: 'sklearn' (joblib-pickled LGBMClassifier next to model_path) or
+          'booster' (native Booster from model_path) or
+          'compiled' (NumPy evaluation of model_path's trees; num_threads
+          and dtype do not apply).
+    """
+    if kind == "sklearn":
+        import joblib
+        return joblib.load(model_path.replace(".txt", ".pkl"))
+    if kind == "booster":
+        classes_path = os.path.join(os.path.dirname(model_path), "classes.json")
+        return BoosterPredictor(model_path, classes_path, num_threads, dtype)
+    if kind == "compiled":
+        classes_path = os.path.join(os.path.dirname(model_path), "classes.json")
+        return CompiledPredictor(model_path, classes_path)
+    raise ValueError(f"Unknown predictor {kind!r}; expected one of {PREDICTORS}")
+
+
+def model_file(kind="sklearn", model_path="models/heading_model.txt"):
+    """The artifact a predictor of this kind loads (used for cache keys)."""
+    return model_path.replace(".txt", ".pkl") if kind == "sklearn" else model_path
@@ -0,0 +1,162 @@
+"""
+Suppression of running headers, footers and page numbers.
+
+A block's signature hashes its normalized text (lowercased, digit runs
+replaced by '#', so "Page 3 of 40" and "Page 4 of 40" match, whitespace
+collapsed) together with its position quantized to a
+POSITION_BUCKETS x POSITION_BUCKETS grid over the page. A signature seen
+on at least MIN_FRACTION of the pages (and at least MIN_PAGES pages) is
+a repeated block, and drop_repeated() removes those blocks before the
+graph and feature stages.
+
+find_repeated() makes two linear passes over the per-page signatures
+and holds one page's signatures at a time, so when they are streamed
+(StreamedSignatures re-reads the document for each pass) its memory is
+bounded by MG_COUNTERS however many pages there are:
+1. A Misra-Gries summary with MG_COUNTERS counters over the stream of
+   per-page signatures. It keeps every signature that occurs more than
+   total/(MG_COUNTERS + 1) times, which holds for any block on half the
+   pages as long as pages average fewer than about MG_COUNTERS / 2
+   blocks.
+2. An exact per-page count of just those candidates, so nothing is
+   dropped on the summary's approximate counts.
+drop_repeated() works on pages already in memory, so there the
+signatures are computed once and kept for both passes and the
+filtering: one 8-byte digest per block, but as a Python bytes object in
+a list, about 50 bytes per block (still far less than the block itself).
+"""
+import re
+import hashlib
+
+MIN_PAGES = 3
+MIN_FRACTION = 0.5
+POSITION_BUCKETS = 40
+MG_COUNTERS = 1024
+# Only the start of a block's text is hashed: headers are short, and
+# normalizing whole paragraphs would dominate the cost
+MAX_TEXT_CHARS = 200
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"\s+")
+
+
+def block_signature(block):
+    """8-byte signature of a TextBlock's normalized text and position, or None."""
+    text = _SPACES.sub(" ", _DIGITS.sub("#", block.text[:MAX_TEXT_CHARS].lower())).strip()
+    if not text:
+        return None
+    x0, y0 = block.bbox[0], block.bbox[1]
+    qx = int(x0 / block.page_width * POSITION_BUCKETS) if block.page_width else 0
+    qy = int(y0 / block.page_height * POSITION_BUCKETS) if block.page_height else 0
+    return hashlib.blake2b(f"{qx}:{qy}:{text}".encode("utf-8"), digest_size=8).digest()
+
+
+def page_signatures(pages):
+    """block_signature of every block, page by page."""
+    return [[block_signature(b) for b in blocks] for blocks in pages]
+
+
+class StreamedSignatures:
+    """
+    Per-page signatures of a page stream that is produced anew for every
+    iteration: read_pages() returns an iterator of pages (e.g.
+    iter_text_blocks on the same PDF), so no pass keeps more than one page.
+    """
+
+    def __init__(self, read_pages):
+        self.read_pages = read_pages
+
+    def __iter__(self):
+        for blocks in self.read_pages():
+            yield [block_signature(b) for b in blocks]
+
+
+def _distinct(sigs):
+    """Distinct signatures of one page (a header counts once per page)."""
+    sigs = set(sigs)
+    sigs.discard(None)
+    return sigs
+
+
+class MisraGries:
+    """Heavy-hitter summary: at most k counters, amortized O(1) per item."""
+
+    def __init__(self, k=MG_COUNTERS):
+        self.k = k
+        self.counters = {}
+
+    def add(self, item):
+        counters = self.counters
+        if item in counters:
+            counters[item] += 1
+        elif len(counters) < self.k:
+            counters[item] = 1
+        else:
+            # Decrement every counter (the new item's count is absorbed)
+            for key in list(counters):
+                counters[key] -= 1
+                if not counters[key]:
+                    del counters[key]
+
+    def candidates(self):
+        return set(self.counters)
+
+
+def _scan(signatures, min_pages, min_fraction):
+    """
+    (repeated signatures, whether every block is repeated) in two passes
+    over `signatures`, a re-iterable of per-page signature lists.
+    """
+    summary, n_pages = MisraGries(), 0
+    for sigs in signatures:
+        n_pages += 1
+        for sig in _distinct(sigs):
+            summary.add(sig)
+    threshold = max(min_pages, min_fraction * n_pages)
+    if n_pages < threshold:
+        return set(), False
+    counts = dict.fromkeys(summary.candidates(), 0)
+    only_candidates = True
+    for sigs in signatures:
+        sigs = set(sigs)
+        only_candidates = only_candidates and all(sig in counts for sig in sigs)
+        for sig in sigs:
+            if sig in counts:
+                counts[sig] += 1
+    repeated = {sig for sig, n in counts.items() if n >= threshold}
+    # Every block is repeated when every signature seen is a repeated one
+    everything = only_candidates and all(n >= threshold for n in counts.values() if n)
+    return repeated, everything
+
+
+def find_repeated(signatures, min_pages=MIN_PAGES, min_fraction=MIN_FRACTION):
+    """
+    Signatures that repeat on at least max(min_pages, min_fraction * page
+    count) pages. signatures: per-page signature lists, iterated twice
+    (page_signatures, or StreamedSignatures to keep memory bounded).
+    """
+    return _scan(signatures, min_pages, min_fraction)[0]
+
+
+def droppable(signatures):
+    """
+    find_repeated's signatures, or none if dropping them would leave a
+    document made only of repeated blocks without any text.
+    """
+    repeated, everything = _scan(signatures, MIN_PAGES, MIN_FRACTION)
+    return set() if everything else repeated
+
+
+def drop_repeated(pages):
+    """
+    (pages without repeated blocks, number of blocks dropped). A document
+    made only of repeated blocks is returned unchanged.
+    """
+    signatures = page_signatures(pages)
+    repeated = droppable(signatures)
+    if not repeated:
+        return pages, 0
+    kept = [[b for b, sig in zip(blocks, sigs) if sig not in repeated]
+            for blocks, sigs in zip(pages, signatures)]
+    dropped = sum(len(blocks) for blocks in pages) - sum(len(blocks) for blocks in kept)
+    return kept, dropped
@@ -0,0 +1,217 @@
+"""
+Long-running outline service.
+
+Keeps the heading model and feature schema warm in a pool of worker
+processes and serves outlines over local HTTP or a Unix socket:
+
+  POST /outline   body = PDF bytes (Content-Type: application/pdf), or
+                  JSON {"path": "/abs/file.pdf"} when started with --allow-paths
+  GET  /health    pool size and in-flight request count
+
+The response is the same JSON process_pdf returns. At most
+workers + queue requests are in flight; beyond that the server answers
+503 with Retry-After instead of queueing without bound.
+
+  python src/service.py --port 8080 --workers 4
+  python src/service.py --unix /tmp/outline.sock
+"""
+import os
+import json
+import signal
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+import inference
+from ingestion import PDFParseError
+
+
+def _outline_job(pdf):
+    """Runs inside a pool worker whose model was loaded by inference._init_worker."""
+    return inference.process_pdf(pdf, inference._worker_model, cache=inference._worker_cache)
+
+
+class OutlineService:
+    """Warm worker pool plus the admission control shared by all handlers."""
+
+    def __init__(self, workers=2, queue=8, model_path=inference.MODEL_PATH,
+                 feat_names_path="models/feature_names.json", predictor="sklearn",
+                 cache_dir=None, cache_max_mb=1024, allow_paths=False,
+                 max_bytes=256 << 20, timeout=300):
+        self.workers = workers
+        self.capacity = workers + queue
+        self.allow_paths = allow_paths
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers, initializer=inference._init_worker,
+            initargs=(model_path, feat_names_path, cache_dir, cache_max_mb, predictor, 1))
+        # Start every worker now so the first requests do not pay the model load
+        for fut in [self.pool.submit(os.getpid) for _ in range(workers)]:
+            fut.result()
+
+    def try_acquire(self):
+        if not self._slots.acquire(blocking=False):
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def outline(self, pdf):
+        """
+        Outline of `pdf` on a slot taken with try_acquire(), which this
+        call takes over: the slot is released when the job is done, not
+        when the wait for it times out, so a job that outlives the timeout
+        still counts against capacity while its worker is busy.
+        """
+        try:
+            future = self.pool.submit(_outline_job, pdf)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda _: self.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()  # only succeeds while the job is still queued
+            raise
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+class OutlineHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None  # set by make_server
+
+    def address_string(self):
+        # Unix-socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._send_json(404, {"error": "not found"})
+        svc = self.service
+        self._send_json(200, {"status": "ok", "workers": svc.workers,
+                              "in_flight": svc.in_flight, "capacity": svc.capacity})
+
+    def do_POST(self):
+        if self.path != "/outline":
+            return self._send_json(404, {"error": "not found"})
+        svc = self.service
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            return self._send_json(411, {"error": "Content-Length required"})
+        if length > svc.max_bytes:
+            self.close_connection = True
+            return self._send_json(413, {"error": f"body larger than {svc.max_bytes} bytes"})
+        # Backpressure: refuse instead of queueing once the pool is saturated
+        if not svc.try_acquire():
+            self.close_connection = True
+            return self._send_json(503, {"error": "server busy"}, {"Retry-After": "1"})
+        holding = True  # the slot, until svc.outline takes it over
+        try:
+            body = self.rfile.read(length)
+            if self.headers.get_content_type() == "application/json":
+                if not svc.allow_paths:
+                    return self._send_json(403, {"error": "path requests are disabled"})
+                try:
+                    request = json.loads(body)
+                except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                    return self._send_json(400, {"error": f"bad request: {e}"})
+                if not isinstance(request, dict) or not isinstance(request.get("path"), str):
+                    return self._send_json(400, {"error": 'bad request: expected {"path": "..."}'})
+                pdf = request["path"]
+                if not os.path.isfile(pdf):
+                    return self._send_json(404, {"error": f"no such file: {pdf}"})
+            else:
+                pdf = body
+            holding = False
+            result = svc.outline(pdf)
+        except PDFParseError as e:
+            return self._send_json(422, {"error": f"PDFParseError: {e}"})
+        except FutureTimeoutError:
+            return self._send_json(504, {"error": f"no result within {svc.timeout} s"})
+        except Exception as e:
+            return self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            if holding:
+                svc.release()
+        self._send_json(200, result)
+
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        super().server_bind()
+        # BaseHTTPRequestHandler expects these from HTTPServer
+        self.server_name, self.server_port = socket.gethostname(), 0
+
+
+def make_server(service, host="127.0.0.1", port=8080, unix_path=None):
+    handler = type("BoundOutlineHandler", (OutlineHandler,), {"service": service})
+    if unix_path:
+        return ThreadingUnixHTTPServer(unix_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve PDF outlines from a warm model.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (default: all cores)")
+    parser.add_argument("--queue", type=int, default=8,
+                        help="requests allowed to wait for a worker before 503 (default: 8)")
+    parser.add_argument("--predictor", choices=inference.PREDICTORS, default="sklearn")
+    parser.add_argument("--cache", metavar="DIR", help="outline/feature cache directory")
+    parser.add_argument("--cache-max-mb", type=int, default=1024)
+    parser.add_argument("--allow-paths", action="store_true",
+                        help="accept JSON {\"path\": ...} requests for local files")
+    parser.add_argument("--max-mb", type=int, default=256, help="largest accepted PDF body")
+    args = parser.parse_args()
+
+    service = OutlineService(workers=args.workers, queue=args.queue,
+                             predictor=args.predictor, cache_dir=args.cache,
+                             cache_max_mb=args.cache_max_mb,
+                             allow_paths=args.allow_paths, max_bytes=args.max_mb << 20)
+    server = make_server(service, args.host, args.port, args.unix)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"🚀 Outline service on {where} with {args.workers} warm worker(s)")
+    # docker stop / systemd send SIGTERM: stop accepting and drain cleanly
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
@@ -0,0 +1,262 @@
+"""
+LightGBM tree ensembles evaluated with NumPy alone.
+
+load_tree_ensemble() reads a model saved by Booster.save_model (the text
+format of heading_model.txt) into flat arrays, one row per tree, and
+compiles it for QuickScorer-style evaluation: every leaf of a tree is a
+bit of a 64-bit mask (left to right), every split holds the mask of the
+leaves still reachable when its test fails, and the splits are grouped
+by feature and sorted by threshold. For one feature, a single
+searchsorted gives the failed splits of every row, and a precomputed
+table gives their combined masks per tree. After all features, the
+lowest set bit of a tree's mask is the leaf the row ends in. A predict
+is one table lookup per feature instead of a walk down every tree.
+
+Models this does not fit (trees over 64 leaves, missing-value splits,
+oversized tables) fall back to walking every tree for every row at once,
+one level per step.
+
+Decisions follow LightGBM's NumericalDecision (missing-value handling
+included). Per-class scores are summed in tree order and the softmax
+uses the C library's exp, as LightGBM does, so probabilities and labels
+match Booster.predict exactly. Categorical splits and linear trees are
+not supported.
+"""
+import math
+
+import numpy as np
+
+# LightGBM decision_type bits and missing types (include/LightGBM/tree.h)
+DEFAULT_LEFT_MASK = 2
+CATEGORICAL_MASK = 1
+MISSING_ZERO, MISSING_NAN = 1, 2
+ZERO_THRESHOLD = 1e-35
+# Largest total size of the per-feature mask tables before falling back
+# to tree walking
+MAX_TABLE_BYTES = 64 << 20
+
+
+def _parse_blocks(lines):
+    """(header dict, [tree dict]) of a LightGBM text model."""
+    header, trees, current = {}, [], None
+    for line in lines:
+        line = line.strip()
+        if line.startswith("Tree="):
+            current = {}
+            trees.append(current)
+        elif line == "end of trees":
+            break
+        elif line == "average_output":
+            header[line] = "1"
+        elif "=" in line:
+            key, value = line.split("=", 1)
+            (header if current is None else current)[key] = value
+    return header, trees
+
+
+def _floats(value):
+    return np.array(value.split(), dtype=np.float64)
+
+
+def _ints(value):
+    return np.array(value.split(), dtype=np.int64)
+
+
+class TreeEnsemble:
+    """
+    Padded per-tree node arrays of a multiclass LightGBM model.
+
+    Internal nodes are indexed 0..num_leaves-2 and leaves are stored as
+    ~leaf_index in left/right, as in LightGBM. A tree that is a single
+    leaf starts at ~0.
+    """
+
+    def __init__(self, trees, num_class, num_features, objective, average_output=False):
+        if objective not in ("multiclass", "multiclassova"):
+            raise ValueError(f"Unsupported objective {objective!r}")
+        self.num_class = num_class
+        self.num_features = num_features
+        self.objective = objective
+        self.average_output = average_output
+        n_trees = len(trees)
+        max_nodes = max([len(t["left"]) for t in trees] + [1])
+        max_leaves = max(len(t["leaf_value"]) for t in trees)
+
+        self.feature = np.zeros((n_trees, max_nodes), dtype=np.int64)
+        self.threshold = np.zeros((n_trees, max_nodes), dtype=np.float64)
+        self.default_left = np.zeros((n_trees, max_nodes), dtype=bool)
+        self.missing_type = np.zeros((n_trees, max_nodes), dtype=np.int8)
+        self.left = np.zeros((n_trees, max_nodes), dtype=np.int64)
+        self.right = np.zeros((n_trees, max_nodes), dtype=np.int64)
+        self.leaf_value = np.zeros((n_trees, max_leaves), dtype=np.float64)
+        self.root = np.zeros(n_trees, dtype=np.int64)
+        for i, t in enumerate(trees):
+            n = len(t["left"])
+            self.leaf_value[i, :len(t["leaf_value"])] = t["leaf_value"]
+            if n == 0:
+                self.root[i] = ~0
+                continue
+            self.feature[i, :n] = t["feature"]
+            self.threshold[i, :n] = t["threshold"]
+            self.default_left[i, :n] = (t["decision_type"] & DEFAULT_LEFT_MASK) != 0
+            self.missing_type[i, :n] = (t["decision_type"] >> 2) & 3
+            self.left[i, :n] = t["left"]
+            self.right[i, :n] = t["right"]
+        self.tables = self._compile(trees)
+
+    def __len__(self):
+        return len(self.root)
+
+    def _compile(self, trees):
+        """
+        Per-feature (thresholds, masks table) plus the leaf value of every
+        (tree, bit), or None if the model needs tree walking.
+        """
+        max_leaves = max(len(t["leaf_value"]) for t in trees)
+        if max_leaves > 64 or self.missing_type.any():
+            return None
+        # Narrowest mask that holds a bit per leaf: less memory to gather
+        dtype = next(np.dtype(d) for d in (np.uint8, np.uint16, np.uint32, np.uint64)
+                     if np.dtype(d).itemsize * 8 >= max_leaves)
+        full = np.iinfo(dtype).max
+        n_trees = len(trees)
+        bit_value = np.zeros((n_trees, dtype.itemsize * 8), dtype=np.float64)
+        splits = {}  # feature -> [(threshold, tree, mask)]
+        for i, t in enumerate(trees):
+            if len(t["left"]) == 0:
+                bit_value[i, 0] = t["leaf_value"][0]
+                continue
+            order = []  # leaf indices, left to right
+
+            def leaves_under(node):
+                if node < 0:
+                    order.append(~node)
+                    return 1 << (len(order) - 1)
+                left = leaves_under(t["left"][node])
+                right = leaves_under(t["right"][node])
+                # Failing the test (value > threshold) rules out the left subtree
+                splits.setdefault(int(t["feature"][node]), []).append(
+                    (t["threshold"][node], i, full ^ left))
+                return left | right
+
+            leaves_under(0)
+            bit_value[i, :len(order)] = t["leaf_value"][order]
+
+        tables, size = [], 0
+        for feature, nodes in sorted(splits.items()):
+            nodes.sort(key=lambda node: node[0])
+            thresholds = np.unique([node[0] for node in nodes])
+            size += (len(thresholds) + 1) * n_trees * dtype.itemsize
+            if size > MAX_TABLE_BYTES:
+                return None
+            # table[b]: masks of every tree after failing each split with
+            # threshold < thresholds[b] (all of them for b = len(thresholds))
+            table = np.full((len(thresholds) + 1, n_trees), full, dtype=dtype)
+            running = table[0].copy()
+            b = 0
+            for threshold, tree, mask in nodes:
+                while thresholds[b] < threshold:
+                    b += 1
+                    table[b] = running
+                running[tree] &= mask
+            table[b + 1:] = running
+            tables.append((feature, thresholds, table))
+        return tables, bit_value
+
+    def leaf_values(self, X):
+        """(rows, trees) leaf output of every tree for every row of X."""
+        if self.tables is None:
+            return self._walk_trees(X)
+        tables, bit_value = self.tables
+        # Without missing-value splits LightGBM reads NaN as 0
+        X = np.where(np.isnan(X), 0.0, X)
+        masks = None
+        for feature, thresholds, table in tables:
+            # Splits with threshold < value fail (LightGBM goes left on <=)
+            failed = table[np.searchsorted(thresholds, X[:, feature], side="left")]
+            if masks is None:
+                masks = failed
+            else:
+                masks &= failed
+        if masks is None:  # only single-leaf trees
+            return np.broadcast_to(bit_value[:, 0], (len(X), len(self.root)))
+        lowest = masks & (0 - masks)
+        bits = np.frexp(lowest.astype(np.float64))[1] - 1
+        return bit_value[np.arange(len(self.root))[None, :], bits]
+
+    def _walk_trees(self, X):
+        n_rows, n_trees = len(X), len(self.root)
+        tree_idx = np.arange(n_trees)[None, :]
+        row_idx = np.arange(n_rows)[:, None]
+        node = np.broadcast_to(self.root, (n_rows, n_trees)).copy()
+        active = node >= 0
+        while active.any():
+            cur = np.where(active, node, 0)
+            fval = X[row_idx, self.feature[tree_idx, cur]]
+            missing_type = self.missing_type[tree_idx, cur]
+            is_nan = np.isnan(fval)
+            fval = np.where(is_nan & (missing_type != MISSING_NAN), 0.0, fval)
+            is_missing = (((missing_type == MISSING_ZERO) & (np.abs(fval) <= ZERO_THRESHOLD))
+                          | ((missing_type == MISSING_NAN) & is_nan))
+            go_left = np.where(is_missing, self.default_left[tree_idx, cur],
+                               fval <= self.threshold[tree_idx, cur])
+            nxt = np.where(go_left, self.left[tree_idx, cur], self.right[tree_idx, cur])
+            node = np.where(active, nxt, node)
+            active = node >= 0
+        return self.leaf_value[tree_idx, ~node]
+
+    def predict_raw(self, X):
+        """(rows, num_class) raw scores, accumulated tree by tree."""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.num_features:
+            raise ValueError(f"Expected (rows, {self.num_features}) features, got {X.shape}")
+        leaves = self.leaf_values(X)
+        k = self.num_class
+        scores = np.zeros((len(X), k), dtype=np.float64)
+        # Same summation order as LightGBM (iteration by iteration), so the
+        # floating-point result is identical
+        for start in range(0, leaves.shape[1], k):
+            scores += leaves[:, start:start + k]
+        if self.average_output:
+            scores /= leaves.shape[1] // k
+        return scores
+
+    def predict_proba(self, X):
+        scores = self.predict_raw(X)
+        if self.objective == "multiclassova":
+            return 1.0 / (1.0 + np.exp(-scores))
+        # Softmax as Common::Softmax: shift by the max, exp, divide by the
+        # sum. math.exp is the C library's exp; np.exp can differ by an ulp.
+        shifted = (scores - scores.max(axis=1, keepdims=True)).ravel()
+        exp = np.fromiter(map(math.exp, shifted.tolist()), dtype=np.float64,
+                          count=len(shifted)).reshape(scores.shape)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+def load_tree_ensemble(model_path="models/heading_model.txt"):
+    """TreeEnsemble of a LightGBM text model file."""
+    with open(model_path, "r", encoding="utf-8") as f:
+        header, blocks = _parse_blocks(f)
+    trees = []
+    for block in blocks:
+        if int(block.get("num_cat", "0")) > 0 or block.get("is_linear", "0") != "0":
+            raise ValueError(f"{model_path}: categorical splits and linear trees are not supported")
+        leaf_value = _floats(block["leaf_value"])
+        if int(block["num_leaves"]) == 1:
+            trees.append({"left": [], "leaf_value": leaf_value})
+            continue
+        trees.append({
+            "feature": _ints(block["split_feature"]),
+            "threshold": _floats(block["threshold"]),
+            "decision_type": _ints(block["decision_type"]),
+            "left": _ints(block["left_child"]),
+            "right": _ints(block["right_child"]),
+            "leaf_value": leaf_value,
+        })
+    return TreeEnsemble(
+        trees,
+        num_class=int(header.get("num_class", "1")),
+        num_features=int(header["max_feature_idx"]) + 1,
+        objective=header.get("objective", "").split()[0],
+        average_output="average_output" in header,
+    )
@@ -0,0 +1,89 @@
+"""OutlineCache: layer round trips, key separation and LRU eviction."""
+import os
+
+import pandas as pd
+import pytest
+
+from cache import OutlineCache
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    feat_names = tmp_path / "feature_names.json"
+    feat_names.write_text('["font_size"]')
+    model = tmp_path / "heading_model.pkl"
+    model.write_bytes(b"model v1")
+    return str(feat_names), str(model)
+
+
+def open_cache(root, artifacts, **kwargs):
+    feat_names, model = artifacts
+    return OutlineCache(str(root), feat_names_path=feat_names, model_path=model, **kwargs)
+
+
+def test_layers_round_trip(tmp_path, artifacts):
+    cache = open_cache(tmp_path / "cache", artifacts)
+    df = pd.DataFrame({"font_size": [12.0, 9.5], "text": ["Title", "body"]})
+    outline = {"title": "Title", "outline": [{"level": "H1", "text": "Intro", "page": 1}]}
+    columns = {"font_size": [12.0]}
+
+    assert cache.get_features("pdf") is None
+    assert cache.get_outline("pdf") is None
+    assert cache.get_page("fp") is None
+    cache.put_features("pdf", df)
+    cache.put_outline("pdf", outline)
+    cache.put_page("fp", columns)
+
+    pd.testing.assert_frame_equal(cache.get_features("pdf"), df)
+    assert cache.get_outline("pdf") == outline
+    assert cache.get_page("fp") == columns
+    assert cache.get_page("fp", min_text_length=2) is None
+    assert cache.stats["features_hits"] == 1 and cache.stats["features_misses"] == 1
+    assert cache.stats["pages_hits"] == 1 and cache.stats["pages_misses"] == 2
+
+
+def test_retrain_keeps_features_but_not_outlines(tmp_path, artifacts):
+    root = tmp_path / "cache"
+    cache = open_cache(root, artifacts)
+    cache.put_features("pdf", pd.DataFrame({"font_size": [1.0]}))
+    cache.put_outline("pdf", {"title": "", "outline": []})
+
+    with open(artifacts[1], "wb") as f:
+        f.write(b"model v2")
+    retrained = open_cache(root, artifacts)
+    assert retrained.get_features("pdf") is not None
+    assert retrained.get_outline("pdf") is None
+
+
+def test_variants_do_not_share_entries(tmp_path, artifacts):
+    root = tmp_path / "cache"
+    open_cache(root, artifacts).put_features("pdf", pd.DataFrame({"font_size": [1.0]}))
+    assert open_cache(root, artifacts, variant="layout").get_features("pdf") is None
+    assert open_cache(root, artifacts).get_features("pdf") is not None
+
+
+def test_evicts_least_recently_used(tmp_path, artifacts):
+    root = tmp_path / "cache"
+    cache = open_cache(root, artifacts, max_bytes=2500)
+    blob = {"font_size": [0.0] * 100}  # about 1 KB pickled
+    cache.put_page("a", blob)
+    cache.put_page("b", blob)
+    # a written first, b later; then a read again, so b is the least recently used
+    for age, key in ((200, "a"), (100, "b")):
+        path = cache._path("pages", cache.page_key(key), ".pkl")
+        past = os.stat(path).st_mtime - age
+        os.utime(path, (past, past))
+    assert cache.get_page("a") is not None
+
+    cache.put_page("c", blob)
+    assert cache.get_page("b") is None
+    assert cache.get_page("a") is not None
+    assert cache.get_page("c") is not None
+    assert cache._size <= cache.max_bytes
+
+
+def test_size_is_rescanned_on_open(tmp_path, artifacts):
+    root = tmp_path / "cache"
+    cache = open_cache(root, artifacts)
+    cache.put_outline("pdf", {"title": "x" * 1000, "outline": []})
+    assert open_cache(root, artifacts)._size == cache._size > 1000
@@ -0,0 +1,80 @@
+"""
+The columnar feature engine (build_feature_dataframe) must reproduce the
+per-node reference (node_level_features + relational_features over
+PageGraph.to_networkx) bit for bit: the model was trained on the latter.
+"""
+import os
+import glob
+import random
+
+import numpy as np
+import pytest
+
+from features import (FEATURE_COLUMNS, node_level_features, relational_features,
+                      build_feature_dataframe)
+from graph import build_page_graph
+from ingestion import extract_text_blocks
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES = sorted(glob.glob(os.path.join(ROOT, "data", "samples", "*.pdf")))
+WORDS = "Introduction 1. 2.1 a) (iv) Scope overview Of THE data. Why? yes! body text".split()
+
+
+def reference_rows(blocks):
+    """FEATURE_COLUMNS of every block of one page, from the per-node functions."""
+    G = build_page_graph(blocks).to_networkx()
+    rows = []
+    for node in G.nodes:
+        feats = {**node_level_features(G.nodes[node]["meta"]), **relational_features(node, G)}
+        rows.append([feats[name] for name in FEATURE_COLUMNS])
+    return np.asarray(rows, dtype=float).reshape(len(rows), len(FEATURE_COLUMNS))
+
+
+def assert_parity(blocks):
+    df = build_feature_dataframe([build_page_graph(blocks)])
+    assert len(df) == len(blocks)
+    assert list(df["node_idx"]) == list(range(len(blocks)))
+    expected = reference_rows(blocks)
+    actual = df[FEATURE_COLUMNS].to_numpy(dtype=float)
+    for col, name in enumerate(FEATURE_COLUMNS):
+        # Exact equality, not allclose
+        np.testing.assert_array_equal(actual[:, col], expected[:, col], err_msg=name)
+
+
+def random_block(rng, width, height):
+    x0, y0 = rng.uniform(0, width - 60), rng.uniform(0, height - 20)
+    bbox = (x0, y0, x0 + rng.uniform(5, 300), y0 + rng.uniform(5, 40))
+    lines = []
+    for _ in range(rng.randint(1, 3)):
+        # Some lines have no spans; over 8 spans exercises pairwise-summed means
+        spans = [{"size": rng.choice([8.0, 9.5, 10.0, 11.04, 12.0, 16.3]),
+                  "flags": rng.choice([0, 2, 4, 16, 18]),
+                  "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))}
+                 for _ in range(rng.choice([0, 1, 2, 3, 9]))]
+        lines.append({"spans": spans})
+    return {"bbox": bbox, "lines": lines, "_page_num": 1,
+            "_page_width": width, "_page_height": height}
+
+
+@pytest.mark.parametrize("pdf", SAMPLES, ids=os.path.basename)
+def test_sample_pdfs(pdf):
+    for blocks in extract_text_blocks(pdf, compact=False):
+        assert_parity(blocks)
+
+
+@pytest.mark.parametrize("n_blocks", [1, 2, 3, 4, 5, 6, 12, 40])
+@pytest.mark.parametrize("seed", range(5))
+def test_random_pages(n_blocks, seed):
+    rng = random.Random(seed * 1000 + n_blocks)
+    width, height = rng.choice([(612.0, 792.0), (595.3, 841.9)])
+    assert_parity([random_block(rng, width, height) for _ in range(n_blocks)])
+
+
+def test_textblocks_match_dicts():
+    # The compact TextBlock records ingestion yields give the same frame
+    for pdf in SAMPLES:
+        dicts = extract_text_blocks(pdf, compact=False)
+        compact = extract_text_blocks(pdf)
+        a = build_feature_dataframe([build_page_graph(b) for b in dicts])
+        b = build_feature_dataframe([build_page_graph(b) for b in compact])
+        assert a.equals(b)
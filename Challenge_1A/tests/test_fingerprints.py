@@ -0,0 +1,70 @@
+"""page_fingerprint: stable for unchanged pages, sensitive to what extraction reads."""
+import re
+
+import fitz
+import pytest
+
+from ingestion import iter_page_fingerprints, page_fingerprint
+
+
+def make_doc(texts):
+    doc = fitz.open()
+    for text in texts:
+        page = doc.new_page()
+        page.insert_text((72, 72), text, fontname="helv", fontsize=12)
+    return doc
+
+
+def fingerprints(doc):
+    return [fp for fp, _ in iter_page_fingerprints(doc.tobytes(), extract=lambda fp: False)]
+
+
+def test_unchanged_pages_keep_their_fingerprint():
+    before = fingerprints(make_doc(["one", "two", "three"]))
+    edited = fingerprints(make_doc(["one", "TWO", "three"]))
+    assert before[0] == edited[0] and before[2] == edited[2]
+    assert before[1] != edited[1]
+
+
+def test_inserted_page_does_not_shift_the_others():
+    before = fingerprints(make_doc(["one", "two"]))
+    after = fingerprints(make_doc(["one", "new", "two"]))
+    assert after[0] == before[0] and after[2] == before[1]
+
+
+def test_geometry_is_part_of_the_fingerprint():
+    doc = make_doc(["one"])
+    before = page_fingerprint(doc[0])
+    doc[0].set_rotation(90)
+    assert page_fingerprint(doc[0]) != before
+
+
+def _font_streams(doc, xref, seen):
+    """Stream xrefs reachable from a font object."""
+    if xref in seen:
+        return []
+    seen.add(xref)
+    found = [xref] if doc.xref_is_stream(xref) else []
+    for ref in re.findall(r"(\d+) 0 R", doc.xref_object(xref)):
+        found += _font_streams(doc, int(ref), seen)
+    return found
+
+
+def test_font_objects_are_part_of_the_fingerprint():
+    # An embedded font, as extraction decodes text through it
+    doc = fitz.open()
+    page = doc.new_page()
+    writer = fitz.TextWriter(page.rect)
+    writer.append((72, 72), "embedded font text", font=fitz.Font("helv"), fontsize=12)
+    writer.write_text(page)
+    doc = fitz.open("pdf", doc.tobytes())
+
+    before = page_fingerprint(doc[0])
+    contents = doc[0].read_contents()
+    streams = [x for xref, *_ in doc[0].get_fonts(full=True)
+               for x in _font_streams(doc, xref, set())]
+    if not streams:
+        pytest.skip("PyMuPDF wrote no font streams")
+    doc.update_stream(streams[0], (doc.xref_stream(streams[0]) or b"") + b"\n% changed")
+    assert doc[0].read_contents() == contents
+    assert page_fingerprint(doc[0]) != before
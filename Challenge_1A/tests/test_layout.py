@@ -0,0 +1,80 @@
+"""layout_page: columns, reading order and same-column neighbours."""
+import random
+
+from layout import layout_page
+
+LEFT, RIGHT = (50, 290), (320, 560)
+
+
+def block(name, x0, y0, x1, height=12):
+    return {"name": name, "bbox": (x0, y0, x1, y0 + height)}
+
+
+def names(blocks):
+    return [b["name"] for b in blocks]
+
+
+def two_columns(rows, top=100, step=30, prefix=("L", "R")):
+    """rows blocks in each of two columns, listed row by row (left, right)."""
+    out = []
+    for r in range(rows):
+        y = top + r * step
+        out.append(block(f"{prefix[0]}{r}", LEFT[0], y, LEFT[1]))
+        out.append(block(f"{prefix[1]}{r}", RIGHT[0], y, RIGHT[1]))
+    return out
+
+
+def test_two_columns_read_column_by_column():
+    title = block("title", 50, 40, 560, height=24)
+    blocks, layout = layout_page([title] + two_columns(3))
+    assert names(blocks) == ["title", "L0", "L1", "L2", "R0", "R1", "R2"]
+    assert layout.n_columns == 2
+    assert list(layout.column) == [-1, 0, 0, 0, 1, 1, 1]
+    # L1: above L0, below L2; R0: nothing in its column above but the title
+    assert (layout.above[2], layout.below[2]) == (1, 3)
+    assert layout.above[4] == 0 and layout.below[6] == -1
+
+
+def test_spanning_block_cuts_the_page_into_bands():
+    figure = block("figure", 50, 200, 560)
+    page = two_columns(2) + [figure] + two_columns(2, top=240, prefix=("l", "r"))
+    blocks, layout = layout_page(page)
+    assert names(blocks) == ["L0", "L1", "R0", "R1", "figure", "l0", "l1", "r0", "r1"]
+    assert layout.column[4] == -1
+    # The spanning block joins both columns' neighbour lists
+    assert names([blocks[layout.above[5]], blocks[layout.above[7]]]) == ["figure", "figure"]
+
+
+def test_full_width_paragraphs_are_one_column():
+    page = [block(f"p{i}", 50, 100 + 40 * i, 560) for i in (2, 0, 1)]
+    blocks, layout = layout_page(page)
+    assert names(blocks) == ["p0", "p1", "p2"]
+    assert layout.n_columns == 1
+    assert list(layout.above) == [-1, 0, 1] and list(layout.below) == [1, 2, -1]
+
+
+def test_empty_page():
+    blocks, layout = layout_page([])
+    assert blocks == [] and layout.n_columns == 0 and len(layout.column) == 0
+
+
+def test_neighbours_match_brute_force():
+    rng = random.Random(0)
+    for _ in range(50):
+        page = []
+        for c, (x0, x1) in enumerate((LEFT, RIGHT)):
+            for i in range(rng.randint(2, 12)):
+                page.append(block(f"{c}-{i}", x0 + rng.uniform(0, 10), rng.uniform(50, 750),
+                                  x1 - rng.uniform(0, 10)))
+        rng.shuffle(page)
+        blocks, layout = layout_page(page)
+        col = {b["name"]: b["name"][0] for b in blocks}
+        for i, b in enumerate(blocks):
+            y = b["bbox"][1]
+            same = [j for j, o in enumerate(blocks) if col[o["name"]] == col[b["name"]]]
+            up = [j for j in same if blocks[j]["bbox"][1] < y]
+            down = [j for j in same if blocks[j]["bbox"][1] > y]
+            expect_up = max(up, key=lambda j: (blocks[j]["bbox"][1], -j)) if up else -1
+            expect_down = min(down, key=lambda j: (blocks[j]["bbox"][1], j)) if down else -1
+            assert layout.above[i] == expect_up
+            assert layout.below[i] == expect_down
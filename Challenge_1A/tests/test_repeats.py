@@ -0,0 +1,70 @@
+"""Running header/footer suppression: Misra-Gries summary and drop_repeated."""
+from blocks import TextBlock
+from repeats import (MisraGries, StreamedSignatures, drop_repeated, find_repeated,
+                     page_signatures)
+
+
+def block(text, y0, page_num, x0=72):
+    return TextBlock((x0, y0, x0 + 200, y0 + 12), 11.0, 11.0, False, text, 1,
+                     page_num, 612, 792)
+
+
+def report(n_pages):
+    """Pages with a running header, a numbered footer and unique body text."""
+    return [[block("Annual Report 2024", 30, p),
+             block(f"Body paragraph number {chr(65 + p)} on its own", 200, p),
+             block(f"Page {p} of {n_pages}", 760, p)]
+            for p in range(1, n_pages + 1)]
+
+
+def test_misra_gries_keeps_heavy_hitters():
+    summary = MisraGries(k=3)
+    stream = ["a", "b", "a", "c", "a", "d", "e", "a", "b", "a", "f", "a"]
+    for item in stream:
+        summary.add(item)
+    # Anything above len(stream) / (k + 1) = 3 occurrences must survive
+    assert "a" in summary.candidates()
+    assert len(summary.counters) <= 3
+
+
+def test_find_repeated_thresholds():
+    sigs = [[b"h", b"x1"], [b"h", b"x2"], [b"h", b"x3"], [b"x4"], [b"x5"], [b"x6"]]
+    # 3 of 6 pages: meets min_pages=3 and min_fraction=0.5
+    assert find_repeated(sigs) == {b"h"}
+    assert find_repeated(sigs, min_fraction=0.6) == set()
+    assert find_repeated(sigs, min_pages=4) == set()
+    # Too few pages to call anything repeated
+    assert find_repeated(sigs[:2]) == set()
+
+
+def test_headers_and_page_numbers_are_dropped():
+    pages = report(6)
+    kept, dropped = drop_repeated(pages)
+    assert dropped == 12
+    assert [[b.text for b in blocks] for blocks in kept] == \
+        [[blocks[1].text] for blocks in pages]
+
+
+def test_header_counts_once_per_page():
+    pages = [[block("Note", 30, 1)] * 3] + [[block(f"Text {chr(65 + p)}", 30, p)] for p in (2, 3, 4)]
+    # Three copies on one page are still one page out of four
+    assert find_repeated(page_signatures(pages)) == set()
+
+
+def test_document_of_only_repeated_blocks_is_unchanged():
+    pages = [[block("Confidential", 30, p)] for p in range(1, 6)]
+    kept, dropped = drop_repeated(pages)
+    assert kept is pages and dropped == 0
+
+
+def test_streamed_signatures_match_the_list():
+    pages = report(8)
+    reads = []
+
+    def read_pages():
+        reads.append(1)
+        return iter(pages)
+
+    streamed = find_repeated(StreamedSignatures(read_pages))
+    assert streamed == find_repeated(page_signatures(pages))
+    assert len(streamed) == 2 and len(reads) == 2
@@ -0,0 +1,52 @@
+import os
+
+# --- Section extraction (reuses the Challenge 1A pipeline) ---
+
+# Checkout of Challenge_1A (its src/ and models/ are used directly)
+CHALLENGE_1A_DIR = os.environ.get(
+    "CHALLENGE_1A_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "..", "Challenge_1A"),
+)
+# 'sklearn' (pickled classifier), 'booster' (native LightGBM) or 'compiled'
+# (NumPy evaluation of the same trees), see 1A predictors.py
+HEADING_PREDICTOR = os.environ.get("HEADING_PREDICTOR", "sklearn")
+# Pages whose blocks share one heading-model predict call while streaming
+PAGES_PER_BATCH = int(os.environ.get("PAGES_PER_BATCH", "16"))
+# Characters of section content kept per section; the rest is dropped while streaming
+MAX_SECTION_CHARS = int(os.environ.get("MAX_SECTION_CHARS", "2000"))
+
+# --- Embeddings (see embeddings.py) ---
+
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# 'sentence-transformers' (fp32 PyTorch), 'int8' (PyTorch dynamic quantization),
+# 'onnx' or 'onnx-int8' (ONNX Runtime export, see encoders.py)
+ENCODER_BACKEND = os.environ.get("ENCODER_BACKEND", "sentence-transformers")
+# Intra-op threads for the encoder; 0 leaves the library default (all cores)
+ENCODER_THREADS = int(os.environ.get("ENCODER_THREADS", "0"))
+# Output of `python src/encoders.py export`
+ONNX_MODEL_DIR = os.environ.get(
+    "ONNX_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "encoder-onnx"),
+)
+# Minimum mean top-10 overlap with the fp32 rankings for a faster backend.
+# A faster backend only loads once `python src/encoders.py agreement
+# --backend <name>` has recorded a measured agreement at or above this for
+# the current model (and ONNX export) in ENCODER_AGREEMENT_PATH; the image
+# build measures every backend on the input/ samples. 0.9 itself is still a
+# starting guess: lower it only with the recorded measurements in hand.
+ENCODER_MIN_AGREEMENT = float(os.environ.get("ENCODER_MIN_AGREEMENT", "0.9"))
+# Agreement measurements written by `python src/encoders.py agreement`
+ENCODER_AGREEMENT_PATH = os.environ.get(
+    "ENCODER_AGREEMENT_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models",
+                 "encoder-agreement.json"),
+)
+# Texts per encoder forward pass
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "64"))
+# On-disk store of section/query embeddings keyed by content hash; empty disables it
+EMBEDDING_STORE_DIR = os.environ.get("EMBEDDING_STORE_DIR", "/app/cache/embeddings") or None
+
+# --- Collection mode (see vector_index.py) ---
+
+# Saved section index, rebuilt when the input PDFs change
+SECTION_INDEX_DIR = os.environ.get("SECTION_INDEX_DIR", "/app/cache/section_index")
@@ -0,0 +1,171 @@
+"""
+Embedding layer for the 1B ranker.
+
+EmbeddingEngine encodes section texts in fixed-size batches across all
+documents of a run, memoizes query embeddings, and keeps every embedding
+it computes in a VectorStore on disk, keyed by a hash of the model name
+and the text. Re-ranking the same collection for a new persona therefore
+encodes just the new query.
+"""
+import os
+import re
+import json
+import hashlib
+
+import numpy as np
+
+from config import (EMBEDDING_MODEL, EMBED_BATCH_SIZE, EMBEDDING_STORE_DIR,
+                    ENCODER_BACKEND, ENCODER_THREADS)
+
+
+def content_key(model_name, text):
+    """Store key of one text under one model."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class VectorStore:
+    """
+    Append-only float32 matrix on disk plus an id index:
+
+      vectors.f32  rows of `dim` float32, read through np.memmap
+      ids.txt      one key per line, line i is row i
+      meta.json    {"model", "dim"}
+
+    Vectors are appended before their ids, so a run killed mid-write
+    leaves at most some unreferenced trailing rows and a partial last id
+    line; both are ignored, and cut off by the next add().
+    """
+
+    def __init__(self, root, model_name, dim=None):
+        self.root = os.path.join(root, re.sub(r"[^\w.-]", "_", model_name))
+        os.makedirs(self.root, exist_ok=True)
+        self.vectors_path = os.path.join(self.root, "vectors.f32")
+        self.ids_path = os.path.join(self.root, "ids.txt")
+        meta_path = os.path.join(self.root, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        else:
+            self.dim = dim
+        self.index = {}
+        # Bytes of ids.txt up to the last complete line
+        self._ids_size = 0
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self.index[line[:-1].decode("utf-8")] = len(self.index)
+                    self._ids_size += len(line)
+        self._matrix = None
+        self._meta_path = meta_path
+
+    def __len__(self):
+        return len(self.index)
+
+    def matrix(self):
+        """All stored vectors as a read-only (n, dim) memmap."""
+        if self._matrix is None or len(self._matrix) != len(self.index):
+            if not self.index:
+                return np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                     shape=(len(self.index), self.dim))
+        return self._matrix
+
+    def get(self, keys):
+        """(rows, found): rows[i] is the store row of keys[i], or -1 when missing."""
+        rows = np.fromiter((self.index.get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+        return rows, rows >= 0
+
+    def add(self, keys, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump({"model": os.path.basename(self.root), "dim": self.dim}, f)
+        # Drop unreferenced rows left by an interrupted write before appending
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(len(self.index) * self.dim * 4)
+            f.write(vectors.tobytes())
+        with open(self.ids_path, "ab") as f:
+            f.truncate(self._ids_size)
+            for key in keys:
+                line = (key + "\n").encode("utf-8")
+                self.index[key] = len(self.index)
+                self._ids_size += len(line)
+                f.write(line)
+
+
+class EmbeddingEngine:
+    """
+    Lazy sentence encoder with batching, a query memo and an optional
+    persistent VectorStore (store_dir=None keeps everything in memory).
+    backend/threads select the encoder (see encoders.py); each backend
+    keeps its own store since their vectors differ slightly.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, batch_size=EMBED_BATCH_SIZE,
+                 store_dir=EMBEDDING_STORE_DIR, backend=ENCODER_BACKEND,
+                 threads=ENCODER_THREADS):
+        self.model_name = (model_name if backend == "sentence-transformers"
+                           else f"{model_name}-{backend}")
+        self.encoder_args = (backend, model_name, threads)
+        self.batch_size = batch_size
+        self.store = VectorStore(store_dir, self.model_name) if store_dir else None
+        self._model = None
+        self._queries = {}
+        self.stats = {"encoded": 0, "store_hits": 0, "query_hits": 0}
+
+    @property
+    def model(self):
+        if self._model is None:
+            from encoders import load_encoder
+            self._model = load_encoder(*self.encoder_args)
+        return self._model
+
+    def _encode(self, texts):
+        """Encode texts in batch_size chunks; (len(texts), dim) float32."""
+        self.stats["encoded"] += len(texts)
+        return np.asarray(self.model.encode(list(texts), batch_size=self.batch_size),
+                          dtype=np.float32)
+
+    def encode(self, texts):
+        """
+        Embeddings of `texts` in order, encoding only those the store
+        does not already hold (duplicates are encoded once).
+        """
+        if not texts:
+            return np.zeros((0, self.store.dim if self.store and self.store.dim else 0),
+                            dtype=np.float32)
+        if self.store is None:
+            return self._encode(texts)
+        keys = [content_key(self.model_name, t) for t in texts]
+        rows, found = self.store.get(keys)
+        self.stats["store_hits"] += int(found.sum())
+        missing = {}
+        for key, text, ok in zip(keys, texts, found):
+            if not ok:
+                missing.setdefault(key, text)
+        if missing:
+            self.store.add(list(missing), self._encode(list(missing.values())))
+            rows, _ = self.store.get(keys)
+        return np.asarray(self.store.matrix()[rows])
+
+    def encode_query(self, text):
+        """One query embedding, memoized per engine (and persisted with a store)."""
+        if text in self._queries:
+            self.stats["query_hits"] += 1
+        else:
+            self._queries[text] = self.encode([text])[0]
+        return self._queries[text]
+
+
+_engine = None
+
+
+def get_engine():
+    """Process-wide EmbeddingEngine built from config.py, created on first use."""
+    global _engine
+    if _engine is None:
+        _engine = EmbeddingEngine()
+    return _engine
@@ -0,0 +1,264 @@
+"""
+Sentence encoder backends for the 1B embedding engine.
+
+  sentence-transformers  the fp32 PyTorch model (reference)
+  int8                   the same model with its Linear layers dynamically
+                         quantized to int8 by PyTorch
+  onnx / onnx-int8       an ONNX Runtime export of the model (fp32, or
+                         int8-quantized weights), made once with
+                         `python src/encoders.py export`
+
+All backends return mean-pooled, L2-normalised float32 embeddings, like
+all-MiniLM-L6-v2 does, and are loaded lazily, once per process.
+`python src/encoders.py agreement --backend int8` measures how closely a
+backend's rankings match the fp32 reference on the input PDFs, records
+the result in ENCODER_AGREEMENT_PATH and fails below ENCODER_MIN_AGREEMENT.
+load_encoder() refuses a faster backend without a passing record for the
+current model (and, for ONNX, the current export).
+"""
+import os
+import json
+from functools import lru_cache
+
+import numpy as np
+
+from config import (EMBEDDING_MODEL, ENCODER_BACKEND, ENCODER_THREADS, ONNX_MODEL_DIR,
+                    ENCODER_MIN_AGREEMENT, ENCODER_AGREEMENT_PATH)
+
+BACKENDS = ("sentence-transformers", "int8", "onnx", "onnx-int8")
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model.int8.onnx"}
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class TorchEncoder:
+    """sentence-transformers model on CPU, optionally int8 dynamic-quantized."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, threads=0, quantize=False):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+        if quantize:
+            self.model = torch.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def encode(self, texts, batch_size=64):
+        return _normalize(self.model.encode(list(texts), batch_size=batch_size,
+                                            convert_to_numpy=True))
+
+
+class OnnxEncoder:
+    """ONNX Runtime session over an export made by export_onnx()."""
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, filename="model.onnx", threads=0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        opts = ort.SessionOptions()
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(os.path.join(model_dir, filename), opts,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        with open(os.path.join(model_dir, "encoder.json"), "r", encoding="utf-8") as f:
+            max_length = json.load(f)["max_seq_length"]
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+
+    def encode(self, texts, batch_size=64):
+        out = []
+        for start in range(0, len(texts), batch_size):
+            enc = self.tokenizer.encode_batch(list(texts[start:start + batch_size]))
+            feeds = {
+                "input_ids": np.array([e.ids for e in enc], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in enc], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in enc], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in feeds.items()
+                                             if k in self.input_names})[0]
+            # Mean pooling over real tokens, as the sentence-transformers Pooling layer
+            mask = feeds["attention_mask"][..., None].astype(np.float32)
+            out.append((hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9))
+        return _normalize(np.concatenate(out))
+
+
+class AgreementError(RuntimeError):
+    """A faster backend has no recorded agreement with fp32 at the threshold."""
+
+
+def _artifact_digest(backend):
+    """SHA-256 of the ONNX file an ONNX backend loads (None for the torch backends)."""
+    if backend not in ONNX_FILES:
+        return None
+    import hashlib
+    h = hashlib.sha256()
+    with open(os.path.join(ONNX_MODEL_DIR, ONNX_FILES[backend]), "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_agreements(path=ENCODER_AGREEMENT_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def record_agreement(backend, model_name, mean, worst, k, n_queries,
+                     path=ENCODER_AGREEMENT_PATH):
+    """Store one agreement measurement of `backend` (replacing the previous one)."""
+    records = _read_agreements(path)
+    records[backend] = {
+        "model": model_name, "artifact": _artifact_digest(backend),
+        "mean": mean, "worst": worst, "k": k, "queries": n_queries,
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2)
+    os.replace(tmp, path)
+
+
+def check_agreement(backend, model_name=EMBEDDING_MODEL, threshold=ENCODER_MIN_AGREEMENT,
+                    path=ENCODER_AGREEMENT_PATH):
+    """
+    Raise AgreementError unless `backend` has a recorded mean agreement of
+    at least `threshold` for this model (and ONNX file). fp32 always passes.
+    """
+    if backend == "sentence-transformers":
+        return
+    if backend in ONNX_FILES and not os.path.exists(os.path.join(ONNX_MODEL_DIR, ONNX_FILES[backend])):
+        raise AgreementError(f"No ONNX export in {ONNX_MODEL_DIR}: run `python src/encoders.py export`")
+    record = _read_agreements(path).get(backend)
+    how = f"run `python src/encoders.py agreement --backend {backend}`"
+    if record is None or record["model"] != model_name:
+        raise AgreementError(f"No agreement measured for {backend} with {model_name}: {how}")
+    if record["artifact"] != _artifact_digest(backend):
+        raise AgreementError(f"{backend} was re-exported since its agreement was measured: {how}")
+    if record["mean"] < threshold:
+        raise AgreementError(f"{backend} agrees {record['mean']:.3f} with fp32, "
+                             f"below ENCODER_MIN_AGREEMENT {threshold}")
+
+
+@lru_cache(maxsize=None)
+def load_encoder(backend=ENCODER_BACKEND, model_name=EMBEDDING_MODEL, threads=ENCODER_THREADS,
+                 verify=True):
+    """
+    The encoder for `backend`, built on first use and shared by the
+    process. verify: require a passing agreement record (check_agreement)
+    for the faster backends.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend {backend!r}; expected one of {BACKENDS}")
+    if verify:
+        check_agreement(backend, model_name)
+    if backend == "sentence-transformers":
+        return TorchEncoder(model_name, threads)
+    if backend == "int8":
+        return TorchEncoder(model_name, threads, quantize=True)
+    if backend in ONNX_FILES:
+        return OnnxEncoder(ONNX_MODEL_DIR, ONNX_FILES[backend], threads)
+    raise ValueError(f"Unknown encoder backend {backend!r}; expected one of {BACKENDS}")
+
+
+def export_onnx(model_name=EMBEDDING_MODEL, out_dir=ONNX_MODEL_DIR, opset=14):
+    """
+    Export the transformer of a sentence-transformers model to
+    out_dir/model.onnx (+ model.int8.onnx with int8 weights), with its
+    tokenizer.json and encoder.json (max_seq_length).
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(out_dir, exist_ok=True)
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0].auto_model.eval()
+    st.tokenizer.save_pretrained(out_dir)
+    with open(os.path.join(out_dir, "encoder.json"), "w", encoding="utf-8") as f:
+        json.dump({"model": model_name, "max_seq_length": st.max_seq_length}, f)
+
+    dummy = st.tokenizer(["an example sentence"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+    fp32_path = os.path.join(out_dir, ONNX_FILES["onnx"])
+    torch.onnx.export(
+        transformer, tuple(dummy[n] for n in names), fp32_path,
+        input_names=names, output_names=["last_hidden_state"],
+        dynamic_axes={n: {0: "batch", 1: "sequence"} for n in names + ["last_hidden_state"]},
+        opset_version=opset,
+    )
+    quantize_dynamic(fp32_path, os.path.join(out_dir, ONNX_FILES["onnx-int8"]),
+                     weight_type=QuantType.QInt8)
+    return out_dir
+
+
+def ranking_agreement(reference, candidate, queries_ref, queries_cand, k=10):
+    """
+    Mean and worst overlap of the top-k sections ranked by the reference
+    and candidate embeddings, over every query (1.0 = same top-k sets).
+    """
+    k = min(k, len(reference))
+    reference, candidate = _normalize(reference), _normalize(candidate)
+    overlaps = []
+    for q_ref, q_cand in zip(queries_ref, queries_cand):
+        top_ref = set(np.argsort(-(reference @ q_ref), kind="stable")[:k])
+        top_cand = set(np.argsort(-(candidate @ q_cand), kind="stable")[:k])
+        overlaps.append(len(top_ref & top_cand) / k)
+    return float(np.mean(overlaps)), float(np.min(overlaps))
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Encoder backend tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="export the model to ONNX (fp32 + int8)")
+    p_export.add_argument("--out", default=ONNX_MODEL_DIR)
+    p_agree = sub.add_parser("agreement", help="compare a backend's rankings with fp32")
+    p_agree.add_argument("--backend", choices=BACKENDS[1:], default="int8")
+    p_agree.add_argument("--input", default="/app/input", help="PDFs whose sections are ranked")
+    p_agree.add_argument("--queries", type=int, default=50,
+                         help="section titles used as extra queries besides the persona/job")
+    p_agree.add_argument("--k", type=int, default=10)
+    p_agree.add_argument("--threshold", type=float, default=ENCODER_MIN_AGREEMENT)
+    p_agree.add_argument("--record", default=ENCODER_AGREEMENT_PATH,
+                         help="file the measurement is recorded in (load_encoder checks it)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"✅ Exported ONNX encoder to {export_onnx(out_dir=args.out)}")
+        sys.exit(0)
+
+    from main import extract_documents, list_pdfs, PERSONA, JOB_TO_BE_DONE
+    from relevance_ranker import section_text, query_text
+    sections = [sec for _, secs in extract_documents(args.input, list_pdfs(args.input))
+                for sec in secs]
+    texts = [section_text(sec) for sec in sections]
+    queries = [query_text(PERSONA, JOB_TO_BE_DONE)] + [sec["section_title"] for sec in sections][:args.queries]
+
+    encoded = {}
+    for backend in ("sentence-transformers", args.backend):
+        encoder = load_encoder(backend, verify=False)
+        t0 = time.perf_counter()
+        encoded[backend] = (encoder.encode(texts), encoder.encode(queries))
+        print(f"⏱️  {backend}: {len(texts)} sections in {time.perf_counter() - t0:.2f}s")
+    (ref, q_ref), (cand, q_cand) = encoded["sentence-transformers"], encoded[args.backend]
+    mean, worst = ranking_agreement(ref, cand, q_ref, q_cand, args.k)
+    print(f"📐 top-{args.k} agreement with fp32: mean {mean:.3f}, worst {worst:.3f} "
+          f"over {len(queries)} queries")
+    record_agreement(args.backend, EMBEDDING_MODEL, mean, worst, args.k, len(queries),
+                     args.record)
+    print(f"📝 Recorded in {args.record}")
+    if mean < args.threshold:
+        print(f"❌ Below the {args.threshold} agreement threshold")
+        sys.exit(1)
+    print(f"✅ {args.backend} keeps rankings above {args.threshold}")
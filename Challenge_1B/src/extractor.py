@@ -1,6 +1,168 @@
-import fitz  # PyMuPDF
+"""
+Section extraction for Challenge 1B, built on the Challenge 1A pipeline.
 
-def extract_sections(pdf_path):
-    # Use Round 1A implementation here to extract sections
-    sections = []  # [{"section_title": "Intro", "page_number": 1, "content": "..."}, ...]
+Pages are read one at a time with 1A's iter_text_blocks, labelled with the
+1A heading model a window of PAGES_PER_BATCH pages at a time, and turned
+into a stream of section chunks: every heading (or the title) opens a new
+section, and the body text that follows it is yielded page by page. Only
+the current window of pages is ever held in memory.
+
+The same pass can also fill in the 1A outline (title + H1/H2/H3), so a
+caller that needs both parses each PDF once.
+"""
+import os
+import sys
+from collections import namedtuple
+
+from config import CHALLENGE_1A_DIR, HEADING_PREDICTOR, PAGES_PER_BATCH, MAX_SECTION_CHARS
+
+# Appended, not prepended: 1A's main.py must not shadow ours
+sys.path.append(os.path.join(CHALLENGE_1A_DIR, "src"))
+from ingestion import iter_text_blocks, PDFParseError  # noqa: E402,F401
+from graph import build_page_graph  # noqa: E402
+from features import build_feature_dataframe  # noqa: E402
+from inference import align_features, predict_labels, assign_hierarchy  # noqa: E402
+from predictors import load_predictor, model_file  # noqa: E402
+from cache import file_digest  # noqa: E402
+
+MODEL_PATH = os.path.join(CHALLENGE_1A_DIR, "models", "heading_model.txt")
+FEAT_NAMES_PATH = os.path.join(CHALLENGE_1A_DIR, "models", "feature_names.json")
+
+# One page's piece of a section body: `index` numbers the sections of the
+# document in order (titles can repeat), `title` is None for text that
+# comes before the first heading, `start_page` is where the heading is and
+# `page` where this text is (both 1-based).
+SectionChunk = namedtuple("SectionChunk", ["index", "title", "start_page", "page", "text"])
+
+_model = None
+
+
+def load_heading_model():
+    """The 1A heading model, loaded once per process."""
+    global _model
+    if _model is None:
+        _model = load_predictor(HEADING_PREDICTOR, MODEL_PATH)
+    return _model
+
+
+def extraction_params(max_chars=MAX_SECTION_CHARS):
+    """
+    What extract_sections returns for a PDF depends on besides the PDF
+    itself: the 1A heading model and feature names it predicts with, and
+    max_chars. Saved section indexes record it and are rebuilt when it
+    changes.
+    """
+    return {
+        "heading_predictor": HEADING_PREDICTOR,
+        "heading_model": file_digest(model_file(HEADING_PREDICTOR, MODEL_PATH)),
+        "feature_names": file_digest(FEAT_NAMES_PATH),
+        "max_section_chars": max_chars,
+    }
+
+
+def _labelled_window(first_page, window, model):
+    """Predict one window of pages; yields (page number, blocks, labels, feature rows)."""
+    df = build_feature_dataframe([build_page_graph(blocks) for blocks in window])
+    labels = predict_labels(model, align_features(df, FEAT_NAMES_PATH)) if len(df) else []
+    pos = 0
+    for offset, blocks in enumerate(window):
+        n = len(blocks)
+        yield first_page + offset, blocks, labels[pos:pos + n], df.iloc[pos:pos + n]
+        pos += n
+
+
+def iter_labelled_pages(pdf_path, model=None, pages_per_batch=PAGES_PER_BATCH):
+    """
+    Yield (page number, blocks, labels, feature rows) for every page in
+    order. Features are page-local, so predicting a window of pages at a
+    time gives the same labels as 1A's whole-document predict.
+    """
+    model = model or load_heading_model()
+    window, first_page = [], 1
+    for page_num, blocks in enumerate(iter_text_blocks(pdf_path), start=1):
+        window.append(blocks)
+        if len(window) == pages_per_batch:
+            yield from _labelled_window(first_page, window, model)
+            window, first_page = [], page_num + 1
+    if window:
+        yield from _labelled_window(first_page, window, model)
+
+
+def iter_section_chunks(pdf_path, model=None, pages_per_batch=PAGES_PER_BATCH, outline=None):
+    """
+    Stream the sections of a PDF as SectionChunk records, at most one per
+    section per page, in document order.
+
+    Args:
+      pdf_path (str | bytes): Path to the PDF file, or its content.
+      model: heading model (default: load_heading_model()).
+      pages_per_batch (int): Pages per heading-model predict call.
+      outline (dict | None): When given, receives the 1A outline
+                             {"title", "outline"} once the stream is exhausted.
+    Raises:
+      PDFParseError: as 1A's iter_text_blocks.
+    """
+    index, title, start_page = -1, None, 1
+    doc_title = None                  # first block predicted 'title'
+    # Largest font on the first page with text, as 1A's outline_parts
+    fallback, fallback_size, fallback_page = None, 0.0, None
+    headings = []
+    for page_num, blocks, labels, rows in iter_labelled_pages(pdf_path, model, pages_per_batch):
+        parts = []
+        numbering, norm_x0 = rows["numbering_pattern"].to_numpy(), rows["norm_x0"].to_numpy()
+        if fallback_page is None and blocks:
+            fallback_page = page_num
+        for i, (blk, label) in enumerate(zip(blocks, labels)):
+            if page_num == fallback_page and (fallback is None or blk.font_size > fallback_size):
+                fallback, fallback_size = blk.text, blk.font_size
+            if label not in ("heading", "title"):
+                parts.append(blk.text)
+                continue
+            if parts:
+                yield SectionChunk(index, title, start_page, page_num, " ".join(parts))
+                parts = []
+            index, title, start_page = index + 1, blk.text, page_num
+            if label == "title":
+                doc_title = blk.text if doc_title is None else doc_title
+            else:
+                headings.append({
+                    "text": blk.text,
+                    "page": page_num - 1,
+                    "font_size": blk.font_size,
+                    "numbering_pattern": bool(numbering[i]),
+                    "norm_x0": norm_x0[i],
+                })
+        if parts:
+            yield SectionChunk(index, title, start_page, page_num, " ".join(parts))
+    if outline is not None:
+        outline["title"] = doc_title if doc_title is not None else (fallback or "")
+        outline["outline"] = assign_hierarchy(headings)
+
+
+def extract_sections(pdf_path, max_chars=MAX_SECTION_CHARS, model=None, outline=None):
+    """
+    Sections of a PDF as [{"section_title", "page_number", "content"}, ...].
+
+    page_number is the 1-based page the section starts on; content keeps
+    the first max_chars characters of the section body (the rest is
+    dropped as it streams past). Text before the first heading becomes a
+    section titled after the file. See iter_section_chunks for `outline`.
+    """
+    untitled = (os.path.splitext(os.path.basename(pdf_path))[0]
+                if isinstance(pdf_path, str) else "Untitled")
+    sections, current, budget = [], None, 0
+    for chunk in iter_section_chunks(pdf_path, model, outline=outline):
+        if current is None or chunk.index != current["_index"]:
+            current = {"_index": chunk.index,
+                       "section_title": chunk.title if chunk.title is not None else untitled,
+                       "page_number": chunk.start_page,
+                       "content": ""}
+            sections.append(current)
+            budget = max_chars
+        if budget > 0:
+            text = (" " + chunk.text if current["content"] else chunk.text)[:budget]
+            current["content"] += text
+            budget -= len(text)
+    for sec in sections:
+        del sec["_index"]
     return sections
@@ -1,20 +1,58 @@
 import json
+import argparse
 from datetime import datetime
-from extractor import extract_sections
-from relevance_ranker import rank_sections
+from extractor import extract_sections, extraction_params, PDFParseError
+from relevance_ranker import rank_sections, section_text, query_text
+from embeddings import get_engine
+from vector_index import VectorIndex, INDEX_KINDS, file_sha256
+from config import SECTION_INDEX_DIR
 import os
 
-def main():
-    input_dir = '/app/input'
-    output_dir = '/app/output'
-    
-    persona = "PhD Researcher in Computational Biology"
-    job_to_be_done = "Prepare a comprehensive literature review focusing on methodologies, datasets, and benchmarks"
-
-    for pdf_file in os.listdir(input_dir):
-        sections = extract_sections(os.path.join(input_dir, pdf_file))
-        ranked_sections = rank_sections(sections, persona, job_to_be_done)
-        
+PERSONA = "PhD Researcher in Computational Biology"
+JOB_TO_BE_DONE = "Prepare a comprehensive literature review focusing on methodologies, datasets, and benchmarks"
+
+
+def list_pdfs(input_dir):
+    return [f for f in sorted(os.listdir(input_dir)) if f.lower().endswith(".pdf")]
+
+
+def extract_documents(input_dir, pdf_files):
+    """[(pdf_file, sections)] for the PDFs that parse."""
+    documents = []
+    for pdf_file in pdf_files:
+        try:
+            documents.append((pdf_file, extract_sections(os.path.join(input_dir, pdf_file))))
+        except PDFParseError as e:
+            print(f"❌ Skipping {pdf_file}: {e}")
+    return documents
+
+
+def output_section(document, sec, rank):
+    return {
+        "document": document,
+        "page_number": sec["page_number"],
+        "section_title": sec["section_title"],
+        "importance_rank": rank,
+        "refined_text": sec["content"][:1000]  # Keep short to ensure relevance
+    }
+
+
+def run_per_document(input_dir, output_dir, persona, job_to_be_done, top_k=10):
+    """One JSON per PDF, ranking that PDF's sections."""
+    documents = extract_documents(input_dir, list_pdfs(input_dir))
+
+    # Encode the sections of every document together, in fixed-size batches
+    engine = get_engine()
+    all_texts = [section_text(sec) for _, sections in documents for sec in sections]
+    embeddings = engine.encode(all_texts) if all_texts else None
+    start = 0
+
+    for pdf_file, sections in documents:
+        doc_embeddings = embeddings[start:start + len(sections)] if sections else None
+        start += len(sections)
+        ranked_sections = rank_sections(sections, persona, job_to_be_done,
+                                        section_embeddings=doc_embeddings, engine=engine)
+
         result = {
             "metadata": {
                 "input_documents": pdf_file,
@@ -23,20 +61,94 @@ def main():
                 "processing_timestamp": datetime.now().isoformat()
             },
             "extracted_sections": [
-                {
-                    "document": pdf_file,
-                    "page_number": sec["page_number"],
-                    "section_title": sec["section_title"],
-                    "importance_rank": sec["importance_rank"],
-                    "refined_text": sec["content"][:1000]  # Keep short to ensure relevance
-                }
-                for sec in ranked_sections[:10]  # Select top 10 sections
+                output_section(pdf_file, sec, sec["importance_rank"])
+                for sec in ranked_sections[:top_k]  # Select top sections
             ]
         }
-        
+
         output_filename = os.path.splitext(pdf_file)[0] + '.json'
         with open(os.path.join(output_dir, output_filename), 'w') as f:
             json.dump(result, f, indent=4)
 
+    print(f"🧮 Embeddings: {engine.stats['encoded']} encoded, "
+          f"{engine.stats['store_hits']} from store")
+
+
+def load_or_build_index(input_dir, index_dir, kind="exact", rebuild=False):
+    """
+    The saved section index of input_dir, rebuilt (and saved) when the
+    PDFs, the index kind, the encoder or the section extraction settings
+    changed since it was built.
+    """
+    pdf_files = list_pdfs(input_dir)
+    inputs = {f: file_sha256(os.path.join(input_dir, f)) for f in pdf_files}
+    engine = get_engine()
+    params = {"encoder": engine.model_name, "sections": extraction_params()}
+    index = None if rebuild else VectorIndex.load(index_dir)
+    if (index is not None and index.inputs == inputs and index.kind == kind
+            and index.params == params):
+        print(f"📚 Using index of {len(index)} sections from {index_dir}")
+        return index
+
+    documents = extract_documents(input_dir, pdf_files)
+    sections = [{"document": pdf_file, **sec} for pdf_file, secs in documents for sec in secs]
+    embeddings = engine.encode([section_text(sec) for sec in sections])
+    index = VectorIndex.build(sections, embeddings, inputs, kind, params=params)
+    index.save(index_dir)
+    print(f"📚 Built {kind} index of {len(index)} sections in {index_dir}")
+    return index
+
+
+def run_collection(input_dir, output_dir, persona, job_to_be_done, top_k=10,
+                   index_dir=SECTION_INDEX_DIR, kind="exact", nprobe=8, rebuild=False):
+    """One collection.json ranking the sections of all PDFs together."""
+    index = load_or_build_index(input_dir, index_dir, kind, rebuild)
+    hits = []
+    if len(index):
+        query = get_engine().encode_query(query_text(persona, job_to_be_done))
+        hits = index.search(query, top_k, nprobe)
+
+    result = {
+        "metadata": {
+            "input_documents": sorted(index.inputs),
+            "persona": persona,
+            "job_to_be_done": job_to_be_done,
+            "processing_timestamp": datetime.now().isoformat()
+        },
+        "extracted_sections": [
+            dict(output_section(index.sections[row]["document"], index.sections[row], rank),
+                 similarity=score)
+            for rank, (row, score) in enumerate(hits, start=1)
+        ]
+    }
+    with open(os.path.join(output_dir, "collection.json"), 'w') as f:
+        json.dump(result, f, indent=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank PDF sections for a persona and job.")
+    parser.add_argument("--input", default="/app/input")
+    parser.add_argument("--output", default="/app/output")
+    parser.add_argument("--persona", default=PERSONA)
+    parser.add_argument("--job", default=JOB_TO_BE_DONE)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--collection", action="store_true",
+                        help="rank sections across all PDFs into one collection.json")
+    parser.add_argument("--index", default=SECTION_INDEX_DIR,
+                        help="saved section index for --collection")
+    parser.add_argument("--index-kind", choices=INDEX_KINDS, default="exact",
+                        help="exact dot products, or approximate IVF lists")
+    parser.add_argument("--nprobe", type=int, default=8,
+                        help="IVF lists scanned per query (default: 8)")
+    parser.add_argument("--rebuild-index", action="store_true")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    if args.collection:
+        run_collection(args.input, args.output, args.persona, args.job, args.top_k,
+                       args.index, args.index_kind, args.nprobe, args.rebuild_index)
+    else:
+        run_per_document(args.input, args.output, args.persona, args.job, args.top_k)
+
 if __name__ == "__main__":
     main()
@@ -1,16 +1,35 @@
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from embeddings import get_engine
 
-def rank_sections(sections, persona, job):
-    query_embedding = model.encode(f"{persona}. {job}")
-    
-    section_embeddings = model.encode([sec['section_title'] + " " + sec['content'][:500] for sec in sections])
+
+def section_text(sec):
+    """Text a section is embedded by."""
+    return sec['section_title'] + " " + sec['content'][:500]
+
+
+def query_text(persona, job):
+    return f"{persona}. {job}"
+
+
+def rank_sections(sections, persona, job, section_embeddings=None, engine=None):
+    """
+    Sections sorted by similarity to the persona/job query, each with its
+    1-based importance_rank and similarity.
+
+    section_embeddings: precomputed embeddings of `sections` (e.g. one
+    slice of a batch encoded across all documents); encoded here if None.
+    """
+    if not sections:
+        return []
+    engine = engine or get_engine()
+    query_embedding = engine.encode_query(query_text(persona, job))
+    if section_embeddings is None:
+        section_embeddings = engine.encode([section_text(sec) for sec in sections])
     similarities = cosine_similarity([query_embedding], section_embeddings).flatten()
-    
+
     ranked_sections = sorted([
-        {**section, "importance_rank": rank + 1, "similarity": sim} 
+        {**section, "importance_rank": rank + 1, "similarity": sim}
         for rank, (section, sim) in enumerate(sorted(zip(sections, similarities), key=lambda x: x[1], reverse=True))
     ], key=lambda x: x['importance_rank'])
 
@@ -0,0 +1,154 @@
+"""
+Collection-level vector index for ranking sections across many documents.
+
+A VectorIndex holds the L2-normalised embeddings of every section in a
+collection plus the section records they belong to, saved as
+
+  vectors.npy     (n, dim) float32, memory-mapped on load
+  sections.jsonl  one {"document", "page_number", "section_title", "content"} per row
+  manifest.json   {"kind", "inputs": {pdf name: sha256}, "params": {...}}
+  centroids.npy, list_indptr.npy, list_ids.npy   IVF lists (kind "ivf" only)
+
+search() is exact (one dot product per section, top-k by argpartition) or,
+for an IVF index, approximate: only the nprobe lists whose centroids are
+closest to the query are scanned, about nprobe/nlist of the collection.
+"""
+import os
+import json
+import hashlib
+
+import numpy as np
+
+INDEX_KINDS = ("exact", "ivf")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k(scores, k):
+    """Indices of the k largest scores, best first (ties: lower index first)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(scores))
+    return part[np.lexsort((part, -scores[part]))]
+
+
+def spherical_kmeans(vectors, nlist, iters=10, seed=0):
+    """(centroids, assignment) of unit vectors by cosine k-means."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = ~sums.any(axis=1)
+        # Keep the old centroid for lists that lost all their members
+        sums[empty] = centroids[empty]
+        centroids = normalize(sums)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+class VectorIndex:
+    def __init__(self, vectors, sections, inputs=None, kind="exact",
+                 centroids=None, list_indptr=None, list_ids=None, params=None):
+        self.vectors = vectors
+        self.sections = sections
+        self.inputs = inputs or {}
+        self.kind = kind
+        # What the sections and vectors were computed with (encoder, extraction
+        # settings): an index whose params differ from the current ones is stale
+        self.params = params or {}
+        self.centroids = centroids
+        self.list_indptr = list_indptr
+        self.list_ids = list_ids
+
+    def __len__(self):
+        return len(self.sections)
+
+    @classmethod
+    def build(cls, sections, embeddings, inputs=None, kind="exact", nlist=None, seed=0,
+              params=None):
+        """
+        sections: records with at least document/page_number/section_title/content;
+        embeddings: their (n, dim) vectors (normalised here).
+        nlist defaults to about sqrt(n) lists for an IVF index.
+        params: JSON-serialisable description of the encoder and extraction
+        settings, saved in the manifest.
+        """
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind {kind!r}; expected one of {INDEX_KINDS}")
+        vectors = normalize(embeddings)
+        index = cls(vectors, list(sections), inputs, kind, params=params)
+        if kind == "ivf" and len(vectors):
+            nlist = min(len(vectors), nlist or max(1, int(np.sqrt(len(vectors)))))
+            centroids, assign = spherical_kmeans(vectors, nlist, seed=seed)
+            index.centroids = centroids
+            index.list_ids = np.argsort(assign, kind="stable")
+            index.list_indptr = np.zeros(nlist + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assign, minlength=nlist), out=index.list_indptr[1:])
+        return index
+
+    def search(self, query, k=10, nprobe=8):
+        """[(row, score)] of the k best sections for one query vector (nprobe >= 1)."""
+        q = normalize(query)
+        if self.kind == "ivf" and self.centroids is not None:
+            probe = top_k(self.centroids @ q, max(1, nprobe))
+            rows = np.concatenate([self.list_ids[self.list_indptr[c]:self.list_indptr[c + 1]]
+                                   for c in probe])
+            rows.sort()
+            scores = np.asarray(self.vectors[rows]) @ q
+            best = top_k(scores, k)
+            return [(int(rows[i]), float(scores[i])) for i in best]
+        scores = np.asarray(self.vectors @ q)
+        return [(int(i), float(scores[i])) for i in top_k(scores, k)]
+
+    # --- persistence ---
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), np.asarray(self.vectors))
+        with open(os.path.join(path, "sections.jsonl"), "w", encoding="utf-8") as f:
+            for sec in self.sections:
+                f.write(json.dumps(sec, ensure_ascii=False) + "\n")
+        if self.kind == "ivf" and self.centroids is not None:
+            np.save(os.path.join(path, "centroids.npy"), self.centroids)
+            np.save(os.path.join(path, "list_indptr.npy"), self.list_indptr)
+            np.save(os.path.join(path, "list_ids.npy"), self.list_ids)
+        # Manifest last: an index without one is treated as missing
+        with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"kind": self.kind, "inputs": self.inputs, "params": self.params},
+                      f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """The index saved at `path`, or None if there is none."""
+        manifest_path = os.path.join(path, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(os.path.join(path, "sections.jsonl"), "r", encoding="utf-8") as f:
+            sections = [json.loads(line) for line in f]
+        index = cls(np.load(os.path.join(path, "vectors.npy"), mmap_mode="r"),
+                    sections, manifest["inputs"], manifest["kind"],
+                    params=manifest.get("params"))
+        if index.kind == "ivf" and os.path.exists(os.path.join(path, "centroids.npy")):
+            index.centroids = np.load(os.path.join(path, "centroids.npy"))
+            index.list_indptr = np.load(os.path.join(path, "list_indptr.npy"))
+            index.list_ids = np.load(os.path.join(path, "list_ids.npy"))
+        return index
@@ -0,0 +1,70 @@
+"""VectorIndex: exact and IVF search, persistence."""
+import numpy as np
+import pytest
+
+from vector_index import VectorIndex, normalize
+
+
+def collection(n=200, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    # Clustered, so IVF lists are meaningful
+    centers = rng.standard_normal((8, dim))
+    embeddings = centers[rng.integers(0, 8, n)] + 0.3 * rng.standard_normal((n, dim))
+    sections = [{"document": f"doc{i % 5}.pdf", "page_number": i, "section_title": f"s{i}",
+                 "content": ""} for i in range(n)]
+    return sections, embeddings.astype(np.float32), rng.standard_normal(dim).astype(np.float32)
+
+
+def brute_force(embeddings, query, k):
+    scores = normalize(embeddings) @ normalize(query)
+    order = sorted(range(len(scores)), key=lambda i: (-scores[i], i))[:k]
+    return order, scores[order]
+
+
+def test_exact_search_matches_brute_force():
+    sections, embeddings, query = collection()
+    hits = VectorIndex.build(sections, embeddings).search(query, k=10)
+    rows, scores = brute_force(embeddings, query, 10)
+    assert [row for row, _ in hits] == rows
+    np.testing.assert_allclose([s for _, s in hits], scores, rtol=1e-5)
+
+
+def test_ivf_probing_every_list_is_exact():
+    sections, embeddings, query = collection()
+    index = VectorIndex.build(sections, embeddings, kind="ivf", nlist=12)
+    assert index.list_indptr[-1] == len(index) and sorted(index.list_ids) == list(range(len(index)))
+    exact = VectorIndex.build(sections, embeddings).search(query, k=10)
+    assert index.search(query, k=10, nprobe=12) == exact
+
+
+def test_ivf_probes_a_subset():
+    sections, embeddings, query = collection()
+    index = VectorIndex.build(sections, embeddings, kind="ivf", nlist=12)
+    hits = index.search(query, k=5, nprobe=1)
+    best_list = np.argmax(index.centroids @ normalize(query))
+    members = set(index.list_ids[index.list_indptr[best_list]:index.list_indptr[best_list + 1]])
+    assert hits and {row for row, _ in hits} <= members
+    # nprobe=0 is treated as 1
+    assert index.search(query, k=5, nprobe=0) == hits
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        VectorIndex.build([], np.zeros((0, 4)), kind="hnsw")
+
+
+@pytest.mark.parametrize("kind", ["exact", "ivf"])
+def test_save_load_round_trip(tmp_path, kind):
+    sections, embeddings, query = collection(n=50)
+    params = {"encoder": "all-MiniLM-L6-v2", "sections": {"max_section_chars": 2000}}
+    index = VectorIndex.build(sections, embeddings, inputs={"a.pdf": "00"}, kind=kind,
+                              params=params)
+    index.save(str(tmp_path))
+    loaded = VectorIndex.load(str(tmp_path))
+    assert (loaded.kind, loaded.inputs, loaded.params) == (kind, {"a.pdf": "00"}, params)
+    assert loaded.sections == sections
+    assert loaded.search(query, k=7, nprobe=3) == index.search(query, k=7, nprobe=3)
+
+
+def test_load_without_manifest(tmp_path):
+    assert VectorIndex.load(str(tmp_path)) is None
@@ -0,0 +1,59 @@
+"""VectorStore: round trips, reopening and recovery from interrupted writes."""
+import numpy as np
+
+from embeddings import VectorStore
+
+
+def vectors(n, dim=4, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_round_trip_and_reopen(tmp_path):
+    store = VectorStore(str(tmp_path), "model/name")
+    first, second = vectors(3), vectors(2, seed=1)
+    store.add(["a", "b", "c"], first)
+    store.add(["d", "e"], second)
+
+    reopened = VectorStore(str(tmp_path), "model/name")
+    assert len(reopened) == 5 and reopened.dim == 4
+    rows, found = reopened.get(["e", "missing", "a"])
+    assert list(found) == [True, False, True]
+    np.testing.assert_array_equal(reopened.matrix()[rows[found]], np.stack([second[1], first[0]]))
+
+
+def test_models_keep_separate_stores(tmp_path):
+    VectorStore(str(tmp_path), "one").add(["a"], vectors(1))
+    assert len(VectorStore(str(tmp_path), "two")) == 0
+
+
+def test_unreferenced_rows_are_ignored_and_overwritten(tmp_path):
+    store = VectorStore(str(tmp_path), "m")
+    store.add(["a"], vectors(1))
+    # Killed after writing vectors but before their ids
+    with open(store.vectors_path, "ab") as f:
+        f.write(vectors(2, seed=9).tobytes())
+
+    store = VectorStore(str(tmp_path), "m")
+    assert len(store) == 1 and store.matrix().shape == (1, 4)
+    store.add(["b"], vectors(1, seed=2))
+    rows, _ = store.get(["b"])
+    np.testing.assert_array_equal(store.matrix()[rows], vectors(1, seed=2))
+
+
+def test_partial_id_line_is_dropped(tmp_path):
+    store = VectorStore(str(tmp_path), "m")
+    store.add(["a"], vectors(1))
+    # Killed halfway through the ids of a two-row batch
+    with open(store.vectors_path, "ab") as f:
+        f.write(vectors(2, seed=9).tobytes())
+    with open(store.ids_path, "a", encoding="utf-8") as f:
+        f.write("b\nc-tor")
+
+    store = VectorStore(str(tmp_path), "m")
+    assert len(store) == 2 and list(store.get(["b", "c-tor"])[1]) == [True, False]
+    store.add(["d"], vectors(1, seed=3))
+
+    reopened = VectorStore(str(tmp_path), "m")
+    rows, found = reopened.get(["a", "b", "d"])
+    assert list(rows) == [0, 1, 2] and found.all()
+    np.testing.assert_array_equal(reopened.matrix()[2], vectors(1, seed=3)[0])